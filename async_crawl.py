@@ -0,0 +1,407 @@
+"""asyncio crawl engine mirroring the blocking extractors.
+
+The thread pool in :mod:`update_contact_info_api` tops out at a few dozen
+rows in flight because every fetch holds a thread.  This module runs the same
+page logic as :func:`update_contact_info.crawl_site_for_email`,
+:func:`update_contact_info.find_contact_form` and
+:func:`update_contact_info.find_instagram` on an event loop with
+:mod:`aiohttp`, so thousands of fetches can be outstanding at once.  A global
+semaphore caps the total number of requests in flight and a per-host
+semaphore keeps a single site from being flooded.  With a
+:class:`fetch_scheduler.FetchScheduler` the per-group limits and request
+rate apply as on the threaded path.
+
+Only the I/O differs from the synchronous path: link selection, e-mail
+extraction and form detection are the helpers in :mod:`update_contact_info`,
+and streaming with ``max_bytes`` follows :class:`fetch_client.FetchClient`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from itertools import islice
+from typing import (
+    Any,
+    AsyncContextManager,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    Optional,
+    Sequence,
+    TypeVar,
+)
+from urllib.parse import urlparse
+
+import aiohttp
+
+import fetch_client
+import parse_pool
+import retry_policy
+from crawl_frontier import Frontier
+from email_collector import CrawlBudget, EmailCollector
+from fetch_scheduler import FetchScheduler
+from page_cache import cache_key
+from page_parser import ParsedPage, as_page
+from update_contact_info import (
+    REQUEST_TIMEOUT,
+    _contact_form_candidates,
+    _email_on_page,
+    _same_domain_links,
+)
+
+DEFAULT_MAX_IN_FLIGHT = 1000
+DEFAULT_PER_HOST = 4
+
+_T = TypeVar("_T")
+_R = TypeVar("_R")
+
+
+class AsyncFetcher:
+    """Fetch pages over a shared :class:`aiohttp.ClientSession`.
+
+    Retries follow :func:`update_contact_info_api._fetch_page`: the shared
+    :mod:`retry_policy` decides what is retried and how long to wait, open
+    circuit breakers skip the host and an SSL error turns certificate
+    verification off for the remaining attempts.  With
+    ``max_bytes`` set bodies are streamed and capped, non-HTML responses are
+    skipped and ``fetch(..., stop=...)`` may end a download early.
+    """
+
+    def __init__(
+        self,
+        *,
+        timeout: float = REQUEST_TIMEOUT,
+        verify: bool = True,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        per_host: int = DEFAULT_PER_HOST,
+        max_bytes: Optional[int] = None,
+        scheduler: Optional[FetchScheduler] = None,
+    ):
+        self.timeout = timeout
+        self.verify = verify
+        self.max_in_flight = max_in_flight
+        self.per_host = per_host
+        self.max_bytes = max_bytes
+        self.scheduler = scheduler
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._global: Optional[asyncio.Semaphore] = None
+        self._hosts: Dict[str, asyncio.Semaphore] = {}
+        self._groups: Dict[str, asyncio.Semaphore] = {}
+
+    async def open(self) -> None:
+        connector = aiohttp.TCPConnector(
+            limit=self.max_in_flight, limit_per_host=self.per_host
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"User-Agent": fetch_client.USER_AGENT},
+        )
+        self._global = asyncio.Semaphore(self.max_in_flight)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self) -> "AsyncFetcher":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc.lower()
+        semaphore = self._hosts.get(host)
+        if semaphore is None:
+            semaphore = self._hosts[host] = asyncio.Semaphore(self.per_host)
+        return semaphore
+
+    async def _group_slot(self, url: str) -> AsyncContextManager[Any]:
+        """Wait for ``url``'s request token and return its group semaphore."""
+
+        if self.scheduler is None:
+            return contextlib.nullcontext()
+        group = self.scheduler.cached_group(url)
+        if group is None:
+            loop = asyncio.get_running_loop()
+            group = await loop.run_in_executor(None, self.scheduler.group, url)
+        delay = self.scheduler.reserve(group)
+        if delay:
+            await asyncio.sleep(delay)
+        semaphore = self._groups.get(group)
+        if semaphore is None:
+            semaphore = self._groups[group] = asyncio.Semaphore(self.scheduler.per_group)
+        return semaphore
+
+    async def fetch(
+        self,
+        url: str,
+        *,
+        context: str | None = None,
+        stop: Optional[Callable[[bytes], bool]] = None,
+    ) -> Optional[str]:
+        """Return the text of ``url``, or ``None`` once the retry policy gives
+        up or the host's circuit breaker is open.
+
+        A download ended by ``stop`` is returned as
+        :class:`fetch_client.PartialText`.
+        """
+
+        if self._session is None or self._global is None:
+            raise RuntimeError("AsyncFetcher.open() must be awaited before fetch()")
+
+        prefix = f"{context}: " if context else ""
+        verify = self.verify
+        policy = retry_policy.get_policy()
+        breakers = retry_policy.get_breakers()
+        with breakers.fetch(url) as outcome:
+            for attempt in range(policy.attempts):
+                if not breakers.allow(url):
+                    logging.warning(
+                        "%sSkipping %s: circuit breaker open for %s",
+                        prefix,
+                        url,
+                        retry_policy.host_of(url),
+                    )
+                    return None
+                retry_after = None
+                try:
+                    group = await self._group_slot(url)
+                    async with self._host_semaphore(url), group, self._global:
+                        async with self._session.get(url, ssl=verify) as res:
+                            outcome.record_status(res.status)
+                            if policy.retries_status(res.status):
+                                retry_after = res.headers.get("Retry-After")
+                                logging.warning(
+                                    "%sAttempt %s fetching %s returned HTTP %s; retrying",
+                                    prefix,
+                                    attempt + 1,
+                                    url,
+                                    res.status,
+                                )
+                            else:
+                                res.raise_for_status()
+                                if self.max_bytes is None:
+                                    return await res.text(errors="replace")
+                                return await self._read(res, url, stop, prefix)
+                except aiohttp.ClientSSLError as exc:
+                    if verify:
+                        verify = False
+                        logging.warning(
+                            "%sSSL error on %s (retrying without verification): %s",
+                            prefix,
+                            url,
+                            exc,
+                        )
+                        continue
+                except aiohttp.ClientResponseError as exc:
+                    logging.warning("%sFetching %s failed: %s", prefix, url, exc)
+                    return None
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as exc:
+                    logging.warning(
+                        "%sAttempt %s fetching %s failed: %s",
+                        prefix,
+                        attempt + 1,
+                        url,
+                        exc,
+                    )
+                    if outcome.record_error(exc):
+                        break
+                delay = policy.delay(attempt, retry_after)
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)
+            logging.error("%sFailed to fetch %s after %s attempts", prefix, url, attempt + 1)
+            return None
+
+    async def _read(
+        self,
+        res: aiohttp.ClientResponse,
+        url: str,
+        stop: Optional[Callable[[bytes], bool]],
+        prefix: str,
+    ) -> Optional[str]:
+        content_type = res.headers.get("Content-Type")
+        if not fetch_client.is_html(content_type):
+            logging.info("%sSkipping %s: not an HTML page (%s)", prefix, url, content_type)
+            return None
+        limiter = fetch_client.BodyLimiter(self.max_bytes, stop)
+        async for chunk in res.content.iter_chunked(fetch_client.STREAM_CHUNK_SIZE):
+            if not limiter.feed(chunk):
+                break
+        if limiter.capped:
+            logging.info("%sPage %s exceeded the size cap; truncated", prefix, url)
+        text = limiter.body().decode(res.charset or "utf-8", errors="replace")
+        if limiter.stopped_early:
+            return fetch_client.PartialText(text)
+        return text
+
+
+class AsyncPageCache:
+    """Async counterpart of :class:`page_cache.PageCache`."""
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Awaitable[Optional[str]]],
+        *,
+        fetch_partial: Optional[Callable[[str], Awaitable[Optional[str]]]] = None,
+    ):
+        self._fetch = fetch
+        self._fetch_partial = fetch_partial
+        self._pages: Dict[str, Optional[str]] = {}
+        self._parsed: Dict[str, ParsedPage] = {}
+        self._partial: Dict[str, ParsedPage] = {}
+        self.fetches = 0
+        self.fetches_saved = 0
+        self.parses = 0
+        self.parses_saved = 0
+        self.partial_pages = 0
+        self.bytes_downloaded = 0
+
+    async def _download(self, url: str, key: str, fetch) -> Optional[str]:
+        self.fetches += 1
+        content = await fetch(url)
+        if content:
+            self.bytes_downloaded += len(content.encode("utf-8", "replace"))
+        if not isinstance(content, fetch_client.PartialText):
+            self._pages[key] = content
+        return content
+
+    async def get(self, url: str) -> Optional[str]:
+        key = cache_key(url)
+        if key in self._pages:
+            self.fetches_saved += 1
+            return self._pages[key]
+        return await self._download(url, key, self._fetch)
+
+    async def page(self, url: str, *, partial: bool = False) -> Optional[ParsedPage]:
+        key = cache_key(url)
+        cached = self._parsed.get(key)
+        if cached is None and partial:
+            cached = self._partial.get(key)
+        if cached is not None:
+            self.fetches_saved += 1
+            self.parses_saved += 1
+            return cached
+
+        if partial and self._fetch_partial is not None and key not in self._pages:
+            content = await self._download(url, key, self._fetch_partial)
+        else:
+            content = await self.get(url)
+        if content is None:
+            return None
+        self.parses += 1
+        page = await parse_pool.parse_async(content)
+        if isinstance(content, fetch_client.PartialText):
+            self.partial_pages += 1
+            self._partial[key] = page
+        else:
+            self._parsed[key] = page
+        return page
+
+    def is_partial(self, url: str) -> bool:
+        key = cache_key(url)
+        return key in self._partial and key not in self._parsed
+
+
+async def crawl_site_for_email(
+    base_url: str,
+    cache: AsyncPageCache,
+    max_depth: int = 1,
+    budget: Optional[CrawlBudget] = None,
+) -> Optional[str]:
+    """Async version of :func:`update_contact_info.crawl_site_for_email`."""
+
+    domain = urlparse(base_url).netloc
+    frontier = Frontier()
+    frontier.push(base_url, 0)
+    collector = EmailCollector(base_url, budget) if budget is not None else None
+
+    while frontier:
+        if collector is not None and collector.exhausted(cache.bytes_downloaded):
+            break
+        url, depth = frontier.pop()
+        page = await cache.page(url, partial=collector is None)
+        if collector is not None:
+            if collector.visit(url, page):
+                break
+        elif page is not None:
+            email = _email_on_page(page)
+            if email:
+                return email
+        if page is None:
+            continue
+
+        if depth < max_depth:
+            for link, text in _same_domain_links(page, url, domain):
+                if frontier.push(link, depth + 1, text) and collector is not None:
+                    collector.link(link, text)
+    return collector.best() if collector is not None else None
+
+
+async def find_contact_form(page, base_url: str, cache: AsyncPageCache) -> Optional[str]:
+    """Async version of :func:`update_contact_info.find_contact_form`."""
+
+    for link in _contact_form_candidates(as_page(page), base_url):
+        target = await cache.page(link, partial=True)
+        if target is not None and not target.has_form and cache.is_partial(link):
+            target = await cache.page(link)
+        if target is not None and target.has_form:
+            return link
+    return None
+
+
+def map_in_order(
+    func: Callable[[_T, AsyncFetcher], Awaitable[_R]],
+    items: Sequence[_T],
+    *,
+    workers: int,
+    fetcher: AsyncFetcher,
+) -> Iterator[_R]:
+    """Yield ``await func(item, fetcher)`` for ``items`` in order.
+
+    The coroutines run on an event loop in a background thread with at most
+    ``workers`` of them active at once, so the caller can keep consuming
+    (and writing) results while later items are still being crawled.  As in
+    the thread path, at most ``2 * workers`` items are submitted at a time so
+    that a large sheet does not hold every pending row and result in memory.
+    ``func`` must not raise.
+    """
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, name="crawl-loop", daemon=True)
+    thread.start()
+    window: deque[Future] = deque()
+    try:
+        asyncio.run_coroutine_threadsafe(fetcher.open(), loop).result()
+        semaphore = asyncio.Semaphore(max(1, workers))
+
+        async def bounded(item: _T) -> _R:
+            async with semaphore:
+                return await func(item, fetcher)
+
+        def submit(item: _T):
+            return asyncio.run_coroutine_threadsafe(bounded(item), loop)
+
+        iterator = iter(items)
+        window.extend(submit(item) for item in islice(iterator, max(1, workers) * 2))
+        while window:
+            future = window.popleft()
+            for item in islice(iterator, 1):
+                window.append(submit(item))
+            yield future.result()
+    finally:
+        for future in window:
+            future.cancel()
+        asyncio.run_coroutine_threadsafe(fetcher.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
@@ -0,0 +1,82 @@
+"""Compare the linear-time e-mail scanner with the previous regex pipeline.
+
+Two workloads are timed: the visible text of every page in the saved café
+corpus and synthetic hostile inputs of growing size, where the old
+``finditer`` pass degrades quadratically::
+
+    python benchmarks/bench_email_scanner.py --repeat 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import html
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import email_scanner  # noqa: E402
+import page_parser  # noqa: E402
+from update_contact_info import EMAIL_RE  # noqa: E402
+
+CORPUS = Path(__file__).resolve().parent / "corpus"
+HOSTILE = {
+    "letters": lambda n: "a" * n,
+    "dotted domain": lambda n: "a@" + "a." * (n // 2),
+    "no @": lambda n: "a." * (n // 2),
+}
+
+
+def legacy(text):
+    text = html.unescape(text)
+    for pattern in ["[at]", "(at)", "＠"]:
+        text = text.replace(pattern, "@")
+    return [match.group(0) for match in EMAIL_RE.finditer(text)]
+
+
+def scanner(text):
+    return list(email_scanner.iter_emails(text))
+
+
+def timed(func, texts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            func(text)
+    return (time.perf_counter() - start) / repeat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2_000, 8_000, 32_000])
+    args = parser.parse_args(argv)
+
+    texts = [
+        page_parser.parse(path.read_text(encoding="utf-8"), "fast").text
+        for path in sorted(CORPUS.glob("*/*.html"))
+    ]
+    mismatches = sum(legacy(text) != scanner(text) for text in texts)
+    old = timed(legacy, texts, args.repeat)
+    new = timed(scanner, texts, args.repeat)
+    print(
+        f"corpus ({len(texts)} pages): regex {old * 1000:.2f} ms, "
+        f"scanner {new * 1000:.2f} ms ({old / new:.1f}x), mismatches: {mismatches}"
+    )
+
+    for name, build in HOSTILE.items():
+        for size in args.sizes:
+            text = build(size)
+            old = timed(legacy, [text], 1)
+            new = timed(scanner, [text], 1)
+            print(
+                f"{name:14s} {size:>7d} chars: regex {old * 1000:9.2f} ms, "
+                f"scanner {new * 1000:7.2f} ms"
+            )
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+"""Compare the compiled e-mail scorer with the previous select_best_email.
+
+Random candidate lists, built from the same pieces as the equivalence test,
+are scored by the legacy implementation (the copy kept in
+``tests/test_email_scoring.py``), by the compiled :func:`select_best_email`
+and by one :func:`email_scoring.score_candidates` call over all of them::
+
+    python benchmarks/bench_email_scoring.py --rows 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "tests"))
+
+import email_scoring  # noqa: E402
+from test_email_scoring import _candidate, legacy_select_best_email  # noqa: E402
+
+
+def timed(func, rows, site, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for candidates in rows:
+            func(candidates, site)
+    return (time.perf_counter() - start) / repeat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--candidates", type=int, default=8, help="Candidates per row")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    rows = [
+        [_candidate(rng) for _ in range(rng.randint(1, args.candidates))]
+        for _ in range(args.rows)
+    ]
+    site = "https://cafe.com"
+    total = sum(len(candidates) for candidates in rows)
+
+    legacy = timed(legacy_select_best_email, rows, site, args.repeat)
+    compiled = timed(email_scoring.select_best_email, rows, site, args.repeat)
+    flat = [candidate for candidates in rows for candidate in candidates]
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        email_scoring.score_candidates(flat, site)
+    batch = (time.perf_counter() - start) / args.repeat
+
+    print(f"{args.rows} rows, {total} candidates")
+    print(f"legacy            {total / legacy:10.0f} candidates/s")
+    print(f"compiled          {total / compiled:10.0f} candidates/s ({legacy / compiled:.1f}x)")
+    print(f"score_candidates  {total / batch:10.0f} candidates/s ({legacy / batch:.1f}x)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
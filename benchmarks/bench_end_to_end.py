@@ -0,0 +1,350 @@
+"""Run both sheet updaters end to end against the saved café corpus.
+
+Every site under ``benchmarks/corpus`` is served by its own local HTTP server
+(``/`` is ``index.html``, ``/contact`` is ``contact.html``), with an optional
+delay per request and randomly injected 503 and 403 responses.  A sheet of
+``--rows`` rows pointing at those servers is processed by
+``update_contact_info.process_sheet`` (an Excel file) and by
+``update_contact_info_api.process_sheet`` (the in-memory sheet of the tests).
+Each run reports rows/s, fetches and bytes per row and the p50/p95 time to
+crawl a row.  ``--save-baseline`` stores the results; later runs with the same
+settings are compared with them and exit with status 1 on a regression::
+
+    python benchmarks/bench_end_to_end.py --rows 60 --latency-ms 20 --save-baseline
+    python benchmarks/bench_end_to_end.py --rows 60 --latency-ms 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import json
+import logging
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "tests"))
+
+import fetch_client  # noqa: E402
+import retry_policy  # noqa: E402
+import update_contact_info  # noqa: E402
+import update_contact_info_api as api  # noqa: E402
+from test_update_contact_info_api_process import FakeService  # noqa: E402
+
+CORPUS = Path(__file__).resolve().parent / "corpus"
+BASELINE = Path(__file__).resolve().parent / "baseline.json"
+WORKSHEET = "抹茶営業リスト（カフェ）"
+TARGETS = ("legacy", "api")
+# Metric name -> whether a higher value is better.
+METRICS = {
+    "rows_per_sec": True,
+    "fetches_per_row": False,
+    "bytes_per_row": False,
+    "p50_ms": False,
+    "p95_ms": False,
+}
+# Rows are served under /r<n>/ so that every row is a homepage of its own
+# instead of being deduplicated into one crawl per site.
+_ROW_PREFIX = re.compile(r"^/r\d+(?=/|$)")
+
+
+class CorpusServer:
+    """Serve every corpus site from its own local port and count the traffic."""
+
+    def __init__(self, corpus, *, latency=0.0, error_rate=0.0, forbidden_rate=0.0, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.forbidden_rate = forbidden_rate
+        self.seed = seed
+        self.sites = {
+            site.name: {page.stem: page.read_bytes() for page in site.glob("*.html")}
+            for site in sorted(corpus.iterdir())
+            if site.is_dir()
+        }
+        self.requests = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._servers = []
+
+    def start(self):
+        """Start the servers and return ``{site: base_url}``."""
+
+        urls = {}
+        for name, pages in self.sites.items():
+            server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+            server.daemon_threads = True
+            server.corpus = self
+            server.pages = pages
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self._servers.append(server)
+            urls[name] = f"http://127.0.0.1:{server.server_address[1]}"
+        return urls
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.bytes = 0
+            self._rng = random.Random(self.seed)
+
+    def close(self):
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+
+    def respond(self, pages, path):
+        """Return ``(status, body)`` for ``path`` on the site with ``pages``."""
+
+        with self._lock:
+            self.requests += 1
+            draw = self._rng.random()
+        if self.latency:
+            time.sleep(self.latency)
+        path = _ROW_PREFIX.sub("", urlsplit(path).path).rstrip("/")
+        name = path.rsplit("/", 1)[-1] or "index"
+        if draw < self.error_rate:
+            status, body = 503, b"Service Unavailable"
+        elif draw < self.error_rate + self.forbidden_rate:
+            status, body = 403, b"Forbidden"
+        elif name in pages:
+            status, body = 200, pages[name]
+        else:
+            status, body = 404, b"Not Found"
+        with self._lock:
+            self.bytes += len(body)
+        return status, body
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like real sites
+
+    def do_GET(self):
+        status, body = self.server.corpus.respond(self.server.pages, self.path)
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RowTimer:
+    """Collect how long each call of the wrapped row crawl takes."""
+
+    def __init__(self):
+        self.seconds = []
+        self._lock = threading.Lock()
+
+    def _record(self, start):
+        with self._lock:
+            self.seconds.append(time.perf_counter() - start)
+
+    def wrap(self, func):
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._record(start)
+
+        return timed
+
+    def wrap_async(self, func):
+        @functools.wraps(func)
+        async def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                self._record(start)
+
+        return timed
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of ``values``."""
+
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def row_urls(sites, rows):
+    names = sorted(sites)
+    return [f"{sites[names[i % len(names)]]}/r{i}/" for i in range(rows)]
+
+
+def _patched(module, name, replacement):
+    original = getattr(module, name)
+    setattr(module, name, replacement)
+    return lambda: setattr(module, name, original)
+
+
+def run_legacy(urls, timer, args):
+    import openpyxl
+
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = WORKSHEET
+    sheet.append(["店名", "", "URL"])
+    for i, url in enumerate(urls):
+        sheet.append([f"cafe {i}", "", url])
+    restore = _patched(
+        update_contact_info, "_crawl_homepage", timer.wrap(update_contact_info._crawl_homepage)
+    )
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = str(Path(tmp) / "bench.xlsx")
+            workbook.save(path)
+            update_contact_info.process_sheet(path, worksheet=WORKSHEET)
+    finally:
+        restore()
+
+
+def run_api(urls, timer, args):
+    service = FakeService([[f"cafe {i}", "", url] for i, url in enumerate(urls)], WORKSHEET)
+    restores = [
+        _patched(api, "_build_sheet_service", lambda credentials_file: service),
+        _patched(api, "_crawl_row", timer.wrap(api._crawl_row)),
+        _patched(api, "_crawl_row_async", timer.wrap_async(api._crawl_row_async)),
+    ]
+    try:
+        api.process_sheet(
+            "bench",
+            WORKSHEET,
+            2,
+            None,
+            args.timeout,
+            True,
+            "",
+            workers=args.workers,
+            engine=args.engine,
+        )
+    finally:
+        for restore in restores:
+            restore()
+
+
+def measure(target, server, urls, args):
+    server.reset()
+    fetch_client.configure()
+    retry_policy.configure(breakers=retry_policy.CircuitBreakers())
+    timer = RowTimer()
+    run = run_legacy if target == "legacy" else run_api
+    start = time.perf_counter()
+    run(urls, timer, args)
+    elapsed = time.perf_counter() - start
+    rows = len(urls)
+    return {
+        "rows_per_sec": rows / elapsed,
+        "fetches_per_row": server.requests / rows,
+        "bytes_per_row": server.bytes / rows,
+        "p50_ms": percentile(timer.seconds, 0.50) * 1000,
+        "p95_ms": percentile(timer.seconds, 0.95) * 1000,
+    }
+
+
+def regressions(results, baseline, tolerance):
+    """Return a description of every metric worse than ``baseline`` by more than ``tolerance``."""
+
+    found = []
+    for target, metrics in results.items():
+        saved = baseline.get(target)
+        if saved is None:
+            continue
+        for name, higher_is_better in METRICS.items():
+            old, new = saved.get(name), metrics[name]
+            if not old:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                found.append(f"{target} {name}: {new:.1f} vs {old:.1f} ({change:+.0%})")
+    return found
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=60)
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=list(TARGETS))
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay of every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of 503 responses")
+    parser.add_argument("--forbidden-rate", type=float, default=0.0, help="Share of 403 responses")
+    parser.add_argument("--workers", type=int, default=1, help="Workers of the API updater")
+    parser.add_argument("--engine", choices=api.ENGINES, default="threads")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", type=Path, default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="Allowed change before a metric regresses"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.ERROR)
+    config = {
+        "rows": args.rows,
+        "latency_ms": args.latency_ms,
+        "error_rate": args.error_rate,
+        "forbidden_rate": args.forbidden_rate,
+        "workers": args.workers,
+        "engine": args.engine,
+        "seed": args.seed,
+    }
+    server = CorpusServer(
+        CORPUS,
+        latency=args.latency_ms / 1000,
+        error_rate=args.error_rate,
+        forbidden_rate=args.forbidden_rate,
+        seed=args.seed,
+    )
+    urls = row_urls(server.start(), args.rows)
+    try:
+        results = {target: measure(target, server, urls, args) for target in args.targets}
+    finally:
+        server.close()
+        fetch_client.configure()
+
+    print(f"{args.rows} rows over {len(server.sites)} sites")
+    print(f"{'target':8} {'rows/s':>8} {'fetches/row':>12} {'KiB/row':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for target, m in results.items():
+        print(
+            f"{target:8} {m['rows_per_sec']:8.1f} {m['fetches_per_row']:12.2f} "
+            f"{m['bytes_per_row'] / 1024:8.1f} {m['p50_ms']:8.1f} {m['p95_ms']:8.1f}"
+        )
+
+    if args.save_baseline:
+        args.baseline.write_text(
+            json.dumps({"config": config, "results": results}, indent=2) + "\n",
+            encoding="utf-8",
+        )
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        return 0
+    saved = json.loads(args.baseline.read_text(encoding="utf-8"))
+    if saved.get("config") != config:
+        print(f"{args.baseline} was recorded with other settings; not compared")
+        return 0
+    found = regressions(results, saved.get("results", {}), args.tolerance)
+    for line in found:
+        print(f"REGRESSION {line}")
+    if not found:
+        print(f"No regression against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
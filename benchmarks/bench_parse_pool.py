@@ -0,0 +1,60 @@
+"""Measure page parsing throughput with and without the worker process pool.
+
+The saved café corpus is parsed from a pool of crawl threads, the way
+concurrent rows parse their pages, first in the threads themselves and then
+through :mod:`parse_pool` with a growing number of worker processes::
+
+    python benchmarks/bench_parse_pool.py --threads 16 --pages 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import page_parser  # noqa: E402
+import parse_pool  # noqa: E402
+
+CORPUS = Path(__file__).resolve().parent / "corpus"
+
+
+def throughput(pages, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(parse_pool.parse, pages))
+    return len(pages) / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--parser", choices=page_parser.available_parsers(), default="html.parser")
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=sorted({1, 2, os.cpu_count() or 1})
+    )
+    args = parser.parse_args(argv)
+
+    page_parser.set_default_parser(args.parser)
+    corpus = [path.read_text(encoding="utf-8") for path in sorted(CORPUS.glob("*/*.html"))]
+    pages = [corpus[i % len(corpus)] for i in range(args.pages)]
+
+    baseline = throughput(pages, args.threads)
+    print(f"in-process   {baseline:8.0f} pages/s")
+    for workers in args.workers:
+        parse_pool.configure(workers)
+        throughput(pages[: workers * 4], args.threads)  # start the workers
+        rate = throughput(pages, args.threads)
+        print(f"{workers:2d} worker(s) {rate:8.0f} pages/s ({rate / baseline:.1f}x)")
+    parse_pool.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""Compare the HTML parser backends on the saved café corpus.
+
+Every page under ``benchmarks/corpus`` is parsed repeatedly with each backend
+in :data:`page_parser.PARSERS` that is installed.  The script prints the time
+per page and checks that each backend yields the same extraction results as
+``html.parser`` (Instagram link, e-mail, contact form candidates and form
+presence)::
+
+    python benchmarks/bench_parsers.py --repeat 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import page_parser  # noqa: E402
+from update_contact_info import (  # noqa: E402
+    _contact_form_candidates,
+    _email_on_page,
+    find_instagram,
+)
+
+CORPUS = Path(__file__).resolve().parent / "corpus"
+BASE_URL = "https://cafe.example/"
+
+
+def load_corpus(directory=CORPUS):
+    """Return ``{relative path: html}`` for every saved page."""
+
+    return {
+        str(path.relative_to(directory)): path.read_text(encoding="utf-8")
+        for path in sorted(directory.glob("*/*.html"))
+    }
+
+
+def extract(page):
+    return (
+        find_instagram(page, BASE_URL),
+        _email_on_page(page),
+        tuple(_contact_form_candidates(page, BASE_URL)),
+        page.has_form,
+    )
+
+
+def bench(pages, parser, repeat):
+    """Return ``(seconds per page, {name: extraction})`` for ``parser``."""
+
+    results = {}
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for name, content in pages.items():
+            results[name] = page_parser.parse(content, parser)
+    elapsed = time.perf_counter() - start
+    return elapsed / (repeat * len(pages)), {
+        name: extract(page) for name, page in results.items()
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--corpus", type=Path, default=CORPUS)
+    args = parser.parse_args(argv)
+
+    pages = load_corpus(args.corpus)
+    total_kb = sum(len(c.encode("utf-8")) for c in pages.values()) / 1024
+    print(f"{len(pages)} pages, {total_kb:.0f} KiB, {args.repeat} rounds")
+
+    baseline = None
+    mismatches = 0
+    for name in page_parser.available_parsers():
+        per_page, extracted = bench(pages, name, args.repeat)
+        if baseline is None:
+            baseline = (per_page, extracted)
+        differing = [page for page in pages if extracted[page] != baseline[1][page]]
+        mismatches += len(differing)
+        print(
+            f"{name:12s} {per_page * 1000:8.2f} ms/page "
+            f"{baseline[0] / per_page:6.1f}x  "
+            f"{'identical' if not differing else 'DIFFERS: ' + ', '.join(differing)}"
+        )
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
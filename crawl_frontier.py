@@ -0,0 +1,130 @@
+"""Prioritised, bounded crawl frontier for the e-mail crawl.
+
+The crawl used to follow every same-domain link in page order, so on a café
+site it spent most of its fetches on menus, galleries and blog posts before
+reaching the contact page.  :class:`Frontier` orders the links instead:
+
+* links whose URL or anchor text mentions a contact or company page
+  (``contact``, ``お問い合わせ``, ``about``, ``会社概要`` ...) are fetched first,
+  links to blog, news and shop listings last;
+* images, documents, media and other assets are never queued;
+* a URL (ignoring its fragment) is queued at most once;
+* at most ``max_size`` links are kept; when full, a better link replaces the
+  worst one.
+
+Links with the same score are visited shallowest first, then in discovery
+order, so without keywords the crawl is the old breadth-first walk.
+"""
+
+from __future__ import annotations
+
+import heapq
+from typing import List, Set, Tuple
+from urllib.parse import unquote, urlsplit
+
+from page_cache import cache_key
+
+DEFAULT_MAX_SIZE = 200
+
+KEYWORD_SCORES = (
+    (
+        (
+            "contact", "お問い合わせ", "お問合せ", "問い合わせ", "問合せ",
+            "inquiry", "enquiry", "toiawase", "mail",
+        ),
+        10,
+    ),
+    (
+        (
+            "about", "会社概要", "company", "profile", "corporate", "access",
+            "店舗情報", "アクセス", "運営", "impressum", "wholesale", "卸",
+        ),
+        5,
+    ),
+    (
+        (
+            "blog", "news", "gallery", "photo", "product", "collections",
+            "/category/", "/tag/", "cart", "login", "recruit", "お知らせ",
+        ),
+        -5,
+    ),
+)
+
+ASSET_EXTENSIONS = frozenset(
+    """
+    jpg jpeg png gif webp svg ico bmp tif tiff heic avif
+    pdf doc docx xls xlsx ppt pptx csv txt zip rar gz tgz 7z dmg exe
+    mp3 wav m4a ogg mp4 m4v mov avi webm wmv flv
+    css js mjs json xml rss atom woff woff2 ttf otf eot map
+    """.split()
+)
+
+
+def is_asset(url: str) -> bool:
+    """Return whether ``url`` points at a file that is not an HTML page."""
+
+    path = urlsplit(url).path
+    name = path.rsplit("/", 1)[-1]
+    if "." not in name:
+        return False
+    return name.rsplit(".", 1)[-1].lower() in ASSET_EXTENSIONS
+
+
+def score_link(url: str, text: str = "") -> int:
+    """Return how promising ``url`` (with anchor ``text``) is for finding contacts."""
+
+    parts = urlsplit(url)
+    haystack = " ".join(
+        (unquote(parts.path), unquote(parts.query), text or "")
+    ).lower()
+    return sum(
+        weight
+        for keywords, weight in KEYWORD_SCORES
+        if any(keyword in haystack for keyword in keywords)
+    )
+
+
+class Frontier:
+    """Priority queue of ``(url, depth)`` pairs still to be crawled."""
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE):
+        self.max_size = max_size
+        self._heap: List[Tuple[int, int, int, str]] = []
+        self._seen: Set[str] = set()
+        self._seq = 0
+        self.skipped_assets = 0
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, url: str, depth: int, text: str = "") -> bool:
+        """Queue ``url`` found at ``depth``; return ``False`` if it was not queued."""
+
+        key = cache_key(url)
+        if key in self._seen:
+            return False
+        self._seen.add(key)
+        if is_asset(url):
+            self.skipped_assets += 1
+            return False
+
+        entry = (-score_link(url, text), depth, self._seq, url)
+        self._seq += 1
+        if len(self._heap) < self.max_size:
+            heapq.heappush(self._heap, entry)
+            return True
+
+        worst = max(range(len(self._heap)), key=self._heap.__getitem__)
+        self.dropped += 1
+        if entry >= self._heap[worst]:
+            return False
+        self._heap[worst] = entry
+        heapq.heapify(self._heap)
+        return True
+
+    def pop(self) -> Tuple[str, int]:
+        """Return the most promising ``(url, depth)`` and remove it."""
+
+        _, depth, _, url = heapq.heappop(self._heap)
+        return url, depth
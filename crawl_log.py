@@ -0,0 +1,90 @@
+"""Local record of when each homepage was last crawled.
+
+The sheet only stores the results in columns D–G, not their age, so a run
+over the whole sheet cannot tell a lead crawled yesterday from one crawled a
+year ago.  :class:`CrawlLog` keeps that date in a small SQLite database next
+to the run journal, keyed by :func:`single_flight.homepage_key` so that it
+does not depend on row numbers, which change when the cleanup deletes rows.
+
+Rows that were already filled before the log existed have no date; the first
+run that sees them records when they were seen, so their age is counted from
+then instead of re-crawling the whole sheet at once.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from single_flight import homepage_key
+
+DB_FILENAME = "crawled.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS crawls (
+    homepage TEXT PRIMARY KEY,
+    crawled_at REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT ''
+);
+"""
+
+
+class CrawlLog:
+    """SQLite-backed crawl dates, one row per normalised homepage."""
+
+    def __init__(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(directory, DB_FILENAME), check_same_thread=False
+        )
+        self._db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def crawled_at(self, url: str) -> Optional[float]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT crawled_at FROM crawls WHERE homepage = ?", (homepage_key(url),)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def record(self, url: str, status: str = "", *, now: Optional[float] = None) -> None:
+        """Record that ``url`` was crawled (at ``now``) with result ``status``."""
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO crawls (homepage, crawled_at, status) "
+                "VALUES (?, ?, ?)",
+                (homepage_key(url), time.time() if now is None else now, status),
+            )
+            self._db.commit()
+
+    def is_stale(self, url: str, max_age: float, *, now: Optional[float] = None) -> bool:
+        """Return whether the stored result for ``url`` is older than ``max_age``.
+
+        An unknown homepage is recorded as seen now and is not stale.
+        """
+
+        now = time.time() if now is None else now
+        crawled_at = self.crawled_at(url)
+        if crawled_at is None:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR IGNORE INTO crawls (homepage, crawled_at) VALUES (?, ?)",
+                    (homepage_key(url), now),
+                )
+                self._db.commit()
+            return False
+        return now - crawled_at > max_age
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM crawls").fetchone()
+        return {"homepages": count}
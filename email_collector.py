@@ -0,0 +1,120 @@
+"""Budgeted e-mail crawl that ranks every address it finds.
+
+By default :func:`update_contact_info.crawl_site_for_email` returns the first
+address that is not blocked, however poor it is: ``info@`` on the homepage
+wins over ``wholesale@`` on the contact page.  When the crawl is given a
+:class:`CrawlBudget` it uses an :class:`EmailCollector` instead, which:
+
+* collects every address with the page it was found on (``source_url``) and
+  the text of the ``mailto:`` link or of the link that led to the page
+  (``anchor_text``);
+* stops as soon as one address scores at least ``confident_score`` with
+  :mod:`email_scoring` (by default a purchasing/wholesale style address on
+  the site's own domain);
+* otherwise stops after ``max_pages`` pages or once the row's page cache
+  has downloaded ``max_kb`` KiB;
+* picks the best address with :func:`email_scoring.select_best_email`.
+
+The process-wide budget is returned by :func:`get_budget`; ``None`` (the
+default) keeps the first-address crawl.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import email_scoring
+from page_cache import cache_key
+from page_parser import ParsedPage
+
+DEFAULT_MAX_PAGES = 8
+DEFAULT_MAX_KB = 1024
+# A STRONG_PLUS local part (6) on the site's own domain (2).
+DEFAULT_CONFIDENT_SCORE = 8
+
+
+@dataclass(frozen=True)
+class CrawlBudget:
+    """Limits of the collecting crawl for one row; ``0`` disables a limit."""
+
+    max_pages: int = DEFAULT_MAX_PAGES
+    max_kb: int = DEFAULT_MAX_KB
+    confident_score: int = DEFAULT_CONFIDENT_SCORE
+
+
+def page_candidates(page: ParsedPage, url: str, link_text: str = "") -> List[dict]:
+    """Return the ``select_best_email`` candidates on ``page`` in page order."""
+
+    candidates = []
+    for href, text in page.anchors:
+        if href.lower().startswith("mailto:"):
+            email = re.sub(r"^mailto:", "", href, flags=re.I).split("?")[0]
+            candidates.append(
+                {"email": email, "source_url": url, "anchor_text": text or link_text}
+            )
+    for email in page.text_emails():
+        candidates.append({"email": email, "source_url": url, "anchor_text": link_text})
+    return candidates
+
+
+class EmailCollector:
+    """Candidates found so far by one budgeted crawl of ``site_url``."""
+
+    def __init__(self, site_url: str, budget: CrawlBudget):
+        self.site_url = site_url
+        self.budget = budget
+        self.candidates: List[dict] = []
+        self.pages = 0
+        self.confident = False
+        self._emails: set = set()
+        self._link_text: Dict[str, str] = {}
+
+    def link(self, url: str, text: str) -> None:
+        """Remember the text of the link through which ``url`` was queued."""
+
+        self._link_text.setdefault(cache_key(url), text or "")
+
+    def visit(self, url: str, page: Optional[ParsedPage]) -> bool:
+        """Collect the addresses on ``page``; return whether the crawl can stop."""
+
+        self.pages += 1
+        if page is None:
+            return False
+        for candidate in page_candidates(page, url, self._link_text.get(cache_key(url), "")):
+            key = candidate["email"].strip().lower()
+            if key in self._emails:
+                continue
+            self._emails.add(key)
+            self.candidates.append(candidate)
+            scored = email_scoring.score_candidates([candidate], self.site_url)[0]
+            if scored and scored[0] == "keep" and scored[2] >= self.budget.confident_score:
+                self.confident = True
+        return self.confident
+
+    def exhausted(self, bytes_downloaded: int) -> bool:
+        """Return whether the page or byte budget is used up."""
+
+        budget = self.budget
+        return bool(
+            (budget.max_pages and self.pages >= budget.max_pages)
+            or (budget.max_kb and bytes_downloaded >= budget.max_kb * 1024)
+        )
+
+    def best(self) -> Optional[str]:
+        return email_scoring.select_best_email(self.candidates, self.site_url)[0]
+
+
+_budget: Optional[CrawlBudget] = None
+
+
+def get_budget() -> Optional[CrawlBudget]:
+    return _budget
+
+
+def configure(budget: Optional[CrawlBudget]) -> None:
+    """Use ``budget`` for the e-mail crawl from now on (``None``: first address)."""
+
+    global _budget
+    _budget = budget
@@ -0,0 +1,89 @@
+"""Linear-time e-mail address scanner for page text.
+
+:func:`iter_emails` yields exactly the addresses that
+``update_contact_info.EMAIL_RE`` (``[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\\.[A-Za-z]{2,}``)
+finds with ``finditer``, but without running the regex over the whole page.
+The regex backtracks on every position of long letter/dot runs, which makes
+hostile or just unlucky pages (minified data, long URLs, ASCII art) cost
+quadratic time.  The scanner jumps from one ``@`` to the next with
+:meth:`str.find` and only walks the characters around each ``@``; every
+character is visited a bounded number of times.
+
+Before scanning, the text is normalised the way the extractors always did:
+HTML entities are decoded and the ``[at]``/``(at)`` spellings become ``@``
+in a single substitution.  Full-width ASCII (``＠`` as before, but now also
+``ｉｎｆｏ＠ｃａｆｅ．ｊｐ``, common on Japanese sites) is folded to ASCII.
+"""
+
+from __future__ import annotations
+
+import html
+import re
+import string
+from typing import Iterator, Optional
+
+_LOCAL = frozenset(string.ascii_letters + string.digits + "._%+-")
+_DOMAIN = frozenset(string.ascii_letters + string.digits + ".-")
+_ALPHA = frozenset(string.ascii_letters)
+
+_FULLWIDTH_RE = re.compile("[！-～]")
+_FULLWIDTH_TO_ASCII = {code: code - 0xFEE0 for code in range(0xFF01, 0xFF5F)}
+_OBFUSCATED_AT_RE = re.compile(r"\[at\]|\(at\)")
+
+
+def normalize(text: str) -> str:
+    """Decode entities, fold full-width ASCII and spell out obfuscated ``@``."""
+
+    if "&" in text:
+        text = html.unescape(text)
+    if _FULLWIDTH_RE.search(text):
+        text = text.translate(_FULLWIDTH_TO_ASCII)
+    return _OBFUSCATED_AT_RE.sub("@", text)
+
+
+def _domain_end(text: str, start: int) -> Optional[int]:
+    """Return where the domain starting at ``start`` ends, or ``None``.
+
+    The domain is the longest run of domain characters up to the last dot
+    that is followed by at least two letters, plus those letters; this is
+    what the greedy regex settles on after backtracking.
+    """
+
+    size = len(text)
+    run_end = start
+    while run_end < size and text[run_end] in _DOMAIN:
+        run_end += 1
+
+    dot = run_end - 3
+    while dot > start:
+        if text[dot] == "." and text[dot + 1] in _ALPHA and text[dot + 2] in _ALPHA:
+            end = dot + 3
+            while end < run_end and text[end] in _ALPHA:
+                end += 1
+            return end
+        dot -= 1
+    return None
+
+
+def scan(text: str) -> Iterator[str]:
+    """Yield the e-mail addresses in already normalised ``text`` in order."""
+
+    pos = 0
+    at = text.find("@")
+    while at != -1:
+        start = at
+        while start > pos and text[start - 1] in _LOCAL:
+            start -= 1
+        end = _domain_end(text, at + 1) if start < at else None
+        if end is None:
+            at = text.find("@", at + 1)
+            continue
+        yield text[start:end]
+        pos = end
+        at = text.find("@", end)
+
+
+def iter_emails(text: str) -> Iterator[str]:
+    """Yield the e-mail addresses in page ``text`` in document order."""
+
+    return scan(normalize(text))
@@ -0,0 +1,300 @@
+"""Compiled scorer that picks the best contact e-mail among candidates.
+
+:func:`select_best_email` used to rebuild its keyword tuples and closures on
+every call and test each candidate against about 80 keywords with separate
+``any(k in text for k in ...)`` scans, repeat some of them for the
+tie-break and run the whole pass again when nothing was kept.  Here:
+
+* every keyword group is compiled once into one alternation regex, so each
+  group is a single ``search`` (one regex per group keeps overlapping
+  keywords of different groups, such as ``wholesales``, matching as before);
+* what a local part, a source URL path or an anchor text matches is cached,
+  since the same addresses and pages come up again and again;
+* everything that does not depend on the relaxed pass is worked out once per
+  candidate, and the relaxed pass only redoes the final arithmetic.
+
+:func:`score_candidates` scores a whole batch in one call.  Results are
+identical to the original implementation (``tests/test_email_scoring.py``
+checks them against a copy of it).
+"""
+
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import Iterable, List, NamedTuple, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+BLOCK_LOCAL = (
+    'jobs','job','career','careers','recruit','recruitment','hiring','hr','talent',
+    'press','media','pr',
+    'billing','invoice','accounting','finance',
+    'legal','law','privacy','copyright','dmca','abuse','compliance','security',
+    'admin','webmaster','postmaster','hostmaster',
+    'noreply','donotreply'
+)
+SUPPORT_LOCAL = ('support','helpdesk','help')
+
+STRONG_PLUS = (
+    'wholesale','purchasing','procurement','buyer','buying','sourcing',
+    'supplier','supplies','supply','vendor','vendors',
+    'trade','distributor','distribution','bulk'
+)
+MID_PLUS    = ('owner','manager','operations','beverage','fnb','foodandbeverage')
+SOFT_PLUS   = ('info','contact','hello','enquiries','inquiries','inquiry','team','partnership','partnerships')
+WEAK_PLUS   = ('sales','orders')
+
+CONSUMER_ORDER_PATH = (
+    '/order','/order-online','/online-order','/orderonline',
+    '/pickup','/takeout','/delivery','/menu','/menus','/catering','/gift-card','/giftcards'
+)
+CONSUMER_ANCHOR = (
+    'order online','order now','takeout','pickup','delivery',
+    'ubereats','doordash','grubhub','deliveroo','menu'
+)
+TRADE_HINTS = ('wholesale','trade','distributor','bulk','b2b','wholesale orders','trade orders')
+PURPOSE_PATH = (
+    '/job','/jobs','/career','/careers','/recruit','/hiring',
+    '/press','/media','/legal','/privacy','/terms','/dmca',
+    '/billing','/invoice'
+)
+PURPOSE_ANCHOR = (
+    'career','careers','recruit','hiring','press','media','legal','privacy','billing','invoice','dmca'
+)
+
+_CACHE_SIZE = 16384
+
+
+def _compile(keywords: Iterable[str]) -> "re.Pattern[str]":
+    # Longest first only matters for speed: ``search`` reports whether any
+    # alternative occurs, which is exactly ``any(k in text ...)``.
+    return re.compile("|".join(re.escape(k) for k in sorted(set(keywords), key=len, reverse=True)))
+
+
+_BLOCK_LOCAL_RE = _compile(BLOCK_LOCAL)
+_SUPPORT_LOCAL_RE = _compile(SUPPORT_LOCAL)
+# Tiers in the order the tie-break checks them, with their score.
+_TIERS = (
+    (_compile(STRONG_PLUS), 6),
+    (_compile(MID_PLUS), 4),
+    (_compile(SOFT_PLUS), 3),
+    (_compile(WEAK_PLUS), 1),
+)
+_PURPOSE_PATH_RE = _compile(PURPOSE_PATH)
+_PURPOSE_ANCHOR_RE = _compile(PURPOSE_ANCHOR)
+_CONSUMER_PATH_RE = _compile(CONSUMER_ORDER_PATH)
+_CONSUMER_ANCHOR_RE = _compile(CONSUMER_ANCHOR)
+_TRADE_RE = _compile(TRADE_HINTS)
+
+
+class _LocalInfo(NamedTuple):
+    blocked: bool
+    support: bool
+    orders: bool
+    score: int
+    tier: int
+
+
+class _TextInfo(NamedTuple):
+    purpose: bool
+    consumer: bool
+    trade: bool
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def _local_info(nlocal: str) -> _LocalInfo:
+    matched = [points for pattern, points in _TIERS if pattern.search(nlocal)]
+    return _LocalInfo(
+        blocked=_BLOCK_LOCAL_RE.search(nlocal) is not None,
+        support=_SUPPORT_LOCAL_RE.search(nlocal) is not None,
+        orders="orders" in nlocal or nlocal == "order",
+        score=sum(matched),
+        tier=matched[0] if matched else 0,
+    )
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def _source_info(src: str) -> Tuple[str, _TextInfo]:
+    """Return the host of ``src`` and what its path matches."""
+
+    if not src:
+        return "", _TextInfo(False, False, False)
+    parsed = urlparse(src)
+    path = parsed.path.lower()
+    return parsed.netloc.lower(), _TextInfo(
+        purpose=_PURPOSE_PATH_RE.search(path) is not None,
+        consumer=_CONSUMER_PATH_RE.search(path) is not None,
+        trade=_TRADE_RE.search(path) is not None,
+    )
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def _anchor_info(anchor: str) -> _TextInfo:
+    return _TextInfo(
+        purpose=_PURPOSE_ANCHOR_RE.search(anchor) is not None,
+        consumer=_CONSUMER_ANCHOR_RE.search(anchor) is not None,
+        trade=_TRADE_RE.search(anchor) is not None,
+    )
+
+
+def _host_from_url(url: str) -> str:
+    return urlparse(url).netloc.lower() if url else ""
+
+
+def _same_site(a: str, b: str) -> bool:
+    return a == b or a.endswith("." + b)
+
+
+def _norm_local(local: str) -> str:
+    local = local.lower().split("+", 1)[0]
+    return local.replace(".", "")
+
+
+class _Scored(NamedTuple):
+    """A candidate that passed every check that does not depend on ``relax``."""
+
+    email: str
+    score: int
+    tier: int
+    same: bool
+    support: bool
+    local_length: int
+
+
+Blocked = Tuple[str, str, str]
+Kept = Tuple[str, str, int, tuple]
+Score = Optional[Union[Blocked, Kept]]
+
+
+def _prepare(candidate: dict, base_host: str) -> Union[None, Blocked, _Scored]:
+    email = (candidate.get('email') or '').strip()
+    if not email or '@' not in email:
+        return None
+    if 'catering' in email.lower():
+        return ('blocked', email, 'blocked:catering_address')
+
+    local, domain = email.split('@', 1)
+    info = _local_info(_norm_local(local))
+    host, path = _source_info(candidate.get('source_url') or '')
+    anchor = _anchor_info((candidate.get('anchor_text') or '').lower())
+
+    if info.blocked:
+        return ('blocked', email, 'blocked:purpose_mismatch')
+    if path.purpose or anchor.purpose:
+        return ('blocked', email, 'blocked:purpose_section')
+
+    bonus = 0
+    if info.orders:
+        if path.consumer or anchor.consumer:
+            return ('blocked', email, 'blocked:consumer_order_inbox')
+        if path.trade or anchor.trade:
+            bonus = 3
+
+    return _Scored(
+        email=email,
+        score=info.score + bonus,
+        tier=info.tier + bonus,
+        same=_same_site(domain.lower(), host or base_host),
+        support=info.support,
+        local_length=len(local),
+    )
+
+
+def _finish(
+    prepared: Union[None, Blocked, _Scored],
+    relax: bool,
+    allow_external: bool,
+    allow_support: bool,
+) -> Score:
+    if not isinstance(prepared, _Scored):
+        return prepared
+    s = prepared.score
+    if prepared.same:
+        s += 2
+    else:
+        s -= 1 if relax or allow_external else 2
+    if prepared.support:
+        if relax or allow_support:
+            s -= 2
+        else:
+            return ('blocked', prepared.email, 'blocked:support_only')
+    threshold = 1 if not relax else 0
+    if s < threshold:
+        return ('blocked', prepared.email, f'blocked:low_score({s})')
+    tie = (
+        0 if prepared.same else 1,
+        -prepared.tier,
+        prepared.local_length,
+        prepared.email,
+    )
+    return ('keep', prepared.email, s, tie)
+
+
+def score_candidates(
+    candidates: Iterable[dict],
+    site_url: str,
+    *,
+    relax: bool = False,
+    allow_external: bool = False,
+    allow_support: bool = False,
+) -> List[Score]:
+    """Score every candidate: ``None``, ``('blocked', email, reason)`` or
+    ``('keep', email, score, tie_break)``."""
+
+    base_host = _host_from_url(site_url)
+    return [
+        _finish(_prepare(c, base_host), relax, allow_external, allow_support)
+        for c in candidates
+    ]
+
+
+def _split(scores: Iterable[Score]) -> Tuple[list, list]:
+    kept = []
+    blocked = []
+    for res in scores:
+        if not res:
+            continue
+        if res[0] == 'keep':
+            kept.append(res[1:])
+        else:
+            blocked.append((res[1], res[2]))
+    return kept, blocked
+
+
+def select_best_email(candidates, site_url, allow_external=False, allow_support=False):
+    """Return the best e-mail candidate from ``candidates``.
+
+    Each candidate is a mapping with ``email``, ``source_url`` and
+    ``anchor_text`` keys.  ``site_url`` is used to determine whether the
+    e-mail address belongs to the same site.  The function returns
+    ``(best, notes, kept, blocked)`` where ``best`` is the chosen e-mail or
+    ``None`` when no suitable address was found, ``notes`` is a list of
+    diagnostic strings, ``kept`` is a list of kept e-mails and ``blocked`` is
+    a list of ``(email, reason)`` tuples describing rejected candidates.
+    """
+
+    base_host = _host_from_url(site_url)
+    prepared = [_prepare(c, base_host) for c in candidates]
+    kept, blocked = _split(
+        _finish(p, False, allow_external, allow_support) for p in prepared
+    )
+    notes = []
+    if not kept:
+        kept, blocked_relax = _split(
+            _finish(p, True, allow_external, allow_support) for p in prepared
+        )
+        seen = set(blocked)
+        for b in blocked_relax:
+            if b not in seen:
+                seen.add(b)
+                blocked.append(b)
+        if kept:
+            notes.append('relaxed')
+
+    best = None
+    if kept:
+        kept.sort(key=lambda x: (-x[1], x[2]))
+        best = kept[0][0]
+    kept_emails = [k[0] for k in kept]
+    return best, notes, kept_emails, blocked
+
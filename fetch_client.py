@@ -0,0 +1,337 @@
+"""Pooled keep-alive HTTP client shared by the ``_fetch_page`` implementations.
+
+Calling :func:`requests.get` creates a throw-away session for every request,
+so each page pays for DNS, TCP and TLS setup again.  :class:`FetchClient`
+keeps one :class:`requests.adapters.HTTPAdapter` whose urllib3 pools are
+shared by every thread.  Each thread gets its own :class:`requests.Session`
+(sessions carry cookie state and are not meant to be shared), but all of
+them mount the same adapter and therefore reuse the same warm connections.
+
+With ``max_bytes`` set the client streams response bodies instead of
+downloading them whole: responses whose ``Content-Type`` is not HTML are
+rejected before any of the body is read, bodies are cut off after
+``max_bytes`` bytes and a caller-supplied ``stop`` condition can end the
+download as soon as the interesting part of the page has arrived.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import logging
+import sqlite3
+import threading
+from typing import TYPE_CHECKING, Callable, List, Mapping, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from fetch_scheduler import FetchScheduler
+    from http_cache import HttpCache
+
+DEFAULT_POOL_SIZE = 64
+DEFAULT_PER_HOST = 4
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024
+STREAM_CHUNK_SIZE = 16 * 1024
+HTML_CONTENT_TYPES = ("text/html", "application/xhtml+xml", "text/plain")
+
+
+class NotHtmlError(requests.RequestException):
+    """The response is not an HTML page; its body was not downloaded."""
+
+
+class PartialText(str):
+    """Page text whose download was ended early by a ``stop`` condition."""
+
+
+def is_html(content_type: Optional[str]) -> bool:
+    """Return whether a ``Content-Type`` header value may be parsed as a page.
+
+    A missing header is accepted because many small sites do not send one.
+    """
+
+    if not content_type:
+        return True
+    return content_type.split(";", 1)[0].strip().lower() in HTML_CONTENT_TYPES
+
+
+class BodyLimiter:
+    """Collect a streamed body up to ``max_bytes`` or until ``stop`` matches.
+
+    ``stop`` is called with each new chunk prefixed by the last
+    :attr:`OVERLAP` bytes of the previous one, so a match split across two
+    chunks is still seen without rescanning the whole body.
+    """
+
+    OVERLAP = 512
+
+    def __init__(self, max_bytes: int, stop: Optional[Callable[[bytes], bool]] = None):
+        self.max_bytes = max_bytes
+        self.stop = stop
+        self.size = 0
+        self.capped = False
+        self.stopped_early = False
+        self._chunks: List[bytes] = []
+        self._tail = b""
+
+    def feed(self, chunk: bytes) -> bool:
+        """Add ``chunk`` and return ``False`` once no more data is wanted."""
+
+        room = self.max_bytes - self.size
+        if len(chunk) > room:
+            chunk = chunk[:room]
+            self.capped = True
+        self._chunks.append(chunk)
+        self.size += len(chunk)
+        if self.stop is not None and chunk:
+            window = self._tail + chunk
+            if self.stop(window):
+                self.stopped_early = True
+                return False
+            self._tail = window[-self.OVERLAP:]
+        return not self.capped
+
+    def body(self) -> bytes:
+        return b"".join(self._chunks)
+
+
+def response_text(response: requests.Response) -> str:
+    """Return the text of ``response``, as :class:`PartialText` if cut short."""
+
+    if getattr(response, "stopped_early", False):
+        return PartialText(response.text)
+    return response.text
+
+
+class FetchClient:
+    """Thread-safe HTTP client backed by pooled keep-alive connections.
+
+    ``pool_size`` is the number of per-host connection pools kept alive and
+    ``per_host`` caps the number of open connections to a single host.  When
+    every connection to a host is busy, further requests to that host wait
+    for one to be released instead of opening another.  With ``cache`` set
+    (an :class:`http_cache.HttpCache`) responses are served from and stored
+    in the persistent cache.  ``max_bytes`` turns on streaming (see the
+    module docstring); streamed responses carry ``truncated`` and
+    ``stopped_early`` flags.  With ``scheduler`` (a
+    :class:`fetch_scheduler.FetchScheduler`) every request waits for its
+    politeness slot before it reaches the network (fresh cache hits do not)
+    and holds it until the body has been read.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        per_host: int = DEFAULT_PER_HOST,
+        *,
+        cache: Optional["HttpCache"] = None,
+        max_bytes: Optional[int] = None,
+        scheduler: Optional["FetchScheduler"] = None,
+    ):
+        self.pool_size = pool_size
+        self.per_host = per_host
+        self.cache = cache
+        self.max_bytes = max_bytes
+        self.scheduler = scheduler
+        self._adapter = HTTPAdapter(
+            pool_connections=pool_size,
+            pool_maxsize=per_host,
+            pool_block=True,
+        )
+        self._local = threading.local()
+        self._sessions: list[requests.Session] = []
+        self._lock = threading.Lock()
+
+    def session(self) -> requests.Session:
+        """Return the calling thread's session, creating it on first use."""
+
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("http://", self._adapter)
+            session.mount("https://", self._adapter)
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def get(
+        self,
+        url: str,
+        *,
+        timeout: float,
+        verify: bool = True,
+        headers: Optional[Mapping[str, str]] = None,
+        stop: Optional[Callable[[bytes], bool]] = None,
+        **kwargs,
+    ) -> requests.Response:
+        """Issue a GET request for ``url`` over a pooled connection.
+
+        ``stop`` only applies when streaming is enabled.  Raises
+        :class:`NotHtmlError` for non-HTML responses when streaming.
+        """
+
+        with contextlib.ExitStack() as slots:
+            session: requests.Session = self.session()
+            if self.scheduler is not None:
+                session = _ScheduledSession(session, self.scheduler, slots)
+            if self.max_bytes is None:
+                return self._send(
+                    session, url, timeout=timeout, verify=verify, headers=headers, **kwargs
+                )
+            response = self._send(
+                session,
+                url,
+                timeout=timeout,
+                verify=verify,
+                headers=headers,
+                stream=True,
+                **kwargs,
+            )
+            return self._read(url, response, stop)
+
+    def _send(self, session: requests.Session, url: str, **kwargs) -> requests.Response:
+        if self.cache is not None:
+            return self.cache.get(session, url, **kwargs)
+        return session.get(url, **kwargs)
+
+    def _read(
+        self,
+        url: str,
+        response: requests.Response,
+        stop: Optional[Callable[[bytes], bool]],
+    ) -> requests.Response:
+        """Read at most ``max_bytes`` of a streamed ``response`` body."""
+
+        response.truncated = False
+        response.stopped_early = False
+        if getattr(response, "from_cache", False):
+            content_type = response.headers.get("Content-Type")
+            if not is_html(content_type):
+                raise NotHtmlError(f"not an HTML page ({content_type})", response=response)
+            return response
+        if response.status_code >= 300:
+            response.close()
+            return response
+        content_type = response.headers.get("Content-Type")
+        if not is_html(content_type):
+            response.close()
+            raise NotHtmlError(f"not an HTML page ({content_type})", response=response)
+
+        limiter = BodyLimiter(self.max_bytes, stop)
+        try:
+            for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                if not limiter.feed(chunk):
+                    break
+        finally:
+            response.close()
+        response._content = limiter.body()
+        response._content_consumed = True
+        response.truncated = limiter.capped
+        response.stopped_early = limiter.stopped_early
+
+        # A body cut short by ``stop`` or by ``max_bytes`` must not come back
+        # from the cache as the whole page.
+        if (
+            self.cache is not None
+            and response.status_code == 200
+            and not (limiter.stopped_early or limiter.capped)
+        ):
+            try:
+                self.cache.store(url, response)
+            except sqlite3.Error as exc:  # pragma: no cover - disk issues
+                logging.warning("Failed to cache %s: %s", url, exc)
+        return response
+
+    def close(self) -> None:
+        """Close every session and the shared connection pools."""
+
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
+        self._adapter.close()
+        self._local = threading.local()
+        if self.cache is not None:
+            self.cache.close()
+
+
+class _ScheduledSession:
+    """Session stand-in that takes a scheduler slot before each request.
+
+    The slot is entered on ``slots`` so that it stays held until the caller
+    has finished reading the response body.
+    """
+
+    def __init__(
+        self,
+        session: requests.Session,
+        scheduler: "FetchScheduler",
+        slots: contextlib.ExitStack,
+    ):
+        self._session = session
+        self._scheduler = scheduler
+        self._slots = slots
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        self._slots.enter_context(self._scheduler.slot(url))
+        return self._session.get(url, **kwargs)
+
+
+_client: Optional[FetchClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> FetchClient:
+    """Return the process-wide :class:`FetchClient`."""
+
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = FetchClient()
+        return _client
+
+
+def configure(
+    pool_size: int = DEFAULT_POOL_SIZE,
+    per_host: int = DEFAULT_PER_HOST,
+    *,
+    cache: Optional["HttpCache"] = None,
+    max_bytes: Optional[int] = None,
+    scheduler: Optional["FetchScheduler"] = None,
+) -> FetchClient:
+    """Replace the process-wide client with one using the given settings."""
+
+    global _client
+    with _client_lock:
+        previous, _client = _client, FetchClient(
+            pool_size=pool_size,
+            per_host=per_host,
+            cache=cache,
+            max_bytes=max_bytes,
+            scheduler=scheduler,
+        )
+    if previous is not None:
+        previous.close()
+    return _client
+
+
+def streaming() -> bool:
+    """Return whether the process-wide client streams with a byte cap."""
+
+    return get_client().max_bytes is not None
+
+
+def get(url: str, *, timeout: float, verify: bool = True, headers=None, **kwargs):
+    """Issue a GET request through the process-wide client.
+
+    This mirrors :func:`requests.get` so callers can switch over without
+    changing how they handle responses.
+    """
+
+    return get_client().get(url, timeout=timeout, verify=verify, headers=headers, **kwargs)
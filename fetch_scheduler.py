@@ -0,0 +1,246 @@
+"""Politeness scheduler for outgoing page fetches.
+
+Many cafés host their sites on the same few platforms (Wix, Squarespace,
+Shopify, Jimdo, ...) or on the same shared-hosting IPs.  Crawling rows in
+parallel therefore sends bursts to one provider, which answers with 403s and
+``_fetch_page`` burns its retries on them.  :class:`FetchScheduler` sits in
+front of every request and enforces:
+
+* a global limit on requests in flight,
+* a per-host limit on concurrent requests,
+* a per-group limit, where a group is a hosting platform or, for other
+  sites, the IP address the host resolves to,
+* a token-bucket request rate per group.
+
+Hosts are mapped to a platform by their domain (``*.wixsite.com``,
+``*.myshopify.com``, ...) or, for custom domains, by the platform's
+published address ranges.  Hosts that cannot be resolved form their own
+group.
+"""
+
+from __future__ import annotations
+
+import ipaddress
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+from urllib.parse import urlsplit
+
+DEFAULT_MAX_IN_FLIGHT = 256
+DEFAULT_PER_HOST = 4
+DEFAULT_PER_GROUP = 8
+DEFAULT_RATE = 4.0
+DEFAULT_BURST = 8
+
+PLATFORM_DOMAINS = {
+    "wix": ("wixsite.com", "wix.com", "wixstudio.io", "editorx.io"),
+    "squarespace": ("squarespace.com",),
+    "shopify": ("myshopify.com", "shopify.com"),
+    "jimdo": ("jimdofree.com", "jimdosite.com", "jimdo.com", "jimdoweb.com"),
+    "weebly": ("weebly.com", "weeblysite.com"),
+    "wordpress": ("wordpress.com",),
+    "goope": ("goope.jp",),
+    "base": ("thebase.in", "base.shop", "theshop.jp", "buyshop.jp"),
+    "stores": ("stores.jp",),
+    "peraichi": ("peraichi.com",),
+}
+PLATFORM_NETWORKS = {
+    "wix": ("185.230.60.0/22",),
+    "squarespace": ("198.185.159.0/24", "198.49.23.0/24"),
+    "shopify": ("23.227.38.0/24",),
+}
+_NETWORKS = [
+    (ipaddress.ip_network(network), platform)
+    for platform, networks in PLATFORM_NETWORKS.items()
+    for network in networks
+]
+
+
+def platform_for_host(host: str) -> Optional[str]:
+    """Return the hosting platform ``host`` belongs to by its domain."""
+
+    host = host.lower().rstrip(".")
+    for platform, domains in PLATFORM_DOMAINS.items():
+        if any(host == domain or host.endswith("." + domain) for domain in domains):
+            return platform
+    return None
+
+
+def platform_for_address(address: str) -> Optional[str]:
+    """Return the hosting platform whose published range contains ``address``."""
+
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return None
+    for network, platform in _NETWORKS:
+        if ip.version == network.version and ip in network:
+            return platform
+    return None
+
+
+def _resolve(host: str) -> Optional[str]:
+    try:
+        return socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)[0][4][0]
+    except (OSError, UnicodeError, IndexError):
+        return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at ``rate`` tokens per second.
+
+    :meth:`reserve` never blocks: it takes a token (possibly borrowing from
+    the future) and returns how long the caller has to wait before using it,
+    so waiting callers are spaced ``1 / rate`` seconds apart.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class FetchScheduler:
+    """Admit fetches under global, per-host and per-group limits.
+
+    ``rate`` is the sustained number of requests per second allowed to one
+    group (``0`` disables rate limiting) and ``burst`` how many may be sent
+    back to back.  With ``resolve`` off, hosts are grouped by platform
+    domain only.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+        per_host: int = DEFAULT_PER_HOST,
+        per_group: int = DEFAULT_PER_GROUP,
+        rate: float = DEFAULT_RATE,
+        burst: float = DEFAULT_BURST,
+        resolve: bool = True,
+        resolver: Callable[[str], Optional[str]] = _resolve,
+    ):
+        self.max_in_flight = max_in_flight
+        self.per_host = per_host
+        self.per_group = per_group
+        self.rate = rate
+        self.burst = burst
+        self.resolve = resolve
+        self._resolver = resolver
+        self._lock = threading.Lock()
+        self._global = threading.BoundedSemaphore(max_in_flight)
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._group_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._groups: Dict[str, str] = {}
+        self.throttled = 0
+        self.throttled_seconds = 0.0
+
+    def group(self, url: str) -> str:
+        """Return the politeness group of ``url``'s host.
+
+        Groups look like ``platform:wix``, ``ip:203.0.113.7`` or
+        ``host:cafe.jp``.  Lookups are cached per host.
+        """
+
+        cached = self.cached_group(url)
+        if cached is not None:
+            return cached
+        host = (urlsplit(url).hostname or "").lower()
+
+        platform = platform_for_host(host)
+        address = None
+        if platform is None and self.resolve and host:
+            address = self._resolver(host)
+            if address is not None:
+                platform = platform_for_address(address)
+        if platform is not None:
+            group = f"platform:{platform}"
+        elif address is not None:
+            group = f"ip:{address}"
+        else:
+            group = f"host:{host}"
+        with self._lock:
+            self._groups[host] = group
+        return group
+
+    def cached_group(self, url: str) -> Optional[str]:
+        """Return the group of ``url``'s host if it is already known."""
+
+        host = (urlsplit(url).hostname or "").lower()
+        with self._lock:
+            return self._groups.get(host)
+
+    def _get(self, table: Dict, key: str, factory):
+        with self._lock:
+            value = table.get(key)
+            if value is None:
+                value = table[key] = factory()
+            return value
+
+    def reserve(self, group: str) -> float:
+        """Take a request token for ``group`` and return the delay before sending."""
+
+        bucket = self._get(
+            self._buckets, group, lambda: TokenBucket(self.rate, self.burst)
+        )
+        delay = bucket.reserve()
+        if delay:
+            with self._lock:
+                self.throttled += 1
+                self.throttled_seconds += delay
+        return delay
+
+    @contextmanager
+    def slot(self, url: str) -> Iterator[None]:
+        """Wait until ``url`` may be fetched and hold its slots while inside."""
+
+        host = (urlsplit(url).hostname or "").lower()
+        group = self.group(url)
+        delay = self.reserve(group)
+        if delay:
+            time.sleep(delay)
+        host_slot = self._get(
+            self._host_slots, host, lambda: threading.BoundedSemaphore(self.per_host)
+        )
+        group_slot = self._get(
+            self._group_slots, group, lambda: threading.BoundedSemaphore(self.per_group)
+        )
+        with host_slot, group_slot, self._global:
+            yield
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            groups = set(self._groups.values())
+        return {
+            "hosts": len(self._groups),
+            "groups": len(groups),
+            "platforms": sum(group.startswith("platform:") for group in groups),
+            "throttled": self.throttled,
+            "throttled_seconds": round(self.throttled_seconds, 2),
+        }
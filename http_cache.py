@@ -0,0 +1,282 @@
+"""Persistent on-disk HTTP cache with conditional revalidation.
+
+Every Action run used to start cold and download each homepage and contact
+page again, even when the rows were re-run after a crash or the site had not
+changed in weeks.  :class:`HttpCache` stores successful responses in a
+SQLite database inside a directory that a workflow can persist between runs
+(for example with ``actions/cache``).
+
+* Entries younger than ``ttl`` seconds are served without touching the
+  network.
+* Older entries are revalidated with ``If-None-Match``/``If-Modified-Since``
+  using the stored ``ETag``/``Last-Modified``; a ``304`` refreshes the entry.
+* The database is kept under ``max_bytes`` by evicting the least recently
+  used entries.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Mapping, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DB_FILENAME = "pages.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    encoding TEXT,
+    headers TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_accessed_at ON pages (accessed_at);
+"""
+
+
+def canonical_url(url: str) -> str:
+    """Return the cache key for ``url``.
+
+    Scheme and host are lower-cased, default ports and the fragment are
+    dropped and an empty path becomes ``/``.
+    """
+
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and (scheme, port) not in {("http", 80), ("https", 443)}:
+        host = f"{host}:{port}"
+    if parts.username or parts.password:
+        userinfo = parts.username or ""
+        if parts.password:
+            userinfo += f":{parts.password}"
+        host = f"{userinfo}@{host}"
+    return urlunsplit((scheme, host, parts.path or "/", parts.query, ""))
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    body: bytes
+    encoding: Optional[str]
+    headers: Dict[str, str]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+    def age(self, now: Optional[float] = None) -> float:
+        return (time.time() if now is None else now) - self.fetched_at
+
+    def to_response(self, url: str) -> requests.Response:
+        """Return a ``200`` :class:`requests.Response` carrying the cached body."""
+
+        response = requests.Response()
+        response.status_code = 200
+        response._content = self.body
+        response.encoding = self.encoding
+        response.headers.update(self.headers)
+        response.url = url
+        response.from_cache = True
+        return response
+
+
+class HttpCache:
+    """SQLite-backed page cache shared by every thread of a run."""
+
+    def __init__(
+        self,
+        directory: str,
+        *,
+        ttl: float = DEFAULT_TTL,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(directory, DB_FILENAME), check_same_thread=False
+        )
+        self._db.executescript(_SCHEMA)
+        row = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()
+        self._total_bytes = int(row[0])
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+    def lookup(self, url: str) -> Optional[CacheEntry]:
+        """Return the stored entry for ``url`` and mark it as recently used."""
+
+        key = canonical_url(url)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body, encoding, headers, etag, last_modified, fetched_at "
+                "FROM pages WHERE url = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE pages SET accessed_at = ? WHERE url = ?", (time.time(), key)
+            )
+            self._db.commit()
+        body, encoding, headers, etag, last_modified, fetched_at = row
+        return CacheEntry(
+            url=key,
+            body=bytes(body),
+            encoding=encoding,
+            headers=json.loads(headers),
+            etag=etag,
+            last_modified=last_modified,
+            fetched_at=fetched_at,
+        )
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return entry.age() < self.ttl
+
+    def validators(self, entry: CacheEntry) -> Dict[str, str]:
+        """Return the conditional request headers for ``entry``."""
+
+        headers: Dict[str, str] = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def refresh(self, entry: CacheEntry, headers: Mapping[str, str]) -> None:
+        """Record a ``304 Not Modified`` for ``entry``."""
+
+        etag = headers.get("ETag") or entry.etag
+        last_modified = headers.get("Last-Modified") or entry.last_modified
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE pages SET fetched_at = ?, accessed_at = ?, etag = ?, "
+                "last_modified = ? WHERE url = ?",
+                (now, now, etag, last_modified, entry.url),
+            )
+            self._db.commit()
+        entry.fetched_at = now
+        entry.etag = etag
+        entry.last_modified = last_modified
+
+    def store(self, url: str, response: requests.Response) -> None:
+        """Store a successful ``response`` for ``url`` unless it forbids caching."""
+
+        cache_control = (response.headers.get("Cache-Control") or "").lower()
+        if "no-store" in cache_control:
+            return
+        body = response.content or b""
+        if len(body) > self.max_bytes:
+            return
+        key = canonical_url(url)
+        headers = {
+            name: value
+            for name, value in response.headers.items()
+            if name.lower() in {"content-type", "etag", "last-modified"}
+        }
+        now = time.time()
+        with self._lock:
+            previous = self._db.execute(
+                "SELECT size FROM pages WHERE url = ?", (key,)
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages (url, body, encoding, headers, etag, "
+                "last_modified, fetched_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    sqlite3.Binary(body),
+                    response.encoding,
+                    json.dumps(headers),
+                    response.headers.get("ETag"),
+                    response.headers.get("Last-Modified"),
+                    now,
+                    now,
+                    len(body),
+                ),
+            )
+            self._total_bytes += len(body) - (previous[0] if previous else 0)
+            self._evict_locked()
+            self._db.commit()
+
+    def _evict_locked(self) -> None:
+        while self._total_bytes > self.max_bytes:
+            rows = self._db.execute(
+                "SELECT url, size FROM pages ORDER BY accessed_at ASC LIMIT 64"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                return
+            for url, size in rows:
+                self._db.execute("DELETE FROM pages WHERE url = ?", (url,))
+                self._total_bytes -= size
+                self.evicted += 1
+                if self._total_bytes <= self.max_bytes:
+                    break
+
+    def get(self, session: requests.Session, url: str, **kwargs) -> requests.Response:
+        """Return the response for ``url``, using the cache where possible.
+
+        ``session`` performs the network request when the entry is missing or
+        stale.  Cached responses carry ``from_cache = True``.  Streamed
+        (``stream=True``) responses are not stored here because their body
+        has not been read yet; the caller stores them once it has.
+        """
+
+        entry = self.lookup(url)
+        if entry is not None and self.is_fresh(entry):
+            with self._lock:
+                self.hits += 1
+            return entry.to_response(url)
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry is not None:
+            headers.update(self.validators(entry))
+        response = session.get(url, headers=headers, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            with self._lock:
+                self.revalidated += 1
+            self.refresh(entry, response.headers)
+            response.close()
+            return entry.to_response(url)
+
+        with self._lock:
+            self.misses += 1
+        if response.status_code == 200 and not kwargs.get("stream"):
+            try:
+                self.store(url, response)
+            except sqlite3.Error as exc:  # pragma: no cover - disk issues
+                logging.warning("Failed to cache %s: %s", url, exc)
+        return response
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,120 @@
+"""Fetch-and-parse cache shared by the contact extractors.
+
+A single row touches the same pages several times: the homepage is needed by
+``find_instagram``, ``crawl_site_for_email`` and ``find_contact_form`` and the
+crawl frequently visits the contact pages that ``find_contact_form`` checks
+afterwards.  :class:`PageCache` makes sure each URL is downloaded and parsed
+at most once per row.
+
+The e-mail crawl may ask for a *partial* page: with ``fetch_partial`` set,
+the download stops once a usable ``mailto:`` link has arrived.  Partial pages
+are only handed to callers that accept them; anyone asking for the full page
+later triggers a complete download.
+"""
+
+from __future__ import annotations
+
+from typing import Callable, Dict, Optional
+from urllib.parse import urldefrag, urlsplit, urlunsplit
+
+import parse_pool
+from fetch_client import PartialText
+from page_parser import ParsedPage
+
+
+def cache_key(url: str) -> str:
+    """Return the cache key for ``url``.
+
+    The fragment is dropped and an empty path is treated as ``/`` so that
+    ``http://example.com`` and ``http://example.com/#top`` share an entry.
+    """
+
+    parts = urlsplit(urldefrag(url)[0])
+    if not parts.path:
+        parts = parts._replace(path="/")
+    return urlunsplit(parts)
+
+
+class PageCache:
+    """Remember fetched pages and their parsed form for one row.
+
+    ``fetch`` is called with a URL and must return the page text or ``None``
+    on failure.  Failures are cached as well so a broken link is not retried
+    by the next extractor.  Pages are parsed with the default
+    :mod:`page_parser` backend, in a worker process when :mod:`parse_pool`
+    has been configured.  ``fetch_partial`` works like ``fetch`` but
+    may return a :class:`fetch_client.PartialText` cut short by an early exit.
+    ``bytes_downloaded`` counts the UTF-8 size of every page fetched.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Optional[str]],
+        *,
+        fetch_partial: Optional[Callable[[str], Optional[str]]] = None,
+    ):
+        self._fetch = fetch
+        self._fetch_partial = fetch_partial
+        self._pages: Dict[str, Optional[str]] = {}
+        self._parsed: Dict[str, ParsedPage] = {}
+        self._partial: Dict[str, ParsedPage] = {}
+        self.fetches = 0
+        self.fetches_saved = 0
+        self.parses = 0
+        self.parses_saved = 0
+        self.partial_pages = 0
+        self.bytes_downloaded = 0
+
+    def _download(self, url: str, key: str, fetch) -> Optional[str]:
+        self.fetches += 1
+        content = fetch(url)
+        if content:
+            self.bytes_downloaded += len(content.encode("utf-8", "replace"))
+        if not isinstance(content, PartialText):
+            self._pages[key] = content
+        return content
+
+    def get(self, url: str) -> Optional[str]:
+        """Return the text of ``url``, fetching it on first use."""
+
+        key = cache_key(url)
+        if key in self._pages:
+            self.fetches_saved += 1
+            return self._pages[key]
+        return self._download(url, key, self._fetch)
+
+    def page(self, url: str, *, partial: bool = False) -> Optional[ParsedPage]:
+        """Return the parsed page for ``url`` or ``None`` if it could not be fetched.
+
+        With ``partial`` a page whose download stopped early may be returned.
+        """
+
+        key = cache_key(url)
+        cached = self._parsed.get(key)
+        if cached is None and partial:
+            cached = self._partial.get(key)
+        if cached is not None:
+            self.fetches_saved += 1
+            self.parses_saved += 1
+            return cached
+
+        if partial and self._fetch_partial is not None and key not in self._pages:
+            content = self._download(url, key, self._fetch_partial)
+        else:
+            content = self.get(url)
+        if content is None:
+            return None
+        self.parses += 1
+        page = parse_pool.parse(content)
+        if isinstance(content, PartialText):
+            self.partial_pages += 1
+            self._partial[key] = page
+        else:
+            self._parsed[key] = page
+        return page
+
+    def is_partial(self, url: str) -> bool:
+        """Return whether only a partial download of ``url`` is cached."""
+
+        key = cache_key(url)
+        return key in self._partial and key not in self._parsed
@@ -0,0 +1,188 @@
+"""Pluggable HTML parser backends producing a compact :class:`ParsedPage`.
+
+The extractors only need four things from a page: its ``<a href>`` anchors
+(with their text), its ``mailto:`` links, whether it contains a ``<form>``
+and its visible text.  Each page is parsed once into a :class:`ParsedPage`
+holding exactly that, using one of the backends in :data:`PARSERS`:
+
+``html.parser``
+    BeautifulSoup with the standard library parser (the historical default).
+``lxml``
+    BeautifulSoup with lxml; much faster, needs the optional ``lxml`` package.
+``fast``
+    A regex tokenizer that never builds a tree.  It pulls anchors, form
+    presence and the text outside ``<script>``/``<style>``/``<template>``
+    and is the cheapest option when CPU is the bottleneck.
+"""
+
+from __future__ import annotations
+
+import html
+import re
+from dataclasses import dataclass
+from typing import Any, Iterator, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+import email_scanner
+
+PARSERS = ("html.parser", "lxml", "fast")
+DEFAULT_PARSER = "html.parser"
+
+_default_parser = DEFAULT_PARSER
+
+_TAG_RE = re.compile(
+    r"<!--.*?(?:-->|\Z)"
+    r"|<(/?)([A-Za-z][^\s/>]*)([^>]*)>"
+    r"|<![^>]*>"
+    r"|<\?[^>]*>",
+    re.S,
+)
+_HREF_RE = re.compile(
+    r"""(?:^|\s)href(?=[\s=/]|$)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?""",
+    re.I,
+)
+_RAW_TEXT_TAGS = ("script", "style", "template")
+_RAW_TEXT_END = {
+    name: re.compile(rf"</{name}\s*>", re.I) for name in _RAW_TEXT_TAGS
+}
+
+
+@dataclass
+class ParsedPage:
+    """The parts of a page the extractors look at.
+
+    Pages parsed in a worker process (see :mod:`parse_pool`) carry the
+    e-mail addresses found in their text in ``emails`` instead of the text.
+    """
+
+    anchors: List[Tuple[str, str]]
+    has_form: bool
+    text: str
+    emails: Optional[Tuple[str, ...]] = None
+
+    def mailtos(self) -> List[str]:
+        """Return the ``mailto:`` hrefs in document order."""
+
+        return [href for href, _ in self.anchors if href.lower().startswith("mailto:")]
+
+    def text_emails(self) -> Iterator[str]:
+        """Yield the e-mail addresses in the page text in order."""
+
+        if self.emails is not None:
+            return iter(self.emails)
+        return email_scanner.iter_emails(self.text)
+
+
+def available_parsers() -> Tuple[str, ...]:
+    """Return the backends that can be used in this environment."""
+
+    try:
+        import lxml  # noqa: F401
+    except ImportError:
+        return tuple(name for name in PARSERS if name != "lxml")
+    return PARSERS
+
+
+def set_default_parser(name: str) -> None:
+    """Select the backend used by :func:`parse` when none is given."""
+
+    global _default_parser
+    if name not in PARSERS:
+        raise ValueError(f"Unknown parser {name!r}; expected one of {PARSERS}")
+    if name not in available_parsers():
+        raise ValueError(f"Parser {name!r} is not installed")
+    _default_parser = name
+
+
+def get_default_parser() -> str:
+    return _default_parser
+
+
+def from_soup(soup: Any) -> ParsedPage:
+    """Build a :class:`ParsedPage` from an already parsed BeautifulSoup tree."""
+
+    anchors = [(a["href"], a.get_text()) for a in soup.find_all("a", href=True)]
+    return ParsedPage(
+        anchors=anchors,
+        has_form=soup.find("form") is not None,
+        text=soup.get_text(" "),
+    )
+
+
+def as_page(page: Any) -> ParsedPage:
+    """Return ``page`` as a :class:`ParsedPage`, converting soups on the fly."""
+
+    if isinstance(page, ParsedPage):
+        return page
+    return from_soup(page)
+
+
+def parse(content: str, parser: Optional[str] = None) -> ParsedPage:
+    """Parse ``content`` with ``parser`` (or the default backend)."""
+
+    name = parser or _default_parser
+    if name == "fast":
+        return _tokenize(content)
+    if name not in PARSERS:
+        raise ValueError(f"Unknown parser {name!r}; expected one of {PARSERS}")
+    return from_soup(BeautifulSoup(content, name))
+
+
+def _href(attrs: str) -> Optional[str]:
+    match = _HREF_RE.search(attrs)
+    if match is None:
+        return None
+    value = next((g for g in match.groups() if g is not None), "")
+    return html.unescape(value)
+
+
+def _tokenize(content: str) -> ParsedPage:
+    """Scan ``content`` once without building a tree."""
+
+    anchors: List[Tuple[str, str]] = []
+    texts: List[str] = []
+    has_form = False
+    anchor: Optional[Tuple[str, List[str]]] = None
+    size = len(content)
+    pos = 0
+
+    while pos < size:
+        match = _TAG_RE.search(content, pos)
+        end = match.start() if match else size
+        if end > pos:
+            data = html.unescape(content[pos:end])
+            texts.append(data)
+            if anchor is not None:
+                anchor[1].append(data)
+        if match is None:
+            break
+        pos = match.end()
+
+        name = match.group(2)
+        if name is None:
+            continue  # comment, doctype or processing instruction
+        name = name.lower()
+        if match.group(1):
+            if name == "a" and anchor is not None:
+                anchors.append((anchor[0], "".join(anchor[1])))
+                anchor = None
+            continue
+
+        if name in _RAW_TEXT_END:
+            close = _RAW_TEXT_END[name].search(content, pos)
+            pos = close.end() if close else size
+        elif name == "form":
+            has_form = True
+        elif name == "a":
+            if anchor is not None:
+                anchors.append((anchor[0], "".join(anchor[1])))
+                anchor = None
+            href = _href(match.group(3))
+            if href is not None:
+                anchor = (href, [])
+
+    if anchor is not None:
+        anchors.append((anchor[0], "".join(anchor[1])))
+    return ParsedPage(anchors=anchors, has_form=has_form, text=" ".join(texts))
+
@@ -0,0 +1,94 @@
+"""Parse pages in worker processes while the I/O threads keep fetching.
+
+With many rows in flight the fetches are cheap and the crawl is limited by
+the GIL: parsing, ``get_text`` and the anchor scans of every page run on one
+core.  :func:`configure` starts a :class:`~concurrent.futures.ProcessPoolExecutor`
+and :func:`parse` (or :func:`parse_async` on the ``asyncio`` engine) then
+sends each page to it.
+
+Messages are kept small: the page goes out as UTF-8 bytes and comes back as
+an ``(anchors, has_form, emails)`` tuple, where ``emails`` are the addresses
+:mod:`email_scanner` found in the visible text, so the text itself never
+crosses the process boundary.  Without a pool both functions parse in the
+calling thread.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import email_scanner
+import page_parser
+from page_parser import ParsedPage
+
+_Message = Tuple[List[Tuple[str, str]], bool, Tuple[str, ...]]
+
+_lock = threading.Lock()
+_pool: Optional[ProcessPoolExecutor] = None
+_workers = 0
+
+
+def _parse_in_worker(data: bytes, parser: str) -> _Message:
+    page = page_parser.parse(data.decode("utf-8", "surrogatepass"), parser)
+    return page.anchors, page.has_form, tuple(email_scanner.iter_emails(page.text))
+
+
+def _encode(content: str) -> bytes:
+    return content.encode("utf-8", "surrogatepass")
+
+
+def _page(message: _Message) -> ParsedPage:
+    anchors, has_form, emails = message
+    return ParsedPage(anchors=anchors, has_form=has_form, text="", emails=emails)
+
+
+def configure(workers: int) -> None:
+    """Parse in ``workers`` processes from now on (``0`` parses in-process)."""
+
+    global _pool, _workers
+    with _lock:
+        old, _pool, _workers = _pool, None, 0
+        if workers > 0:
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            _workers = workers
+    if old is not None:
+        old.shutdown(wait=True, cancel_futures=True)
+
+
+def workers() -> int:
+    return _workers
+
+
+def shutdown() -> None:
+    configure(0)
+
+
+def parse(content: str) -> ParsedPage:
+    """Parse ``content`` with the default backend, in a worker if one is running."""
+
+    pool = _pool
+    if pool is None:
+        return page_parser.parse(content)
+    message = pool.submit(
+        _parse_in_worker, _encode(content), page_parser.get_default_parser()
+    ).result()
+    return _page(message)
+
+
+async def parse_async(content: str) -> ParsedPage:
+    """Async counterpart of :func:`parse` that does not block the event loop."""
+
+    pool = _pool
+    if pool is None:
+        return page_parser.parse(content)
+    loop = asyncio.get_running_loop()
+    message = await loop.run_in_executor(
+        pool, _parse_in_worker, _encode(content), page_parser.get_default_parser()
+    )
+    return _page(message)
@@ -0,0 +1,298 @@
+"""Shared retry policy and per-host circuit breakers for page fetches.
+
+The fetchers used to retry a 403 or any request error three times back to
+back, so a dead or blocking host cost up to three timeouts on every page the
+crawl touched.  This module gives all of them one policy:
+
+* :class:`RetryPolicy` decides which failures are worth another attempt and
+  how long to wait first: exponential backoff with full jitter, or the
+  server's ``Retry-After`` when it sends one.
+* :class:`CircuitBreakers` counts consecutive fetches per host that failed
+  with a timeout, a connection error, a 403 or a 429.  A fetch counts once
+  however many attempts the retry policy gave it (see
+  :meth:`CircuitBreakers.fetch`).  Once a host reaches the threshold (or its
+  name does not resolve at all) the breaker opens and further fetches to that
+  host fail immediately until ``cooldown`` seconds have passed.
+
+The process-wide instances are returned by :func:`get_policy` and
+:func:`get_breakers` and can be replaced with :func:`configure`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+RETRY_STATUSES = frozenset({403, 408, 425, 429, 500, 502, 503, 504})
+BREAKER_STATUSES = frozenset({403, 429})
+DEFAULT_THRESHOLD = 5
+DEFAULT_COOLDOWN = 300.0
+
+
+def parse_retry_after(
+    value: Optional[str], *, now: Optional[float] = None
+) -> Optional[float]:
+    """Return the delay in seconds requested by a ``Retry-After`` header."""
+
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - (time.time() if now is None else now))
+
+
+@dataclass
+class RetryPolicy:
+    """How many attempts a fetch gets and how long to wait between them.
+
+    The wait before attempt ``n + 1`` is a random duration between zero and
+    ``min(max_delay, base_delay * 2 ** n)``.  A ``Retry-After`` header
+    replaces it; when the server asks for more than ``max_retry_after``
+    seconds the fetch gives up instead.
+    """
+
+    attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    max_retry_after: float = 30.0
+
+    def __post_init__(self) -> None:
+        if self.attempts < 1:
+            raise ValueError(f"RetryPolicy needs at least one attempt, got {self.attempts}")
+
+    def retries_status(self, status: int) -> bool:
+        return status in RETRY_STATUSES
+
+    def delay(
+        self,
+        attempt: int,
+        retry_after: Optional[str] = None,
+        *,
+        rng: Callable[[float, float], float] = random.uniform,
+    ) -> Optional[float]:
+        """Return the wait after failed ``attempt`` (0-based) or ``None`` to stop."""
+
+        if attempt + 1 >= self.attempts:
+            return None
+        requested = parse_retry_after(retry_after)
+        if requested is not None:
+            return requested if requested <= self.max_retry_after else None
+        return rng(0.0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+def host_of(url: str) -> str:
+    return (urlsplit(url).netloc or "").lower()
+
+
+def is_dns_error(exc: BaseException) -> bool:
+    """Return whether ``exc`` (or anything it wraps) is a name resolution failure."""
+
+    pending = [exc]
+    seen = set()
+    while pending:
+        current = pending.pop()
+        if current is None or id(current) in seen or len(seen) > 20:
+            continue
+        seen.add(id(current))
+        if isinstance(current, socket.gaierror):
+            return True
+        if type(current).__name__ in ("NameResolutionError", "ClientConnectorDNSError"):
+            return True
+        if isinstance(current, BaseException):
+            pending.extend(arg for arg in current.args if isinstance(arg, BaseException))
+            pending.extend(
+                getattr(current, name, None)
+                for name in ("reason", "os_error", "__cause__", "__context__")
+            )
+    return False
+
+
+def is_timeout(exc: BaseException) -> bool:
+    return isinstance(exc, (requests.Timeout, asyncio.TimeoutError, TimeoutError))
+
+
+# aiohttp is optional; its connection errors are recognised by name.
+_AIOHTTP_CONNECTION_ERRORS = ("ClientConnectorError", "ClientOSError")
+
+
+def is_connection_error(exc: BaseException) -> bool:
+    """Return whether ``exc`` means the host could not be reached.
+
+    Only actual connection failures count: every ``requests`` exception is
+    an ``OSError``, but redirect loops, broken encodings or non-HTML pages
+    say nothing about whether the host is up.
+    """
+
+    if isinstance(exc, requests.ConnectionError):
+        return True
+    return any(cls.__name__ in _AIOHTTP_CONNECTION_ERRORS for cls in type(exc).__mro__)
+
+
+class _Fetch:
+    """Breaker bookkeeping for one fetch, however many attempts it takes.
+
+    Only the outcome of the last attempt counts: when the fetch ends, a
+    failure is recorded once, so a 403 retried three times does not use
+    three of the host's failures.
+    """
+
+    def __init__(self, breakers: "CircuitBreakers", url: str):
+        self._breakers = breakers
+        self._url = url
+        self._failed = False
+
+    def __enter__(self) -> "_Fetch":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._failed:
+            self._breakers.record_failure(self._url)
+
+    def record_status(self, status: int) -> None:
+        """Record a response: 403/429 fail the fetch, anything else succeeds."""
+
+        self._failed = status in BREAKER_STATUSES
+        if not self._failed:
+            self._breakers.record_success(self._url)
+
+    def record_error(self, exc: BaseException) -> bool:
+        """Record a request error and return whether retrying is pointless."""
+
+        self._failed = False
+        if is_dns_error(exc):
+            self._breakers.record_failure(self._url, fatal=True)
+            return True
+        self._failed = is_timeout(exc) or is_connection_error(exc)
+        return self._breakers.is_open(self._url)
+
+
+class CircuitBreakers:
+    """Per-host circuit breakers shared by every fetch of a run."""
+
+    def __init__(
+        self,
+        threshold: int = DEFAULT_THRESHOLD,
+        cooldown: float = DEFAULT_COOLDOWN,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures: Dict[str, int] = {}
+        self._opened: Dict[str, float] = {}
+        self.tripped = 0
+        self.skipped = 0
+
+    def allow(self, url: str) -> bool:
+        """Return ``False`` (and count a skip) while ``url``'s host is open."""
+
+        host = host_of(url)
+        with self._lock:
+            opened = self._opened.get(host)
+            if opened is None:
+                return True
+            if self._clock() - opened >= self.cooldown:
+                # Half-open: let one fetch through; one more failure reopens.
+                del self._opened[host]
+                self._failures[host] = self.threshold - 1
+                return True
+            self.skipped += 1
+            return False
+
+    def fetch(self, url: str) -> _Fetch:
+        """Return the bookkeeping for one fetch of ``url``; use it as a context manager."""
+
+        return _Fetch(self, url)
+
+    def is_open(self, url: str) -> bool:
+        with self._lock:
+            return host_of(url) in self._opened
+
+    def record_success(self, url: str) -> None:
+        with self._lock:
+            self._failures.pop(host_of(url), None)
+
+    def record_failure(self, url: str, *, fatal: bool = False) -> None:
+        host = host_of(url)
+        with self._lock:
+            if host in self._opened:
+                return
+            count = self._failures.get(host, 0) + 1
+            self._failures[host] = count
+            if fatal or count >= self.threshold:
+                self._opened[host] = self._clock()
+                self.tripped += 1
+
+    def record_status(self, url: str, status: int) -> None:
+        """Record a one-attempt fetch: 403/429 count as failures, anything else as success."""
+
+        with self.fetch(url) as fetch:
+            fetch.record_status(status)
+
+    def record_error(self, url: str, exc: BaseException) -> bool:
+        """Record a one-attempt fetch that raised and return whether retrying is pointless.
+
+        Timeouts and connection errors count towards the threshold; a host
+        whose name does not resolve opens its breaker immediately.
+        """
+
+        with self.fetch(url) as fetch:
+            fatal = fetch.record_error(exc)
+        return fatal or self.is_open(url)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._failures.clear()
+            self._opened.clear()
+            self.tripped = 0
+            self.skipped = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "tripped": self.tripped,
+                "open": len(self._opened),
+                "skipped": self.skipped,
+            }
+
+
+_policy = RetryPolicy()
+_breakers = CircuitBreakers()
+
+
+def get_policy() -> RetryPolicy:
+    return _policy
+
+
+def get_breakers() -> CircuitBreakers:
+    return _breakers
+
+
+def configure(
+    policy: Optional[RetryPolicy] = None, breakers: Optional[CircuitBreakers] = None
+) -> None:
+    """Replace the process-wide policy and/or breakers."""
+
+    global _policy, _breakers
+    if policy is not None:
+        _policy = policy
+    if breakers is not None:
+        _breakers = breakers
@@ -0,0 +1,256 @@
+"""Checkpoint journal that lets an interrupted Sheets run resume.
+
+A long run can stop half way: the Action hits its time limit, the runner is
+cancelled or ``process_sheet`` raises.  Restarting from ``--start-row`` then
+crawls every finished row again, and results still waiting in the write
+batch are lost.  :class:`RunJournal` appends one JSON line per event to a
+local file:
+
+* ``start``: processing began at ``row`` for at most ``max_rows`` rows;
+* ``row``: a row was processed, with its homepage URL and the D–G values;
+* ``flushed``: the listed rows were written to the sheet;
+* ``cleanup``: the end-of-run cleanup ran and may have deleted rows.
+
+:meth:`RunJournal.plan` replays the file into a :class:`ResumePlan`: where to
+continue, which results were never written (they are written from the
+journal instead of being crawled again) and which written rows still need
+the cleanup.  Every line is flushed as soon as it is written, so the file
+survives the process being killed; a torn last line is ignored.
+"""
+
+from __future__ import annotations
+
+import bisect
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_DIR = ".run-journal"
+ERROR_STATUS = "エラー"
+DUPLICATE_STATUS = "重複"
+
+
+@dataclass
+class JournalEntry:
+    """A processed row.  ``row`` is ``None`` once the row has been deleted."""
+
+    row: Optional[int]
+    url: str
+    values: List[str]
+    flushed: bool = False
+
+
+@dataclass
+class ResumePlan:
+    """State of the journaled run, replayed from its file."""
+
+    first_row: int
+    max_rows: Optional[int]
+    entries: Dict[int, JournalEntry] = field(default_factory=dict)
+    cleaned: bool = False
+    next_row: Optional[int] = None
+
+    def ordered(self) -> List[JournalEntry]:
+        return [self.entries[row] for row in sorted(self.entries)]
+
+    @property
+    def done(self) -> int:
+        """Rows of this run handled before :attr:`start_row`, skipped ones included."""
+
+        return max(self.start_row - self.first_row, 0)
+
+    @property
+    def start_row(self) -> int:
+        live = [entry for entry in self.ordered() if entry.row is not None]
+        for entry in live:
+            if not entry.flushed:
+                return entry.row
+        if self.next_row is not None:
+            return self.next_row
+        return max(self.first_row, live[-1].row + 1) if live else self.first_row
+
+    @property
+    def remaining(self) -> Optional[int]:
+        if self.max_rows is None:
+            return None
+        return max(self.max_rows - self.done, 0)
+
+    def pending(self) -> Dict[int, JournalEntry]:
+        """Return the journaled results from :attr:`start_row` on, by row."""
+
+        start = self.start_row
+        return {
+            entry.row: entry
+            for entry in self.ordered()
+            if entry.row is not None and entry.row >= start
+        }
+
+    def finished(self) -> List[JournalEntry]:
+        """Return the written rows before :attr:`start_row` the cleanup has not seen."""
+
+        if self.cleaned:
+            return []
+        start = self.start_row
+        return [
+            entry
+            for entry in self.ordered()
+            if entry.row is not None and entry.row < start and entry.flushed
+        ]
+
+    @property
+    def window(self) -> tuple[int, int]:
+        """Rows that can hold the journaled rows after deletions above them."""
+
+        rows = [row for row in self.entries] or [self.first_row]
+        return min(min(rows), self.first_row), max(rows) + 1
+
+    def anchor(self, urls: Sequence[str]) -> None:
+        """Re-address the entries after the cleanup deleted rows.
+
+        ``urls`` is column C of the sheet from the first row of
+        :attr:`window` down.  Deleting rows only moves later rows up, so the
+        surviving entries appear in the same order; an entry skipped over by
+        the next match was deleted.  Rows matching no later entry (rows of
+        other shards or rows not processed yet) are passed over.
+        """
+
+        first, _ = self.window
+        remaining = self.remaining
+        ordered = self.ordered()
+        positions: Dict[str, List[int]] = {}
+        for position, entry in enumerate(ordered):
+            positions.setdefault(entry.url, []).append(position)
+        index = 0
+        next_row = first
+        for offset, url in enumerate(urls):
+            url = url.strip() if isinstance(url, str) else ""
+            candidates = positions.get(url, [])
+            found = bisect.bisect_left(candidates, index)
+            if found == len(candidates):
+                continue
+            match = candidates[found]
+            for entry in ordered[index:match]:
+                entry.row = None
+            ordered[match].row = first + offset
+            index = match + 1
+            next_row = first + offset + 1
+        for entry in ordered[index:]:
+            entry.row = None
+        self.entries = {
+            entry.row: entry for entry in ordered if entry.row is not None
+        }
+        self.next_row = next_row
+        self.first_row = self.start_row
+        self.max_rows = remaining
+
+
+class RunJournal:
+    """Append-only journal of one worksheet's run."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._file = None
+
+    @classmethod
+    def for_sheet(
+        cls,
+        directory,
+        spreadsheet_id: str,
+        worksheet: str,
+        shard: Optional[Tuple[int, int]] = None,
+    ) -> "RunJournal":
+        digest = hashlib.sha1(f"{spreadsheet_id}\0{worksheet}".encode("utf-8"))
+        name = digest.hexdigest()[:16]
+        if shard is not None:
+            name += "-shard-{}-of-{}".format(*shard)
+        return cls(Path(directory) / f"{name}.jsonl")
+
+    def _write(self, records: Iterable[dict], *, truncate: bool = False) -> None:
+        lines = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        with self._lock:
+            if truncate and self._file is not None:
+                self._file.close()
+                self._file = None
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = open(self.path, "w" if truncate else "a", encoding="utf-8")
+            self._file.write(lines)
+            self._file.flush()
+
+    def begin(
+        self,
+        start_row: int,
+        max_rows: Optional[int],
+        *,
+        plan: Optional[ResumePlan] = None,
+    ) -> None:
+        """Start a new journal, carrying over what ``plan`` still needs."""
+
+        records = [
+            {"event": "start", "row": start_row, "max_rows": max_rows, "at": time.time()}
+        ]
+        if plan is not None:
+            carried = plan.finished() + list(plan.pending().values())
+            records += [
+                {"event": "row", "row": e.row, "url": e.url, "values": e.values}
+                for e in carried
+            ]
+            flushed = [e.row for e in carried if e.flushed]
+            if flushed:
+                records.append({"event": "flushed", "rows": flushed})
+        self._write(records, truncate=True)
+
+    def record(self, row: int, url: str, values: Sequence[str]) -> None:
+        self._write([{"event": "row", "row": row, "url": url, "values": list(values)}])
+
+    def mark_flushed(self, rows: Sequence[int]) -> None:
+        if rows:
+            self._write([{"event": "flushed", "rows": list(rows)}])
+
+    def record_cleanup(self) -> None:
+        self._write([{"event": "cleanup", "at": time.time()}])
+
+    def plan(self) -> Optional[ResumePlan]:
+        """Replay the journal; return ``None`` when there is nothing to resume."""
+
+        try:
+            with open(self.path, encoding="utf-8") as handle:
+                lines = handle.read().splitlines()
+        except FileNotFoundError:
+            return None
+        return replay(lines)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def replay(lines: Iterable[str]) -> Optional[ResumePlan]:
+    plan: Optional[ResumePlan] = None
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            break  # torn write from a killed process
+        event = record.get("event")
+        if event == "start":
+            plan = ResumePlan(first_row=record["row"], max_rows=record.get("max_rows"))
+        elif plan is None:
+            continue
+        elif event == "row":
+            row = record["row"]
+            plan.entries[row] = JournalEntry(row, record.get("url", ""), record["values"])
+        elif event == "flushed":
+            for row in record.get("rows", []):
+                if row in plan.entries:
+                    plan.entries[row].flushed = True
+        elif event == "cleanup":
+            plan.cleaned = True
+    return plan
@@ -0,0 +1,175 @@
+"""Split a sheet run into shards and merge them for a single cleanup.
+
+``--shard i/N`` makes a process crawl only the rows of partition ``i`` (0 ≤ i
+< N), so N processes or N jobs of a GitHub Actions matrix can share one
+sheet.  Rows are assigned by their normalised homepage
+(:func:`single_flight.homepage_key`), so repeated homepages land in the same
+shard and are still crawled once.
+
+A shard writes its results as usual but skips the cleanup, which deletes
+rows and would move the rows other shards are still writing.  Instead it
+saves a :class:`ShardManifest` with the rows it wrote, each identified by a
+stable :func:`row_key` (its homepage URL, the same key the run journal
+uses).  Rows without a homepage only ever get なし, which the cleanup never
+deletes, so they are not recorded.  The merge step loads all manifests, finds each key's current row on
+the sheet with :func:`resolve_rows` and runs the cleanup once.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import zlib
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from single_flight import homepage_key
+
+DEFAULT_DIR = ".shards"
+
+
+def parse_shard(text: str) -> Tuple[int, int]:
+    """Parse ``"i/N"`` into ``(i, N)``."""
+
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard {text!r}; expected i/N, e.g. 0/4") from None
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Invalid shard {text!r}; i must be between 0 and N-1")
+    return index, count
+
+
+def _cell(row: Sequence[Any], column: int) -> str:
+    value = row[column] if len(row) > column else ""
+    return value.strip() if isinstance(value, str) else ""
+
+
+def shard_of(row: Sequence[Any], count: int) -> int:
+    """Return the shard of ``row`` among ``count`` shards."""
+
+    return zlib.crc32(homepage_key(_cell(row, 2)).encode("utf-8")) % count
+
+
+def row_key(row: Sequence[Any]) -> str:
+    """Return the key that identifies ``row`` independently of its position."""
+
+    return _cell(row, 2)
+
+
+def _align(recorded: Sequence[int], candidates: Sequence[int]) -> List[Optional[int]]:
+    """Match sorted ``recorded`` rows to sorted ``candidates`` without crossing.
+
+    As many rows as possible are matched, then the total distance between
+    recorded and matched rows is minimised.  Unmatched rows get ``None``.
+    """
+
+    if len(recorded) == len(candidates):
+        # Every row can be matched, and without crossing only in order.
+        return list(candidates)
+    skip = 1 + max([*recorded, *candidates]) * (len(recorded) + 1)
+    n, m = len(recorded), len(candidates)
+    cost = [[0] * (m + 1) for _ in range(n + 1)]
+    for i in range(1, n + 1):
+        cost[i][0] = i * skip
+        for j in range(1, m + 1):
+            cost[i][j] = min(
+                cost[i - 1][j] + skip,
+                cost[i][j - 1],
+                cost[i - 1][j - 1] + abs(recorded[i - 1] - candidates[j - 1]),
+            )
+    matched: List[Optional[int]] = [None] * n
+    i, j = n, m
+    while i and j:
+        if cost[i][j] == cost[i][j - 1]:
+            j -= 1
+        elif cost[i][j] == cost[i - 1][j] + skip:
+            i -= 1
+        else:
+            matched[i - 1] = candidates[j - 1]
+            i -= 1
+            j -= 1
+    return matched
+
+
+def resolve_rows(
+    entries: Sequence[Tuple[int, str]], current: Mapping[int, str]
+) -> Dict[int, int]:
+    """Map ``(row, key)`` pairs recorded by a shard to the current row numbers.
+
+    ``current`` maps the sheet's row numbers to their :func:`row_key`.  Rows
+    that share a key keep their relative order, and each is matched to the
+    row with that key closest to where it was recorded.  Entries whose key is
+    no longer on the sheet, or empty, are left out: rows without a homepage
+    cannot be told apart, and aligning thousands of them would be quadratic.
+    """
+
+    rows_by_key: Dict[str, List[int]] = {}
+    for row, key in sorted(current.items()):
+        if key:
+            rows_by_key.setdefault(key, []).append(row)
+    recorded_by_key: Dict[str, List[int]] = {}
+    for row, key in sorted(entries):
+        if key:
+            recorded_by_key.setdefault(key, []).append(row)
+
+    resolved: Dict[int, int] = {}
+    for key, recorded in recorded_by_key.items():
+        matched = _align(recorded, rows_by_key.get(key, []))
+        resolved.update(
+            (row, match) for row, match in zip(recorded, matched) if match is not None
+        )
+    return resolved
+
+
+@dataclass
+class ShardManifest:
+    """Rows written (or marked 重複) by one shard, with their keys."""
+
+    spreadsheet_id: str
+    worksheet: str
+    shard: int
+    count: int
+    written: List[Tuple[int, str]] = field(default_factory=list)
+    errors: List[Tuple[int, str]] = field(default_factory=list)
+    duplicates: List[Tuple[int, str]] = field(default_factory=list)
+
+    @property
+    def filename(self) -> str:
+        return f"shard-{self.shard}-of-{self.count}.json"
+
+    def save(self, directory) -> Path:
+        os.makedirs(directory, exist_ok=True)
+        path = Path(directory) / self.filename
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(asdict(self), ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load_all(
+        cls, directory, spreadsheet_id: str, worksheet: str
+    ) -> List["ShardManifest"]:
+        """Return the manifests in ``directory`` that belong to the worksheet."""
+
+        manifests = []
+        for path in sorted(Path(directory).glob("shard-*.json")):
+            data = json.loads(path.read_text(encoding="utf-8"))
+            if (data["spreadsheet_id"], data["worksheet"]) != (spreadsheet_id, worksheet):
+                continue
+            data["written"] = [tuple(entry) for entry in data["written"]]
+            data["errors"] = [tuple(entry) for entry in data["errors"]]
+            data["duplicates"] = [tuple(entry) for entry in data.get("duplicates", [])]
+            manifests.append(cls(**data))
+        return manifests
+
+
+def missing_shards(manifests: Sequence[ShardManifest]) -> Optional[List[int]]:
+    """Return the shard numbers without a manifest, or ``None`` if none were found."""
+
+    if not manifests:
+        return None
+    count = manifests[0].count
+    present = {m.shard for m in manifests if m.count == count}
+    return [shard for shard in range(count) if shard not in present]
@@ -0,0 +1,179 @@
+"""Background writer that batches row results into few Sheets API calls.
+
+``process_sheet`` used to collect 25 single-row ``D{n}:G{n}`` ranges and send
+them from the crawl loop, which stopped crawling while the request (and any
+429 backoff) was in progress.  :class:`SheetWriter` takes the results from a
+queue on its own thread instead:
+
+* rows are written once ``batch_size`` of them are pending or the oldest has
+  waited ``flush_interval`` seconds, whichever comes first;
+* adjacent rows are merged into one multi-row range such as ``D2:G26``;
+* rate limits and retries are left to the client (see :mod:`sheets_client`),
+  so a 429 backoff never holds up :meth:`SheetWriter.put`.
+
+Status marks for rows that failed (:meth:`SheetWriter.mark`) only touch
+column G and take the same path, but are sent right away so that a later
+crash cannot lose them.
+
+:meth:`SheetWriter.close` writes whatever is left and re-raises the error
+that stopped the writer, if any.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_INTERVAL = 10.0
+
+_STOP = object()
+
+
+def coalesce(
+    worksheet: str, rows: Dict[int, Sequence[str]], *, first_column: str = "D"
+) -> List[dict]:
+    """Return ``batchUpdate`` data for ``rows``, one range per run of adjacent rows.
+
+    Every row's values start at ``first_column``; rows in one run must have
+    the same number of values.
+    """
+
+    data: List[dict] = []
+    run: List[int] = []
+    for row in sorted(rows):
+        if run and (row != run[-1] + 1 or len(rows[row]) != len(rows[run[0]])):
+            data.append(_range(worksheet, run, rows, first_column))
+            run = []
+        run.append(row)
+    if run:
+        data.append(_range(worksheet, run, rows, first_column))
+    return data
+
+
+def _range(worksheet, run, rows, first_column) -> dict:
+    last_column = chr(ord(first_column) + len(rows[run[0]]) - 1)
+    return {
+        "range": f"{worksheet}!{first_column}{run[0]}:{last_column}{run[-1]}",
+        "majorDimension": "ROWS",
+        "values": [list(rows[row]) for row in run],
+    }
+
+
+class SheetWriter:
+    """Write ``D:G`` values of rows from a background thread."""
+
+    def __init__(
+        self,
+        service,
+        spreadsheet_id: str,
+        worksheet: str,
+        *,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        on_flushed: Optional[Callable[[List[int]], None]] = None,
+    ):
+        self.service = service
+        self.spreadsheet_id = spreadsheet_id
+        self.worksheet = worksheet
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.on_flushed = on_flushed
+        self.error: Optional[BaseException] = None
+        self.calls = 0
+        self.ranges = 0
+        self.rows = 0
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="sheet-writer", daemon=True
+        )
+        self._thread.start()
+
+    def put(self, row: int, values: Sequence[str]) -> None:
+        """Queue the ``D:G`` ``values`` of ``row``; never blocks on the API."""
+
+        self._queue.put(("D", row, list(values), False))
+
+    def mark(self, row: int, status: str) -> None:
+        """Queue ``status`` for column G of ``row`` and flush without waiting."""
+
+        self._queue.put(("G", row, [status], True))
+
+    def close(self) -> None:
+        """Write all queued rows and stop the thread."""
+
+        self._queue.put(_STOP)
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def _run(self) -> None:
+        pending: Dict[str, Dict[int, List[str]]] = {"D": {}, "G": {}}
+        count = 0
+        deadline = 0.0
+        while True:
+            timeout = max(0.0, deadline - time.monotonic()) if count else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                self._flush(pending)
+                return
+            if item is not None:
+                column, row, values, urgent = item
+                if not count:
+                    deadline = time.monotonic() + self.flush_interval
+                pending[column][row] = values
+                count += 1
+                if count < self.batch_size and not urgent:
+                    continue
+            self._flush(pending)
+            count = 0
+
+    def _flush(self, pending: Dict[str, Dict[int, List[str]]]) -> None:
+        if self.error is not None:
+            return
+        data = [
+            entry
+            for column, rows in pending.items()
+            for entry in coalesce(self.worksheet, rows, first_column=column)
+        ]
+        if not data:
+            return
+        rows = sorted({row for group in pending.values() for row in group})
+        try:
+            self._execute(data)
+        except BaseException as exc:  # pragma: no cover - network dependent
+            logging.error(
+                "[WRITER] Failed to write %s row(s) to %s: %r",
+                len(rows),
+                self.worksheet,
+                exc,
+            )
+            self.error = exc
+            return
+        for group in pending.values():
+            group.clear()
+        self.ranges += len(data)
+        self.rows += len(rows)
+        if self.on_flushed is not None:
+            self.on_flushed(rows)
+
+    def _execute(self, data: List[dict]) -> None:
+        self.calls += 1
+        (
+            self.service.spreadsheets()
+            .values()
+            .batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body={"valueInputOption": "RAW", "data": data},
+            )
+            .execute()
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return {"rows": self.rows, "ranges": self.ranges, "calls": self.calls}
@@ -2,7 +2,12 @@ from __future__ import annotations
 
 import logging
 import re
-from typing import Dict, Iterable, List, Sequence, Tuple
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from googleapiclient.errors import HttpError
+
+_EMPTY_EMAILS = {"", "-", "n/a", "na", "なし", "無し", "none"}
 
 
 def normalize_email(value: str | None) -> str:
@@ -51,20 +56,64 @@ def collect_emails_map(
     values = response.get("values", [])
     if not values:
         return {}
+    return _emails_map(values[0], header_rows + 1)
 
-    column = values[0]
+
+def _emails_map(column: Sequence, first_row: int) -> Dict[str, List[int]]:
     emails_map: Dict[str, List[int]] = {}
 
     for offset, raw_value in enumerate(column):
-        row_number = header_rows + 1 + offset
+        row_number = first_row + offset
         normalised = normalize_email(raw_value)
-        if normalised in {"", "-", "n/a", "na", "なし", "無し", "none"}:
+        if normalised in _EMPTY_EMAILS:
             continue
         emails_map.setdefault(normalised, []).append(row_number)
 
     return emails_map
 
 
+class EmailIndex:
+    """Lowest row of every normalised email, kept current while rows are written.
+
+    :func:`cleanup_duplicates_written_only` deletes a written row when a row
+    above it has the same email.  :meth:`claim` answers that question before
+    the row is written, so the duplicate can be left out of the write.
+    """
+
+    def __init__(self, rows: Optional[Dict[str, int]] = None):
+        self.rows: Dict[str, int] = dict(rows or {})
+
+    @classmethod
+    def from_column(
+        cls, column: Sequence, first_row: int, *, skip: Iterable[int] = ()
+    ) -> "EmailIndex":
+        """Index ``column`` (values from ``first_row`` on), leaving out ``skip``."""
+
+        skipped = set(skip)
+        emails = _emails_map(column, first_row)
+        index = cls()
+        for email, rows in emails.items():
+            kept = [row for row in rows if row not in skipped]
+            if kept:
+                index.rows[email] = kept[0]
+        return index
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def claim(self, email: str | None, row: int) -> Optional[int]:
+        """Return the row above ``row`` that has ``email``, or record ``row`` for it."""
+
+        normalised = normalize_email(email)
+        if normalised in _EMPTY_EMAILS:
+            return None
+        first = self.rows.get(normalised)
+        if first is not None and first < row:
+            return first
+        self.rows[normalised] = row
+        return None
+
+
 def get_sheet_id(service, spreadsheet_id: str, title: str) -> int:
     """Return the numeric sheet ID for ``title``."""
 
@@ -146,13 +195,16 @@ def find_rows_highlighted_as_duplicates(
 
     row_data = data[0].get("rowData", [])
     for offset, row in enumerate(row_data):
-        values = row.get("values", []) if isinstance(row, dict) else []
-        cell = values[0] if values else None
-        if _is_colored(cell):
+        if _is_colored(_first_cell(row)):
             rows.append(header_rows + offset)
     return rows
 
 
+def _first_cell(row) -> dict | None:
+    values = row.get("values", []) if isinstance(row, dict) else []
+    return values[0] if values else None
+
+
 def find_rows_by_programmatic_duplicates(
     service,
     spreadsheet_id: str,
@@ -171,13 +223,16 @@ def find_rows_by_programmatic_duplicates(
     )
 
     values = result.get("values", [])
+    return _programmatic_duplicates([row[0] if row else "" for row in values], header_rows)
+
+
+def _programmatic_duplicates(column: Sequence, header_rows: int) -> List[int]:
     duplicates: List[int] = []
     seen: set[str] = set()
 
-    for idx, row in enumerate(values):
+    for idx, cell_value in enumerate(column):
         if idx < header_rows:
             continue
-        cell_value = row[0] if row else ""
         if cell_value is None:
             cell_value = ""
         if not isinstance(cell_value, str):
@@ -192,6 +247,137 @@ def find_rows_by_programmatic_duplicates(
     return duplicates
 
 
+@dataclass
+class SheetSnapshot:
+    """The sheet ID and one column's values and colours, read in one request.
+
+    The cleanup steps used to read the same column (and look up the sheet
+    ID) once each.  They now share a snapshot and call :meth:`delete` after
+    deleting rows, which shifts the local copy the way the sheet shifted
+    instead of reading it again.  ``values`` and ``colored`` are indexed by
+    0-based row index and include the header rows.
+    """
+
+    sheet_id: int
+    title: str
+    email_col_letter: str = "E"
+    header_rows: int = 1
+    values: List[str] = field(default_factory=list)
+    colored: List[bool] = field(default_factory=list)
+
+    @classmethod
+    def fetch(
+        cls,
+        service,
+        spreadsheet_id: str,
+        title: str,
+        email_col_letter: str = "E",
+        header_rows: int = 1,
+    ) -> "SheetSnapshot":
+        """Read the sheet ID, values and background colours of ``email_col_letter``."""
+
+        range_a1 = f"'{title}'!{email_col_letter}1:{email_col_letter}"
+        try:
+            response = (
+                service.spreadsheets()
+                .get(
+                    spreadsheetId=spreadsheet_id,
+                    ranges=[range_a1],
+                    includeGridData=True,
+                    fields=(
+                        "sheets("
+                        "properties.sheetId,properties.title,"
+                        "data.rowData.values.formattedValue,"
+                        "data.rowData.values.effectiveFormat.backgroundColor,"
+                        "data.rowData.values.effectiveFormat.backgroundColorStyle"
+                        ")"
+                    ),
+                )
+                .execute()
+            )
+        except HttpError as exc:
+            logging.warning(
+                "[CLEANUP] Reading cell colours failed, reading values only. reason=%s",
+                exc,
+            )
+            return cls._fetch_values(
+                service, spreadsheet_id, title, email_col_letter, header_rows
+            )
+
+        sheets = response.get("sheets", [])
+        properties = sheets[0].get("properties", {}) if sheets else {}
+        if properties.get("sheetId") is None:
+            raise ValueError(
+                f"Worksheet {title!r} not found in spreadsheet {spreadsheet_id!r}"
+            )
+        data = sheets[0].get("data", [])
+        row_data = data[0].get("rowData", []) if data else []
+        cells = [_first_cell(row) for row in row_data]
+        return cls(
+            sheet_id=properties["sheetId"],
+            title=title,
+            email_col_letter=email_col_letter,
+            header_rows=header_rows,
+            values=[(cell or {}).get("formattedValue", "") for cell in cells],
+            colored=[_is_colored(cell) for cell in cells],
+        )
+
+    @classmethod
+    def _fetch_values(
+        cls, service, spreadsheet_id, title, email_col_letter, header_rows
+    ) -> "SheetSnapshot":
+        sheet_id = get_sheet_id(service, spreadsheet_id, title)
+        response = (
+            service.spreadsheets()
+            .values()
+            .get(
+                spreadsheetId=spreadsheet_id,
+                range=f"'{title}'!{email_col_letter}1:{email_col_letter}",
+                valueRenderOption="FORMATTED_VALUE",
+                majorDimension="COLUMNS",
+            )
+            .execute()
+        )
+        columns = response.get("values", [])
+        values = list(columns[0]) if columns else []
+        return cls(
+            sheet_id=sheet_id,
+            title=title,
+            email_col_letter=email_col_letter,
+            header_rows=header_rows,
+            values=values,
+            colored=[False] * len(values),
+        )
+
+    def emails_map(self) -> Dict[str, List[int]]:
+        """Same as :func:`collect_emails_map`, from the snapshot."""
+
+        return _emails_map(self.values[self.header_rows :], self.header_rows + 1)
+
+    def highlighted_rows(self) -> List[int]:
+        """Same as :func:`find_rows_highlighted_as_duplicates`, from the snapshot."""
+
+        return [
+            index
+            for index, colored in enumerate(self.colored)
+            if colored and index >= self.header_rows
+        ]
+
+    def programmatic_duplicates(self) -> List[int]:
+        """Same as :func:`find_rows_by_programmatic_duplicates`, from the snapshot."""
+
+        return _programmatic_duplicates(self.values, self.header_rows)
+
+    def delete(self, row_numbers: Iterable[int]) -> None:
+        """Remove the 1-based ``row_numbers`` after they were deleted on the sheet."""
+
+        for row in sorted({int(row) for row in row_numbers}, reverse=True):
+            if 0 < row <= len(self.values):
+                del self.values[row - 1]
+            if 0 < row <= len(self.colored):
+                del self.colored[row - 1]
+
+
 def _compress_consecutive_indices(indices: Sequence[int]) -> List[Tuple[int, int]]:
     if not indices:
         return []
@@ -240,6 +426,25 @@ def delete_rows(
     )
 
 
+def written_only_duplicates(
+    emails_map: Dict[str, List[int]], written_rows: Iterable[int]
+) -> List[int]:
+    """Return the ``written_rows`` whose email is on a row above, in descending order."""
+
+    written_set = {int(row) for row in written_rows}
+    to_delete: List[int] = []
+
+    for rows in emails_map.values():
+        if len(rows) <= 1:
+            continue
+        sorted_rows = sorted(rows)
+        for candidate in sorted_rows[1:]:
+            if candidate in written_set:
+                to_delete.append(candidate)
+
+    return sorted(set(to_delete), reverse=True)
+
+
 def cleanup_duplicates_written_only(
     service,
     spreadsheet_id: str,
@@ -263,23 +468,11 @@ def cleanup_duplicates_written_only(
         header_rows,
     )
 
-    written_set = {int(row) for row in written_rows}
-    to_delete: List[int] = []
-
-    for rows in emails_map.values():
-        if len(rows) <= 1:
-            continue
-        sorted_rows = sorted(rows)
-        for candidate in sorted_rows[1:]:
-            if candidate in written_set:
-                to_delete.append(candidate)
-
-    if not to_delete:
+    to_delete_desc = written_only_duplicates(emails_map, written_rows)
+    if not to_delete_desc:
         logging.info("[CLEANUP] No written-only duplicates to delete.")
         return 0
 
-    to_delete_desc = sorted(set(to_delete), reverse=True)
-
     if dry_run:
         logging.info(
             "[DRY_RUN] Would delete %s rows (written-only): %s",
@@ -0,0 +1,177 @@
+"""Quota-aware wrapper around the Google Sheets API client.
+
+Processing, status writes and the cleanup in :mod:`sheets_cleanup` all call
+``.execute()`` on the API client themselves, and only the batched writes
+retried a 429.  Large runs therefore ran into the per-minute quota part way
+through and failed in whichever step hit it.  :func:`wrap` returns a drop-in
+proxy of the client whose requests all go through one :class:`SheetsQuota`:
+
+* reads and writes each draw from a token bucket sized so that no
+  60-second window exceeds the per-minute quota;
+* 429s and 5xx responses are retried with the backoff of a
+  :class:`retry_policy.RetryPolicy`, honouring ``Retry-After``;
+* calls, retries and the time spent waiting are counted per API method.
+
+The process-wide quota is returned by :func:`get_quota` and can be replaced
+with :func:`configure`.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from googleapiclient.errors import HttpError
+
+from fetch_scheduler import TokenBucket
+from retry_policy import RetryPolicy
+
+DEFAULT_READS_PER_MINUTE = 60
+DEFAULT_WRITES_PER_MINUTE = 60
+READ_METHODS = frozenset({"get", "batchGet", "getByDataFilter", "batchGetByDataFilter"})
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+_T = TypeVar("_T")
+
+
+def _bucket(per_minute: int, clock: Callable[[], float]) -> TokenBucket:
+    # ``burst`` requests up front plus the refill over a minute add up to
+    # exactly ``per_minute``.
+    burst = max(1, per_minute // 12)
+    return TokenBucket(max(per_minute - burst, 1) / 60.0, burst, clock=clock)
+
+
+def http_status(exc: HttpError) -> Optional[int]:
+    return getattr(exc, "status_code", None) or getattr(exc.resp, "status", None)
+
+
+class SheetsQuota:
+    """Rate limits, retries and counters shared by every wrapped client."""
+
+    def __init__(
+        self,
+        *,
+        reads_per_minute: int = DEFAULT_READS_PER_MINUTE,
+        writes_per_minute: int = DEFAULT_WRITES_PER_MINUTE,
+        policy: Optional[RetryPolicy] = None,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.policy = policy or RetryPolicy(
+            attempts=8, base_delay=2.0, max_delay=64.0, max_retry_after=120.0
+        )
+        self._sleep = sleep
+        self._buckets = {
+            "read": _bucket(reads_per_minute, clock),
+            "write": _bucket(writes_per_minute, clock),
+        }
+        self._lock = threading.Lock()
+        self.calls: Counter = Counter()
+        self.retries: Counter = Counter()
+        self.waited = 0.0
+
+    @staticmethod
+    def kind(method: str) -> str:
+        return "read" if method.rsplit(".", 1)[-1] in READ_METHODS else "write"
+
+    def _wait(self, delay: float) -> None:
+        if delay > 0:
+            with self._lock:
+                self.waited += delay
+            self._sleep(delay)
+
+    def execute(self, method: str, call: Callable[[], _T]) -> _T:
+        """Run ``call`` (one request of API ``method``) within the quota."""
+
+        bucket = self._buckets[self.kind(method)]
+        attempt = 0
+        while True:
+            self._wait(bucket.reserve())
+            with self._lock:
+                self.calls[method] += 1
+            try:
+                return call()
+            except HttpError as exc:
+                status = http_status(exc)
+                if status not in RETRY_STATUSES:
+                    raise
+                headers = exc.resp if hasattr(exc.resp, "get") else {}
+                delay = self.policy.delay(attempt, headers.get("retry-after"))
+                if delay is None:
+                    raise
+                with self._lock:
+                    self.retries[method] += 1
+                logging.warning(
+                    "[SHEETS] %s returned %s; retrying in %.1fs", method, status, delay
+                )
+                self._wait(delay)
+                attempt += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": dict(self.calls),
+                "retries": dict(self.retries),
+                "waited_seconds": round(self.waited, 2),
+            }
+
+
+class _Request:
+    def __init__(self, request, quota: SheetsQuota, method: str):
+        self._request = request
+        self._quota = quota
+        self._method = method
+
+    def execute(self, **kwargs):
+        return self._quota.execute(self._method, lambda: self._request.execute(**kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._request, name)
+
+
+class _Resource:
+    """Proxy of an API resource that wraps the requests it creates."""
+
+    def __init__(self, resource, quota: SheetsQuota, path: str = ""):
+        self._resource = resource
+        self._quota = quota
+        self._path = path
+
+    def __getattr__(self, name):
+        attr = getattr(self._resource, name)
+        if not callable(attr):
+            return attr
+        path = f"{self._path}.{name}" if self._path else name
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, "execute"):
+                return _Request(result, self._quota, path)
+            return _Resource(result, self._quota, path)
+
+        return call
+
+
+_quota = SheetsQuota()
+
+
+def get_quota() -> SheetsQuota:
+    return _quota
+
+
+def configure(quota: SheetsQuota) -> None:
+    """Replace the process-wide quota used by :func:`wrap`."""
+
+    global _quota
+    _quota = quota
+
+
+def wrap(service, quota: Optional[SheetsQuota] = None):
+    """Return ``service`` with every request going through ``quota``."""
+
+    if service is None or isinstance(service, _Resource):
+        return service
+    return _Resource(service, quota or _quota)
@@ -0,0 +1,109 @@
+"""In-run deduplication of identical homepage crawls.
+
+Column C often lists the same site on many rows (chains, franchises and
+re-added leads).  :class:`SingleFlight` makes sure each normalised homepage
+is crawled once per run: the first row to ask starts the crawl, rows that ask
+while it is running wait for that result and later rows get it immediately.
+:class:`AsyncSingleFlight` does the same for the ``asyncio`` engine.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+from urllib.parse import urlsplit
+
+_T = TypeVar("_T")
+
+
+def homepage_key(url: str) -> str:
+    """Return the deduplication key for homepage ``url``.
+
+    The scheme, a leading ``www.``, the query, the fragment and trailing
+    slashes are ignored, so ``https://www.cafe.jp/`` and ``http://cafe.jp``
+    share a key while different branch pages of one domain do not.
+    """
+
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+    return host + parts.path.rstrip("/")
+
+
+class _Stats:
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class SingleFlight(_Stats):
+    """Run at most one call per key across threads and remember its outcome."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], _T]) -> Tuple[_T, bool]:
+        """Return ``(fn(), shared)`` where ``shared`` is ``True`` for reused results.
+
+        An exception raised by the first call is re-raised to every caller
+        with the same key.
+        """
+
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if leader:
+            try:
+                future.set_result(fn())
+            except BaseException as exc:
+                future.set_exception(exc)
+        return future.result(), not leader
+
+
+class AsyncSingleFlight(_Stats):
+    """Coroutine counterpart of :class:`SingleFlight` for one event loop."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(
+        self, key: Hashable, fn: Callable[[], Awaitable[_T]]
+    ) -> Tuple[_T, bool]:
+        future = self._calls.get(key)
+        if future is not None:
+            self.hits += 1
+            return await asyncio.shield(future), True
+
+        self.misses += 1
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result: Any = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Mark the exception as retrieved when nobody else was waiting.
+            future.exception()
+            raise
+        future.set_result(result)
+        return result, False
@@ -0,0 +1,193 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import sys
+import threading
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import async_crawl
+import retry_policy
+import update_contact_info_api as api
+
+PAGES = {
+    "/mailto/": (
+        "<a href='https://www.instagram.com/mailto_cafe'>IG</a>"
+        "<a href='mailto:hello@mailto.example'>mail</a>"
+    ),
+    "/deep/": "<a href='/deep/about'>About</a><a href='/deep/contact'>Contact</a>",
+    "/deep/about": "<p>Write to us: owner[at]deep.example</p>",
+    "/deep/contact": "<form action='/send'></form>",
+    "/form/": "<a href='/form/inquiry'>お問い合わせ</a><a href='/form/menu'>Menu</a>",
+    "/form/inquiry": "<form></form>",
+    "/form/menu": "<p>Matcha latte</p>",
+    "/empty/": "<p>Nothing to see</p>",
+    "/blocked/": "<a href='/blocked/forbidden'>contact</a>",
+}
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(retry_policy, "_policy", retry_policy.RetryPolicy(base_delay=0))
+    monkeypatch.setattr(retry_policy, "_breakers", retry_policy.CircuitBreakers())
+
+
+@pytest.fixture
+def site_server():
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if self.path.endswith("/forbidden"):
+                self.send_response(403)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = PAGES.get(self.path)
+            if body is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _rows(base):
+    paths = ["/mailto/", "/deep/", "/form/", "/empty/", "/blocked/", "/missing/"]
+    rows = [["data", "", base + path] for path in paths]
+    rows.append(["data", "", ""])
+    rows.append(["data", "", "ftp://not-http"])
+    return [(index, row) for index, row in enumerate(rows, start=2)]
+
+
+def _values(result):
+    return (result.row_index, result.insta, result.email, result.form, result.status)
+
+
+def test_async_engine_matches_sync_path(site_server):
+    tasks = _rows(site_server)
+
+    expected = [
+        api._crawl_row(index, row, timeout=5, verify_ssl=True) for index, row in tasks
+    ]
+    actual = list(
+        async_crawl.map_in_order(
+            lambda task, fetcher: api._crawl_row_async(*task, fetcher),
+            tasks,
+            workers=3,
+            fetcher=async_crawl.AsyncFetcher(timeout=5),
+        )
+    )
+
+    assert [_values(r) for r in actual] == [_values(r) for r in expected]
+    assert [r.fetches for r in actual] == [r.fetches for r in expected]
+    by_row = {r.row_index: r for r in actual}
+    assert by_row[2].email == "hello@mailto.example"
+    assert by_row[3].email == "owner@deep.example"
+    assert by_row[3].form == site_server + "/deep/contact"
+    assert by_row[4].form == site_server + "/form/inquiry"
+    assert by_row[5].status == "なし"
+    assert by_row[7].status == "エラー"
+
+
+def test_streaming_fetches_match_whole_page_results(site_server, monkeypatch):
+    import fetch_client
+
+    tasks = _rows(site_server)
+    expected = [
+        api._crawl_row(index, row, timeout=5, verify_ssl=True) for index, row in tasks
+    ]
+
+    monkeypatch.setattr(fetch_client, "_client", None)
+    client = fetch_client.configure(max_bytes=64 * 1024)
+    try:
+        streamed = [
+            api._crawl_row(index, row, timeout=5, verify_ssl=True)
+            for index, row in tasks
+        ]
+    finally:
+        client.close()
+        monkeypatch.setattr(fetch_client, "_client", None)
+    streamed_async = list(
+        async_crawl.map_in_order(
+            lambda task, fetcher: api._crawl_row_async(*task, fetcher),
+            tasks,
+            workers=3,
+            fetcher=async_crawl.AsyncFetcher(timeout=5, max_bytes=64 * 1024),
+        )
+    )
+
+    assert [_values(r) for r in streamed] == [_values(r) for r in expected]
+    assert [_values(r) for r in streamed_async] == [_values(r) for r in expected]
+
+
+def test_map_in_order_submits_a_bounded_window():
+    pulled = []
+
+    def items():
+        for item in range(100):
+            pulled.append(item)
+            yield item
+
+    async def double(item, fetcher):
+        return item * 2
+
+    results = async_crawl.map_in_order(
+        double, items(), workers=3, fetcher=async_crawl.AsyncFetcher(timeout=5)
+    )
+
+    assert next(results) == 0
+    assert len(pulled) <= 2 * 3 + 1
+    assert list(results) == [item * 2 for item in range(1, 100)]
+
+
+def test_host_semaphore_is_shared_per_host():
+    fetcher = async_crawl.AsyncFetcher(per_host=2)
+    first = fetcher._host_semaphore("http://Example.com/a")
+    assert fetcher._host_semaphore("http://example.com/b") is first
+    assert fetcher._host_semaphore("http://other.example/") is not first
+
+
+def test_process_sheet_asyncio_engine(site_server, monkeypatch):
+    from test_update_contact_info_api_process import FakeService
+
+    rows = [row for _, row in _rows(site_server)]
+    service = FakeService(rows)
+    monkeypatch.setattr(api, "_build_sheet_service", lambda credentials_file: service)
+
+    state = api.ProcessState(spreadsheet_id="spreadsheet", worksheet="Sheet")
+    updated = api.process_sheet(
+        "spreadsheet",
+        "Sheet",
+        start_row=2,
+        max_rows=None,
+        timeout=5,
+        verify_ssl=True,
+        credentials_file="creds.json",
+        state=state,
+        workers=4,
+        engine="asyncio",
+    )
+
+    assert updated == len(rows)
+    cells = service.cells()
+    assert [row for row, _ in cells] == list(range(2, 2 + len(rows)))
+    assert cells[1][1] == ["", "owner@deep.example", site_server + "/deep/contact", ""]
+    assert state.error_rows == [7, 9]
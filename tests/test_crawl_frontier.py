@@ -0,0 +1,67 @@
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import update_contact_info as uc
+from crawl_frontier import Frontier, is_asset, score_link
+from page_cache import PageCache
+
+
+def test_score_link_prefers_contact_and_company_pages():
+    assert score_link("https://cafe.jp/contact") > score_link("https://cafe.jp/about")
+    assert score_link("https://cafe.jp/p?id=3", "お問い合わせ") > 0
+    assert score_link("https://cafe.jp/company/") == score_link("https://cafe.jp/x", "会社概要")
+    assert score_link("https://cafe.jp/blog/2024/01") < score_link("https://cafe.jp/menu")
+
+
+def test_is_asset():
+    assert is_asset("https://cafe.jp/menu.PDF")
+    assert is_asset("https://cafe.jp/img/latte.jpg?v=2")
+    assert not is_asset("https://cafe.jp/about.html")
+    assert not is_asset("https://cafe.jp/contact/")
+
+
+def test_frontier_orders_dedupes_and_skips_assets():
+    frontier = Frontier()
+    assert frontier.push("https://cafe.jp/", 0)
+    frontier.pop()
+    frontier.push("https://cafe.jp/gallery/1", 1)
+    frontier.push("https://cafe.jp/menu", 1)
+    frontier.push("https://cafe.jp/inquiry", 1)
+    assert not frontier.push("https://cafe.jp/inquiry#form", 1)
+    assert not frontier.push("https://cafe.jp/flyer.pdf", 1, "contact")
+    frontier.push("https://cafe.jp/about", 1)
+
+    order = [frontier.pop()[0] for _ in range(len(frontier))]
+    assert order == [
+        "https://cafe.jp/inquiry",
+        "https://cafe.jp/about",
+        "https://cafe.jp/menu",
+        "https://cafe.jp/gallery/1",
+    ]
+    assert frontier.skipped_assets == 1
+
+
+def test_frontier_keeps_the_best_links_when_full():
+    frontier = Frontier(max_size=2)
+    frontier.push("https://cafe.jp/a", 1)
+    frontier.push("https://cafe.jp/b", 1)
+    assert frontier.push("https://cafe.jp/contact", 1)
+    assert not frontier.push("https://cafe.jp/blog", 1)
+    assert [frontier.pop()[0] for _ in range(len(frontier))] == [
+        "https://cafe.jp/contact",
+        "https://cafe.jp/a",
+    ]
+    assert frontier.dropped == 2
+
+
+def test_crawl_visits_contact_page_before_gallery():
+    gallery = "".join(f"<a href='/gallery/{i}'>Photo {i}</a>" for i in range(30))
+    pages = {
+        "https://cafe.jp/": gallery + "<a href='/img/top.png'>top</a><a href='/contact'>Contact</a>",
+        "https://cafe.jp/contact": "<p>mail: hello@cafe.jp</p>",
+    }
+    cache = PageCache(lambda url: pages.get(url, "<p>photo</p>"))
+
+    assert uc.crawl_site_for_email("https://cafe.jp/", cache=cache) == "hello@cafe.jp"
+    assert cache.fetches == 2
@@ -0,0 +1,30 @@
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from crawl_log import CrawlLog
+
+
+def test_record_is_keyed_by_homepage(tmp_path):
+    log = CrawlLog(str(tmp_path))
+    log.record("https://www.cafe.example/", "なし", now=100.0)
+
+    assert log.crawled_at("http://cafe.example") == 100.0
+    assert log.crawled_at("https://other.example") is None
+    assert log.stats() == {"homepages": 1}
+
+
+def test_unknown_homepage_ages_from_first_sighting(tmp_path):
+    log = CrawlLog(str(tmp_path))
+
+    assert not log.is_stale("https://cafe.example", 50, now=1000.0)
+    assert not log.is_stale("https://cafe.example", 50, now=1040.0)
+    assert log.is_stale("https://cafe.example", 50, now=1060.0)
+
+
+def test_log_persists_between_runs(tmp_path):
+    log = CrawlLog(str(tmp_path))
+    log.record("https://cafe.example", now=5.0)
+    log.close()
+
+    assert CrawlLog(str(tmp_path)).crawled_at("https://cafe.example") == 5.0
@@ -0,0 +1,132 @@
+from pathlib import Path
+import asyncio
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import async_crawl
+import update_contact_info as uc
+from email_collector import CrawlBudget
+from fetch_client import PartialText
+from page_cache import PageCache
+
+PAGES = {
+    "https://cafe.com/": (
+        "<a href='mailto:info@cafe.com'>Mail</a>"
+        "<a href='/about'>About</a><a href='/contact'>Contact</a><a href='/blog'>Blog</a>"
+    ),
+    "https://cafe.com/contact": "<p>Wholesale: wholesale@cafe.com</p>",
+    "https://cafe.com/about": "<p>hello@gmail.com</p>",
+    "https://cafe.com/blog": "<p>" + "x" * 4096 + "</p>",
+}
+
+
+def _cache(pages):
+    visited = []
+
+    def fetch(url):
+        visited.append(url)
+        return pages.get(url)
+
+    return PageCache(fetch), visited
+
+
+def test_first_address_without_budget():
+    cache, visited = _cache(PAGES)
+
+    assert uc.crawl_site_for_email("https://cafe.com/", cache=cache) == "info@cafe.com"
+    assert visited == ["https://cafe.com/"]
+
+
+def test_ranked_crawl_stops_at_a_confident_address():
+    cache, visited = _cache(PAGES)
+
+    email = uc.crawl_site_for_email("https://cafe.com/", cache=cache, budget=CrawlBudget())
+
+    assert email == "wholesale@cafe.com"
+    assert visited == ["https://cafe.com/", "https://cafe.com/contact"]
+
+
+def test_ranked_crawl_picks_the_best_address_within_the_page_budget():
+    pages = dict(PAGES, **{"https://cafe.com/contact": "<p>hello@gmail.com</p>"})
+    pages["https://cafe.com/about"] = "<a href='mailto:orders@cafe.com'>Order now</a>"
+
+    cache, visited = _cache(pages)
+    budget = CrawlBudget(max_pages=2)
+    email = uc.crawl_site_for_email("https://cafe.com/", cache=cache, budget=budget)
+
+    assert visited == ["https://cafe.com/", "https://cafe.com/contact"]
+    assert email == "info@cafe.com"
+
+
+def test_ranked_crawl_stops_at_the_byte_budget():
+    pages = {
+        "https://cafe.com/": "<a href='/news'>News</a><a href='/story'>Story</a>",
+        "https://cafe.com/story": "<p>" + "x" * 2048 + "</p>",
+        "https://cafe.com/news": "<p>info@cafe.com</p>",
+    }
+    cache, visited = _cache(pages)
+
+    email = uc.crawl_site_for_email(
+        "https://cafe.com/", cache=cache, budget=CrawlBudget(max_kb=1)
+    )
+
+    assert email is None
+    assert visited == ["https://cafe.com/", "https://cafe.com/story"]
+    assert cache.bytes_downloaded > 1024
+
+
+def test_async_ranked_crawl_matches_sync():
+    async def fetch(url):
+        return PAGES.get(url)
+
+    cache = async_crawl.AsyncPageCache(fetch)
+    email = asyncio.run(
+        async_crawl.crawl_site_for_email("https://cafe.com/", cache, budget=CrawlBudget())
+    )
+
+    assert email == "wholesale@cafe.com"
+    assert cache.fetches == 2
+
+
+STREAMED = {
+    "https://cafe.com/": "<a href='/contact'>Contact</a>",
+    "https://cafe.com/contact": (
+        "<a href='mailto:info@cafe.com'>Mail</a>"
+        "<p>Wholesale: <a href='mailto:wholesale@cafe.com'>wholesale@cafe.com</a></p>"
+    ),
+}
+
+
+def _partial(content):
+    # What a streamed download stopped by ``_has_usable_mailto`` returns.
+    start = content.find("mailto:")
+    if start < 0:
+        return content
+    return PartialText(content[: content.index("</a>", start) + len("</a>")])
+
+
+def test_ranked_crawl_reads_whole_pages_when_streaming():
+    cache = PageCache(
+        lambda url: STREAMED.get(url),
+        fetch_partial=lambda url: _partial(STREAMED[url]),
+    )
+
+    assert uc.crawl_site_for_email("https://cafe.com/", cache=cache) == "info@cafe.com"
+    assert cache.partial_pages == 1
+    email = uc.crawl_site_for_email("https://cafe.com/", cache=cache, budget=CrawlBudget())
+    assert email == "wholesale@cafe.com"
+
+    async def fetch(url):
+        return STREAMED.get(url)
+
+    async def fetch_partial(url):
+        return _partial(STREAMED[url])
+
+    async_cache = async_crawl.AsyncPageCache(fetch, fetch_partial=fetch_partial)
+    email = asyncio.run(
+        async_crawl.crawl_site_for_email(
+            "https://cafe.com/", async_cache, budget=CrawlBudget()
+        )
+    )
+    assert email == "wholesale@cafe.com"
+    assert async_cache.partial_pages == 0
@@ -0,0 +1,76 @@
+from pathlib import Path
+import html
+import random
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import email_scanner
+import update_contact_info as uc
+
+TOKENS = [
+    "a", "Z", "0", "9", ".", "-", "_", "%", "+", "@", " ", "\n", "co", "jp",
+    "x.y", "..", "[at]", "(at)", "＠", "&amp;", "&#64;", "&commat;", "&#x40",
+    "&", "#", ";", "ｉ", "．", "あ", "メール",
+]
+
+
+def legacy_emails(text):
+    """The extraction ``_email_on_page`` used before the scanner existed."""
+
+    text = html.unescape(text)
+    for pattern in ["[at]", "(at)", "＠"]:
+        text = text.replace(pattern, "@")
+    return [match.group(0) for match in uc.EMAIL_RE.finditer(text)]
+
+
+def fold(text):
+    return html.unescape(text).translate(email_scanner._FULLWIDTH_TO_ASCII)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_scanner_matches_legacy_regex_on_random_text(seed):
+    rng = random.Random(seed)
+    for _ in range(4000):
+        text = "".join(rng.choice(TOKENS) for _ in range(rng.randint(0, 40)))
+        assert list(email_scanner.iter_emails(text)) == legacy_emails(fold(text)), text
+
+
+def test_scanner_matches_legacy_regex_on_ascii_text():
+    rng = random.Random(42)
+    ascii_tokens = [t for t in TOKENS if t.isascii()]
+    for _ in range(4000):
+        text = "".join(rng.choice(ascii_tokens) for _ in range(rng.randint(0, 60)))
+        assert list(email_scanner.iter_emails(text)) == legacy_emails(text), text
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("info[at]cafe.jp", ["info@cafe.jp"]),
+        ("shop (at) cafe.jp / shop(at)cafe.jp", ["shop@cafe.jp"]),
+        ("&lt;owner&#64;cafe.co.jp&gt;", ["owner@cafe.co.jp"]),
+        ("ｉｎｆｏ＠ｃａｆｅ．ｊｐ", ["info@cafe.jp"]),
+        ("a@b.c1d.ef9 x@y", ["a@b.c1d.ef"]),
+        ("a@b@c.de", ["b@c.de"]),
+    ],
+)
+def test_scanner_examples(text, expected):
+    assert list(email_scanner.iter_emails(text)) == expected
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "a" * 200_000,
+        "a@" + "a." * 100_000,
+        "a." * 100_000 + "@",
+        ("x" * 1000 + "@") * 200,
+    ],
+)
+def test_scanner_is_fast_on_hostile_input(text):
+    start = time.perf_counter()
+    list(email_scanner.iter_emails(text))
+    assert time.perf_counter() - start < 1.0
@@ -0,0 +1,156 @@
+from pathlib import Path
+import random
+import sys
+from urllib.parse import urlparse
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import email_scoring
+from update_contact_info_api import select_best_email
+
+LOCALS = [
+    "info", "Info.Team", "sales", "orders", "order", "wholesale", "wholesales",
+    "support", "help", "jobs", "pr", "press", "owner", "manager+cafe", "hello",
+    "catering", "buyer", "fnb", "trade.orders", "noreply", "x", "kitchen",
+]
+DOMAINS = ["cafe.com", "shop.cafe.com", "gmail.com", "other.jp", "CAFE.COM"]
+SOURCES = [
+    "", "https://cafe.com/contact", "https://cafe.com/order-online",
+    "https://cafe.com/wholesale", "https://cafe.com/careers", "https://other.jp/",
+    "https://shop.cafe.com/menu", "https://cafe.com/b2b/trade",
+]
+ANCHORS = ["", "Contact us", "Order now", "Wholesale orders", "Careers", "Email", None]
+
+
+def legacy_select_best_email(candidates, site_url, allow_external=False, allow_support=False):
+    """``select_best_email`` as it was before the scorer was compiled."""
+
+    base_host = email_scoring._host_from_url(site_url)
+
+    def score_one(e: dict, relax=False):
+        email = (e.get('email') or '').strip()
+        src = e.get('source_url') or ''
+        anchor = (e.get('anchor_text') or '').lower()
+
+        if not email or '@' not in email:
+            return None
+
+        if 'catering' in email.lower():
+            return ('blocked', email, 'blocked:catering_address')
+
+        local, domain = email.split('@', 1)
+        nlocal = email_scoring._norm_local(local)
+        path = urlparse(src).path.lower() if src else ''
+
+        if any(k in nlocal for k in email_scoring.BLOCK_LOCAL):
+            return ('blocked', email, 'blocked:purpose_mismatch')
+        if any(p in path for p in email_scoring.PURPOSE_PATH) or any(p in anchor for p in email_scoring.PURPOSE_ANCHOR):
+            return ('blocked', email, 'blocked:purpose_section')
+
+        if 'orders' in nlocal or nlocal == 'order':
+            if any(p in path for p in email_scoring.CONSUMER_ORDER_PATH) or any(k in anchor for k in email_scoring.CONSUMER_ANCHOR):
+                return ('blocked', email, 'blocked:consumer_order_inbox')
+            if any(k in path for k in email_scoring.TRADE_HINTS) or any(k in anchor for k in email_scoring.TRADE_HINTS):
+                extra_orders_bonus = 3
+            else:
+                extra_orders_bonus = 0
+        else:
+            extra_orders_bonus = 0
+
+        s = 0
+        if any(k in nlocal for k in email_scoring.STRONG_PLUS): s += 6
+        if any(k in nlocal for k in email_scoring.MID_PLUS):    s += 4
+        if any(k in nlocal for k in email_scoring.SOFT_PLUS):   s += 3
+        if any(k in nlocal for k in email_scoring.WEAK_PLUS):   s += 1
+        s += extra_orders_bonus
+
+        same = email_scoring._same_site(domain.lower(), email_scoring._host_from_url(src) or base_host)
+        if same: s += 2
+        else:    s -= 1 if relax or allow_external else 2
+
+        if any(k in nlocal for k in email_scoring.SUPPORT_LOCAL):
+            if relax or allow_support:
+                s -= 2
+            else:
+                return ('blocked', email, 'blocked:support_only')
+
+        threshold = 1 if not relax else 0
+        if s < threshold:
+            return ('blocked', email, f'blocked:low_score({s})')
+
+        tie = (
+            0 if same else 1,
+            - (6 if any(k in nlocal for k in email_scoring.STRONG_PLUS) else
+               4 if any(k in nlocal for k in email_scoring.MID_PLUS) else
+               3 if any(k in nlocal for k in email_scoring.SOFT_PLUS) else
+               1 if any(k in nlocal for k in email_scoring.WEAK_PLUS) else 0) - extra_orders_bonus,
+            len(local),
+            email
+        )
+        return ('keep', email, s, tie)
+
+    def run(relax=False):
+        kept = []
+        blocked = []
+        for c in candidates:
+            res = score_one(c, relax=relax)
+            if not res:
+                continue
+            if res[0] == 'keep':
+                kept.append(res[1:])
+            else:
+                blocked.append((res[1], res[2]))
+        return kept, blocked
+
+    kept, blocked = run(relax=False)
+    notes = []
+    if not kept:
+        kept, blocked_relax = run(relax=True)
+        blocked.extend(b for b in blocked_relax if b not in blocked)
+        if kept:
+            notes.append('relaxed')
+
+    best = None
+    if kept:
+        kept.sort(key=lambda x: (-x[1], x[2]))
+        best = kept[0][0]
+    kept_emails = [k[0] for k in kept]
+    return best, notes, kept_emails, blocked
+
+
+def _candidate(rng):
+    local = rng.choice(LOCALS)
+    domain = rng.choice(DOMAINS)
+    email = rng.choice([f"{local}@{domain}", f" {local}@{domain} ", local, ""])
+    return {
+        "email": email,
+        "source_url": rng.choice(SOURCES),
+        "anchor_text": rng.choice(ANCHORS),
+    }
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_compiled_scorer_matches_legacy(seed):
+    rng = random.Random(seed)
+    for _ in range(500):
+        candidates = [_candidate(rng) for _ in range(rng.randint(0, 6))]
+        site = rng.choice(["https://cafe.com", "https://www.cafe.com/", "", "https://other.jp"])
+        flags = {"allow_external": rng.random() < 0.3, "allow_support": rng.random() < 0.3}
+        assert select_best_email(candidates, site, **flags) == legacy_select_best_email(
+            candidates, site, **flags
+        ), (candidates, site, flags)
+
+
+def test_score_candidates_scores_a_batch():
+    candidates = [
+        {"email": "wholesale@cafe.com", "source_url": "https://cafe.com/", "anchor_text": ""},
+        {"email": "jobs@cafe.com", "source_url": "", "anchor_text": ""},
+        {"email": "not-an-email", "source_url": "", "anchor_text": ""},
+    ]
+
+    assert email_scoring.score_candidates(candidates, "https://cafe.com") == [
+        ("keep", "wholesale@cafe.com", 8, (0, -6, 9, "wholesale@cafe.com")),
+        ("blocked", "jobs@cafe.com", "blocked:purpose_mismatch"),
+        None,
+    ]
@@ -0,0 +1,193 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import fetch_client
+import update_contact_info as uc
+
+
+@pytest.fixture
+def server():
+    peers = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            peers.append(self.client_address)
+            body = b"<html>ok</html>"
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", peers
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_client_reuses_connections(server):
+    base, peers = server
+    client = fetch_client.FetchClient()
+    try:
+        for i in range(5):
+            res = client.get(f"{base}/page{i}", timeout=5)
+            assert res.text == "<html>ok</html>"
+    finally:
+        client.close()
+
+    assert len(peers) == 5
+    assert len(set(peers)) == 1
+
+
+def test_threads_share_pool_within_per_host_limit(server):
+    base, peers = server
+    client = fetch_client.FetchClient(per_host=2)
+    sessions = []
+
+    def worker():
+        sessions.append(client.session())
+        for i in range(3):
+            client.get(f"{base}/page{i}", timeout=5)
+
+    try:
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        client.close()
+
+    assert len(peers) == 12
+    assert len({id(s) for s in sessions}) == 4
+    assert len(set(peers)) <= 2
+
+
+def test_configure_replaces_default_client(monkeypatch):
+    monkeypatch.setattr(fetch_client, "_client", None)
+    client = fetch_client.configure(pool_size=8, per_host=3)
+    try:
+        assert fetch_client.get_client() is client
+        assert (client.pool_size, client.per_host) == (8, 3)
+    finally:
+        client.close()
+
+
+FILLER = b"<p>" + b"matcha " * 20000 + b"</p>"
+SITE = {
+    "/": (b"text/html", b'<a href="/contact">Contact</a>' + FILLER),
+    "/contact": (
+        b"text/html; charset=utf-8",
+        b'<a href="mailto:hello@cafe.jp">mail</a>' + FILLER + b"<form></form>",
+    ),
+    "/video.mp4": (b"video/mp4", b"\x00" * 500000),
+}
+
+
+@pytest.fixture
+def site():
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            content_type, body = SITE[self.path]
+            self.send_response(200)
+            self.send_header("Content-Type", content_type.decode())
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_streaming_caps_body_size(site):
+    client = fetch_client.FetchClient(max_bytes=4096)
+    try:
+        res = client.get(f"{site}/", timeout=5)
+    finally:
+        client.close()
+    assert len(res.content) == 4096
+    assert res.truncated and not res.stopped_early
+    assert res.text.startswith('<a href="/contact">')
+
+
+def test_capped_bodies_are_not_cached(site, tmp_path):
+    from http_cache import HttpCache
+
+    client = fetch_client.FetchClient(max_bytes=4096, cache=HttpCache(str(tmp_path)))
+    try:
+        assert client.get(f"{site}/", timeout=5).truncated
+    finally:
+        client.close()
+
+    client = fetch_client.FetchClient(cache=HttpCache(str(tmp_path)))
+    try:
+        res = client.get(f"{site}/", timeout=5)
+    finally:
+        client.close()
+    assert not getattr(res, "from_cache", False)
+    assert len(res.content) == len(SITE["/"][1])
+
+
+def test_streaming_rejects_non_html(site):
+    client = fetch_client.FetchClient(max_bytes=4096)
+    try:
+        with pytest.raises(fetch_client.NotHtmlError):
+            client.get(f"{site}/video.mp4", timeout=5)
+    finally:
+        client.close()
+
+
+def test_streaming_stops_at_first_usable_mailto(site):
+    client = fetch_client.FetchClient(max_bytes=1024 * 1024)
+    try:
+        res = client.get(f"{site}/contact", timeout=5, stop=uc._has_usable_mailto)
+    finally:
+        client.close()
+    assert res.stopped_early and not res.truncated
+    assert len(res.content) < len(SITE["/contact"][1])
+    assert isinstance(fetch_client.response_text(res), fetch_client.PartialText)
+
+
+def test_has_usable_mailto_skips_blocked_addresses():
+    assert not uc._has_usable_mailto(b'<a href="mailto:orders@cafe.jp">x</a>')
+    assert not uc._has_usable_mailto(b'<a href="mailto:hello@cafe.jp')
+    assert uc._has_usable_mailto(b"<a href=mailto:hello%40cafe.jp?subject=hi>x</a>")
+
+
+def test_crawl_reads_partial_pages_and_refetches_for_forms(site, monkeypatch):
+    monkeypatch.setattr(fetch_client, "_client", None)
+    client = fetch_client.configure(max_bytes=1024 * 1024)
+    try:
+        cache = uc._page_cache(5, True)
+        home = cache.page(f"{site}/")
+        assert uc.crawl_site_for_email(f"{site}/", cache=cache) == "hello@cafe.jp"
+        assert cache.partial_pages == 1
+        assert uc.find_contact_form(home, f"{site}/", cache=cache) == f"{site}/contact"
+    finally:
+        client.close()
+        monkeypatch.setattr(fetch_client, "_client", None)
+    assert cache.fetches == 3
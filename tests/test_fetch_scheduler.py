@@ -0,0 +1,91 @@
+from pathlib import Path
+import sys
+import threading
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import fetch_client
+from fetch_scheduler import (
+    FetchScheduler,
+    TokenBucket,
+    platform_for_address,
+    platform_for_host,
+)
+
+
+def test_platform_detection():
+    assert platform_for_host("matcha.wixsite.com") == "wix"
+    assert platform_for_host("shop.MYSHOPIFY.com.") == "shopify"
+    assert platform_for_host("cafe.jimdofree.com") == "jimdo"
+    assert platform_for_host("notwix.com") is None
+    assert platform_for_address("198.185.159.145") == "squarespace"
+    assert platform_for_address("23.227.38.65") == "shopify"
+    assert platform_for_address("203.0.113.7") is None
+    assert platform_for_address("not-an-ip") is None
+
+
+def test_group_uses_platform_then_address_then_host():
+    addresses = {
+        "green-whisk.nyc": "198.49.23.144",
+        "cafe-a.jp": "203.0.113.7",
+        "cafe-b.jp": "203.0.113.7",
+    }
+    scheduler = FetchScheduler(resolver=addresses.get)
+
+    assert scheduler.group("https://green-whisk.nyc/") == "platform:squarespace"
+    assert scheduler.group("https://kyoto.wixsite.com/matcha") == "platform:wix"
+    assert scheduler.group("https://cafe-a.jp/") == scheduler.group("http://cafe-b.jp/x")
+    assert scheduler.group("https://cafe-a.jp/") == "ip:203.0.113.7"
+    assert scheduler.group("https://unknown.example/") == "host:unknown.example"
+    assert scheduler.stats()["groups"] == 4
+
+
+def test_token_bucket_spaces_requests_after_the_burst():
+    now = [0.0]
+    bucket = TokenBucket(rate=2, burst=2, clock=lambda: now[0])
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+    now[0] = 2.0
+    assert bucket.reserve() == 0.0
+
+
+def test_slot_limits_concurrency_per_group():
+    scheduler = FetchScheduler(
+        per_host=4, per_group=2, rate=0, resolver=lambda host: "203.0.113.7"
+    )
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def fetch(host):
+        with scheduler.slot(f"https://{host}/"):
+            with lock:
+                active.append(host)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.remove(host)
+
+    threads = [threading.Thread(target=fetch, args=(f"cafe{i}.jp",)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert max(peak) == 2
+
+
+def test_client_takes_a_slot_per_request(monkeypatch):
+    slots = []
+
+    class Scheduler(FetchScheduler):
+        def slot(self, url):
+            slots.append(url)
+            return super().slot(url)
+
+    class Session:
+        def get(self, url, **kwargs):
+            return "response"
+
+    client = fetch_client.FetchClient(scheduler=Scheduler(rate=0, resolve=False))
+    monkeypatch.setattr(client, "session", lambda: Session())
+    assert client.get("https://cafe.jp/", timeout=5) == "response"
+    assert slots == ["https://cafe.jp/"]
@@ -0,0 +1,110 @@
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import fetch_client
+from http_cache import HttpCache, canonical_url
+
+
+@pytest.fixture
+def server():
+    log = []
+    bodies = {"/page": b"<html>v1</html>"}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            body = bodies.get(self.path, b"<html>other</html>")
+            etag = f'"{len(body)}-{hash(body) & 0xffff}"'
+            conditional = self.headers.get("If-None-Match")
+            log.append((self.path, conditional))
+            if conditional == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", formatdate(usegmt=True))
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", log, bodies
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_canonical_url():
+    assert canonical_url("HTTP://Example.COM:80#top") == "http://example.com/"
+    assert canonical_url("https://example.com:8443/a?b=1") == "https://example.com:8443/a?b=1"
+
+
+def test_fresh_entries_skip_network(server, tmp_path):
+    base, log, _ = server
+    client = fetch_client.FetchClient(cache=HttpCache(str(tmp_path)))
+    try:
+        first = client.get(base + "/page", timeout=5)
+        second = client.get(base + "/page#frag", timeout=5)
+    finally:
+        client.close()
+
+    assert first.text == second.text == "<html>v1</html>"
+    assert getattr(second, "from_cache", False)
+    assert len(log) == 1
+
+
+def test_stale_entries_revalidate_across_runs(server, tmp_path):
+    base, log, bodies = server
+    client = fetch_client.FetchClient(cache=HttpCache(str(tmp_path), ttl=0))
+    try:
+        client.get(base + "/page", timeout=5)
+    finally:
+        client.close()
+
+    cache = HttpCache(str(tmp_path), ttl=0)
+    client = fetch_client.FetchClient(cache=cache)
+    try:
+        again = client.get(base + "/page", timeout=5)
+        assert again.text == "<html>v1</html>"
+        assert cache.revalidated == 1
+        assert log[-1][1] is not None
+
+        bodies["/page"] = b"<html>v2</html>"
+        changed = client.get(base + "/page", timeout=5)
+        assert changed.text == "<html>v2</html>"
+        assert cache.misses == 1
+    finally:
+        client.close()
+
+
+def test_lru_eviction_keeps_size_bounded(server, tmp_path):
+    base, _, bodies = server
+    for i in range(4):
+        bodies[f"/p{i}"] = b"x" * 100
+    cache = HttpCache(str(tmp_path), max_bytes=250)
+    client = fetch_client.FetchClient(cache=cache)
+    try:
+        client.get(base + "/p0", timeout=5)
+        client.get(base + "/p1", timeout=5)
+        assert cache.lookup(base + "/p0") is not None  # p0 is now most recent
+        client.get(base + "/p2", timeout=5)
+        assert cache.lookup(base + "/p1") is None
+        assert cache.lookup(base + "/p0") is not None
+        assert cache.evicted == 1
+    finally:
+        client.close()
@@ -0,0 +1,59 @@
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import update_contact_info as uc
+from page_cache import PageCache
+
+
+def test_page_cache_fetches_and_parses_once():
+    calls = []
+
+    def fetch(url):
+        calls.append(url)
+        return "<a href='/contact'>contact</a>"
+
+    cache = PageCache(fetch)
+    first = cache.page("http://example.com/#top")
+    assert cache.page("http://example.com/") is first
+    assert cache.get("http://example.com") is not None
+    assert calls == ["http://example.com/#top"]
+    assert cache.fetches == 1
+    assert cache.parses == 1
+    assert cache.fetches_saved == 2
+
+
+def test_page_cache_remembers_failures():
+    calls = []
+
+    def fetch(url):
+        calls.append(url)
+        return None
+
+    cache = PageCache(fetch)
+    assert cache.page("http://example.com/dead") is None
+    assert cache.page("http://example.com/dead") is None
+    assert calls == ["http://example.com/dead"]
+
+
+def test_extractors_share_row_cache(monkeypatch):
+    pages = {
+        "http://example.com": "<a href='/contact'>Contact</a>",
+        "http://example.com/contact": "<form></form>",
+    }
+    calls = []
+
+    def fake_fetch(url, timeout=5, verify=True):
+        calls.append(url)
+        return pages.get(url)
+
+    monkeypatch.setattr(uc, "_fetch_page", fake_fetch)
+    cache = uc._page_cache(5, True)
+    page = cache.page("http://example.com")
+    assert uc.crawl_site_for_email("http://example.com", cache=cache) is None
+    assert (
+        uc.find_contact_form(page, "http://example.com", cache=cache)
+        == "http://example.com/contact"
+    )
+    assert calls == ["http://example.com", "http://example.com/contact"]
+    assert cache.fetches_saved == 2
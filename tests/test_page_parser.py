@@ -0,0 +1,64 @@
+from pathlib import Path
+import sys
+
+import pytest
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import page_parser
+import update_contact_info as uc
+
+CORPUS = Path(__file__).resolve().parents[1] / "benchmarks" / "corpus"
+
+SAMPLE = """<!DOCTYPE html><html><head><title>Cafe</title>
+<script>var x = "<a href='/not-a-link'>no</a>";</script>
+<style>a { color: red }</style></head>
+<body><!-- <a href="/commented">hidden</a> -->
+<a href="/contact" class=nav>お問い合わせ</a>
+<a hreflang="en" href='https://www.instagram.com/cafe/'>Insta &amp; more</a>
+<a name="anchor">no href</a>
+<p>Mail us: info(at)cafe.jp &copy; 2024</p>
+<a href=mailto:shop@cafe.jp?subject=hi>shop</a>
+<form method="post"><input name="q"></form>
+</body></html>"""
+
+
+@pytest.mark.parametrize("parser", page_parser.available_parsers())
+def test_backends_extract_the_same_page(parser):
+    page = page_parser.parse(SAMPLE, parser)
+
+    assert page.anchors == [
+        ("/contact", "お問い合わせ"),
+        ("https://www.instagram.com/cafe/", "Insta & more"),
+        ("mailto:shop@cafe.jp?subject=hi", "shop"),
+    ]
+    assert page.has_form
+    assert page.mailtos() == ["mailto:shop@cafe.jp?subject=hi"]
+    assert "not-a-link" not in page.text
+    assert "color: red" not in page.text
+    assert uc._email_on_page(page) == "shop@cafe.jp"
+
+
+@pytest.mark.parametrize("parser", page_parser.available_parsers())
+def test_backends_match_html_parser_on_corpus(parser):
+    for path in sorted(CORPUS.glob("*/*.html")):
+        content = path.read_text(encoding="utf-8")
+        expected = page_parser.parse(content, "html.parser")
+        page = page_parser.parse(content, parser)
+        assert page.anchors == expected.anchors, path.name
+        assert page.has_form == expected.has_form, path.name
+        assert uc._email_on_page(page) == uc._email_on_page(expected), path.name
+
+
+def test_as_page_accepts_soups():
+    soup = BeautifulSoup("<a href='https://instagram.com/x'>x</a>", "html.parser")
+    page = page_parser.as_page(soup)
+    assert page.anchors == [("https://instagram.com/x", "x")]
+    assert page_parser.as_page(page) is page
+    assert uc.find_instagram(soup, "https://cafe.jp") == "https://instagram.com/x"
+
+
+def test_set_default_parser_rejects_unknown_names():
+    with pytest.raises(ValueError):
+        page_parser.set_default_parser("html5lib")
+    assert page_parser.get_default_parser() == page_parser.DEFAULT_PARSER
@@ -0,0 +1,58 @@
+from pathlib import Path
+import asyncio
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import page_parser
+import parse_pool
+import update_contact_info as uc
+from page_cache import PageCache
+
+CORPUS = Path(__file__).resolve().parents[1] / "benchmarks" / "corpus"
+PAGES = sorted(CORPUS.glob("*/*.html"))
+
+
+@pytest.fixture
+def pool():
+    parse_pool.configure(2)
+    yield
+    parse_pool.shutdown()
+
+
+def test_worker_results_match_in_process_parsing(pool):
+    for path in PAGES:
+        content = path.read_text(encoding="utf-8")
+        local = page_parser.parse(content)
+        remote = parse_pool.parse(content)
+
+        assert remote.anchors == local.anchors, path
+        assert remote.has_form == local.has_form, path
+        assert list(remote.text_emails()) == list(local.text_emails()), path
+        assert uc._email_on_page(remote) == uc._email_on_page(local), path
+
+
+def test_async_parse_uses_the_pool(pool):
+    content = "<p>mail: info＠cafe.jp</p><a href='/contact'>お問い合わせ</a><form></form>"
+    page = asyncio.run(parse_pool.parse_async(content))
+
+    assert page.emails == ("info@cafe.jp",)
+    assert page.anchors == [("/contact", "お問い合わせ")]
+    assert page.has_form
+
+
+def test_page_cache_parses_in_the_pool(pool):
+    cache = PageCache(lambda url: "<a href='mailto:a@cafe.jp'>mail</a>")
+    page = cache.page("https://cafe.jp")
+
+    assert page.emails == ()
+    assert page.mailtos() == ["mailto:a@cafe.jp"]
+
+
+def test_without_pool_parsing_stays_in_process():
+    assert parse_pool.workers() == 0
+    page = parse_pool.parse("<p>info@cafe.jp</p>")
+
+    assert page.emails is None
+    assert "info@cafe.jp" in page.text
@@ -0,0 +1,151 @@
+from pathlib import Path
+import socket
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import fetch_client
+import retry_policy
+import update_contact_info as uc
+import update_contact_info_api as api
+from retry_policy import CircuitBreakers, RetryPolicy, parse_retry_after
+
+
+@pytest.fixture
+def breakers(monkeypatch):
+    board = CircuitBreakers(threshold=2)
+    monkeypatch.setattr(retry_policy, "_policy", RetryPolicy(base_delay=0))
+    monkeypatch.setattr(retry_policy, "_breakers", board)
+    return board
+
+
+class Resp:
+    def __init__(self, status, headers=None):
+        self.status_code = status
+        self.headers = headers or {}
+        self.text = "<p>ok</p>"
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(response=self)
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:10 GMT", now=1445412480) == 10.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_delay_uses_exponential_backoff_and_retry_after():
+    policy = RetryPolicy(attempts=4, base_delay=0.5, max_delay=1.5)
+    upper = lambda low, high: high  # noqa: E731
+    assert [policy.delay(n, rng=upper) for n in range(4)] == [0.5, 1.0, 1.5, None]
+    assert 0 <= policy.delay(0) <= 0.5
+    assert policy.delay(0, "2") == 2.0
+    assert policy.delay(0, "120") is None
+
+
+def test_policy_needs_at_least_one_attempt():
+    with pytest.raises(ValueError):
+        RetryPolicy(attempts=0)
+
+
+def test_breaker_opens_after_threshold_and_half_opens_after_cooldown():
+    now = [0.0]
+    board = CircuitBreakers(threshold=2, cooldown=60, clock=lambda: now[0])
+    board.record_status("https://cafe.jp/a", 403)
+    board.record_status("https://cafe.jp/b", 200)
+    board.record_status("https://cafe.jp/c", 403)
+    assert board.allow("https://cafe.jp/")
+    board.record_error("https://cafe.jp/d", requests.Timeout())
+    assert not board.allow("https://cafe.jp/e")
+    assert board.allow("https://other.jp/")
+    assert board.stats() == {"tripped": 1, "open": 1, "skipped": 1}
+
+    now[0] = 61
+    assert board.allow("https://cafe.jp/f")
+    board.record_status("https://cafe.jp/f", 429)
+    assert not board.allow("https://cafe.jp/g")
+    assert board.tripped == 2
+
+
+def test_dns_failures_open_the_breaker_immediately():
+    board = CircuitBreakers(threshold=5)
+    error = requests.ConnectionError(socket.gaierror(-2, "Name or service not known"))
+    assert board.record_error("https://gone.example/", error)
+    assert not board.allow("https://gone.example/contact")
+
+
+def test_fetch_page_honours_retry_after(breakers, monkeypatch):
+    responses = [Resp(503, {"Retry-After": "0"}), Resp(200)]
+    monkeypatch.setattr(uc.fetch_client, "get", lambda url, **kwargs: responses.pop(0))
+    assert uc._fetch_page("https://cafe.jp/") == "<p>ok</p>"
+    assert not responses
+
+
+def test_fetch_page_does_not_retry_not_found(breakers, monkeypatch):
+    calls = []
+
+    def fake_get(url, **kwargs):
+        calls.append(url)
+        return Resp(404)
+
+    monkeypatch.setattr(api.fetch_client, "get", fake_get)
+    assert api._fetch_page("https://cafe.jp/missing", timeout=5, verify=True) is None
+    assert calls == ["https://cafe.jp/missing"]
+
+
+def test_open_breaker_skips_remaining_fetches_to_host(breakers, monkeypatch):
+    calls = []
+
+    def fake_get(url, **kwargs):
+        calls.append(url)
+        raise requests.Timeout("timed out")
+
+    monkeypatch.setattr(api.fetch_client, "get", fake_get)
+    assert api._fetch_page("https://slow.jp/", timeout=5, verify=True) is None
+    assert api._fetch_page("https://slow.jp/contact", timeout=5, verify=True) is None
+    assert uc._fetch_page("https://slow.jp/about") is None
+    # Each fetch uses all its attempts and counts as one failure.
+    assert calls == ["https://slow.jp/"] * 3 + ["https://slow.jp/contact"] * 3
+    assert breakers.stats() == {"tripped": 1, "open": 1, "skipped": 1}
+
+
+def test_retried_403_counts_as_one_failure(monkeypatch):
+    board = CircuitBreakers(threshold=5)
+    monkeypatch.setattr(retry_policy, "_policy", RetryPolicy(base_delay=0))
+    monkeypatch.setattr(retry_policy, "_breakers", board)
+    calls = []
+
+    def forbidden(url, **kwargs):
+        calls.append(url)
+        return Resp(403)
+
+    monkeypatch.setattr(api.fetch_client, "get", forbidden)
+    assert api._fetch_page("https://shy.jp/private", timeout=5, verify=True) is None
+    assert len(calls) == 3
+
+    for page in ("a", "b", "c"):
+        board.record_status(f"https://shy.jp/{page}", 403)
+    assert board.allow("https://shy.jp/contact")
+    board.record_status("https://shy.jp/d", 403)
+    assert not board.allow("https://shy.jp/contact")
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        requests.TooManyRedirects("loop"),
+        requests.exceptions.ChunkedEncodingError("broken"),
+        fetch_client.NotHtmlError("not an HTML page (image/png)"),
+    ],
+)
+def test_errors_that_do_not_mean_the_host_is_down(error):
+    board = CircuitBreakers(threshold=1)
+    assert not board.record_error("https://cafe.jp/", error)
+    assert board.allow("https://cafe.jp/")
+    assert board.record_error("https://cafe.jp/", requests.ConnectionError("refused"))
+    assert not board.allow("https://cafe.jp/")
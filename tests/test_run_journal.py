@@ -0,0 +1,98 @@
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import run_journal
+import update_contact_info_api as api
+from test_update_contact_info_api_process import FakeService
+
+
+def _journal_with_three_rows(tmp_path):
+    journal = run_journal.RunJournal(tmp_path / "journal.jsonl")
+    journal.begin(2, 5)
+    journal.record(2, "https://a.example", ["", "a@a.example", "", ""])
+    journal.record(3, "https://b.example", ["", "", "", "なし"])
+    journal.mark_flushed([2, 3])
+    journal.record(4, "https://c.example", ["", "c@c.example", "", ""])
+    journal.close()
+    return journal
+
+
+def test_plan_resumes_at_first_unwritten_result(tmp_path):
+    journal = _journal_with_three_rows(tmp_path)
+    with open(journal.path, "a", encoding="utf-8") as handle:
+        handle.write('{"event": "row", "row": 5, "url"')  # killed mid-write
+
+    plan = journal.plan()
+
+    assert plan.start_row == 4
+    assert plan.remaining == 3
+    assert list(plan.pending()) == [4]
+    assert [entry.row for entry in plan.finished()] == [2, 3]
+
+
+def test_plan_is_none_without_journal(tmp_path):
+    assert run_journal.RunJournal(tmp_path / "missing.jsonl").plan() is None
+
+
+def test_anchor_follows_rows_deleted_by_cleanup(tmp_path):
+    journal = _journal_with_three_rows(tmp_path)
+    journal.mark_flushed([4])
+    journal.record_cleanup()
+    plan = journal.plan()
+
+    assert plan.window == (2, 5)
+    # Row 3 was deleted, so rows 4 and 5 moved up by one.
+    plan.anchor(["https://a.example", "https://c.example", "https://d.example"])
+
+    assert plan.start_row == 4
+    assert plan.remaining == 2
+    assert plan.pending() == {}
+    assert plan.finished() == []
+
+
+def test_process_sheet_resume_skips_finished_rows(monkeypatch, tmp_path):
+    rows = [["data", "", f"https://{name}.example"] for name in "abcdef"]
+    service = FakeService(rows)
+    fetched = []
+
+    def fake_fetch(url, timeout, verify, **_):
+        fetched.append(url)
+        return "<html></html>"
+
+    monkeypatch.setattr(api, "_build_sheet_service", lambda credentials_file: service)
+    monkeypatch.setattr(api, "_fetch_page", fake_fetch)
+    monkeypatch.setattr(api, "find_instagram", lambda soup, url: "")
+    monkeypatch.setattr(
+        api, "crawl_site_for_email", lambda url, timeout, verify, **_: "x@" + url[8:]
+    )
+    monkeypatch.setattr(
+        api, "find_contact_form", lambda soup, url, timeout, verify, **_: ""
+    )
+
+    journal = _journal_with_three_rows(tmp_path)
+    state = api.ProcessState(spreadsheet_id="spreadsheet", worksheet="Sheet")
+    service.rows = rows[2:]  # the read starts at the resumed row
+
+    result = api.process_sheet(
+        "spreadsheet",
+        "Sheet",
+        start_row=2,
+        max_rows=5,
+        timeout=1.0,
+        verify_ssl=True,
+        credentials_file="creds.json",
+        state=state,
+        journal=journal,
+        resume=True,
+    )
+
+    assert service.requested_ranges == ["Sheet!A4:G6"]
+    assert fetched == ["https://d.example", "https://e.example"]
+    assert result == 3
+    assert service.cells()[0] == (4, ["", "c@c.example", "", ""])
+    assert state.written_rows == [2, 3, 4, 5, 6]
+
+    plan = journal.plan()
+    assert plan.remaining == 0
+    assert plan.start_row == 7
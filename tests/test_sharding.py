@@ -0,0 +1,109 @@
+from pathlib import Path
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import sharding
+import update_contact_info_api as api
+from test_update_contact_info_api_process import FakeService
+
+
+def test_parse_shard():
+    assert sharding.parse_shard("1/4") == (1, 4)
+    for text in ("4/4", "-1/2", "1", "a/b", "0/0"):
+        with pytest.raises(ValueError):
+            sharding.parse_shard(text)
+
+
+def test_shards_partition_rows_by_homepage():
+    rows = [["data", "", f"https://site{i}.example"] for i in range(50)]
+    rows.append(["data", "", "https://www.site7.example/"])
+    shards = [sharding.shard_of(row, 3) for row in rows]
+
+    assert set(shards) == {0, 1, 2}
+    assert shards[-1] == shards[7]
+
+
+def test_resolve_rows_follows_moved_rows():
+    entries = [(2, "https://a.example"), (4, "https://b.example"), (5, "https://b.example")]
+    # Row 3 was deleted and a row with the same homepage as 4 and 5 was added above.
+    current = {
+        1: "https://b.example",
+        2: "https://a.example",
+        3: "https://b.example",
+        4: "https://b.example",
+        5: "https://c.example",
+    }
+
+    assert sharding.resolve_rows(entries, current) == {2: 2, 4: 3, 5: 4}
+    assert sharding.resolve_rows([(9, "https://gone.example")], current) == {}
+
+
+def test_resolve_rows_skips_blank_keys_and_pairs_shifted_rows():
+    # Thousands of rows without a homepage must not be aligned against each
+    # other, and a repeated homepage whose rows only moved up pairs in order.
+    entries = [(row, "") for row in range(2, 5002)]
+    entries += [(row, "https://chain.example") for row in range(5002, 8002)]
+    current = {row: "" for row in range(1, 5001)}
+    current.update({row: "https://chain.example" for row in range(5001, 8001)})
+
+    resolved = sharding.resolve_rows(entries, current)
+
+    assert resolved == {row: row - 1 for row in range(5002, 8002)}
+
+
+def test_shards_merge_into_one_cleanup(monkeypatch, tmp_path):
+    rows = [["data", "", f"https://site{i}.example"] for i in range(8)]
+    rows[3][2] = "https://bad.example"
+    service = FakeService(rows)
+
+    monkeypatch.setattr(api, "_build_sheet_service", lambda credentials_file: service)
+    monkeypatch.setattr(
+        api,
+        "_fetch_page",
+        lambda url, timeout, verify, **_: None if "bad" in url else "<html></html>",
+    )
+    monkeypatch.setattr(api, "find_instagram", lambda soup, url: "")
+    monkeypatch.setattr(api, "crawl_site_for_email", lambda url, timeout, verify, **_: "")
+    monkeypatch.setattr(
+        api, "find_contact_form", lambda soup, url, timeout, verify, **_: ""
+    )
+
+    for index in range(2):
+        state = api.ProcessState(spreadsheet_id="spreadsheet", worksheet="Sheet")
+        api.process_sheet(
+            "spreadsheet",
+            "Sheet",
+            start_row=2,
+            max_rows=None,
+            timeout=1.0,
+            verify_ssl=True,
+            credentials_file="creds.json",
+            state=state,
+            shard=(index, 2),
+        )
+        api.shard_manifest(state, (index, 2)).save(tmp_path)
+
+    assert sorted(row for row, _ in service.cells()) == list(range(2, 10))
+
+    manifests = sharding.ShardManifest.load_all(tmp_path, "spreadsheet", "Sheet")
+    assert sharding.missing_shards(manifests) == []
+
+    # Someone deleted the row of site0 before the merge; the sheet read by
+    # the merge starts at the header row.
+    service.rows = [["header", "", "homepage"]] + rows[1:]
+    captured = {}
+    monkeypatch.setattr(
+        api,
+        "run_cleanup",
+        lambda state: captured.update(
+            written=list(state.written_rows), errors=list(state.error_rows)
+        ),
+    )
+    state = api.ProcessState(
+        spreadsheet_id="spreadsheet", worksheet="Sheet", service=service
+    )
+    api.merge_shards(state, manifests)
+
+    assert captured == {"written": list(range(2, 9)), "errors": [4]}
@@ -0,0 +1,97 @@
+from pathlib import Path
+import sys
+import threading
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import sheet_writer
+from test_update_contact_info_api_process import FakeService
+
+
+def test_coalesce_merges_adjacent_rows():
+    rows = {5: list("abcd"), 3: list("efgh"), 4: list("ijkl"), 9: list("mnop")}
+
+    assert sheet_writer.coalesce("Sheet", rows) == [
+        {
+            "range": "Sheet!D3:G5",
+            "majorDimension": "ROWS",
+            "values": [list("efgh"), list("ijkl"), list("abcd")],
+        },
+        {"range": "Sheet!D9:G9", "majorDimension": "ROWS", "values": [list("mnop")]},
+    ]
+    assert sheet_writer.coalesce("Sheet", {7: ["x"], 8: ["y"]}, first_column="G") == [
+        {"range": "Sheet!G7:G8", "majorDimension": "ROWS", "values": [["x"], ["y"]]},
+    ]
+
+
+def test_status_marks_are_written_right_away():
+    service = FakeService([])
+    flushed = []
+    writer = sheet_writer.SheetWriter(
+        service, "id", "Sheet", batch_size=100, flush_interval=60, on_flushed=flushed.append
+    )
+    writer.put(2, ["", "", "", "なし"])
+    writer.mark(3, "エラー")
+    deadline = time.monotonic() + 2
+    while not flushed and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert flushed == [[2, 3]]
+    assert service.updates == [
+        {"range": "Sheet!D2:G2", "values": [["", "", "", "なし"]]},
+        {"range": "Sheet!G3:G3", "values": [["エラー"]]},
+    ]
+    writer.close()
+
+
+def test_writer_flushes_on_batch_size():
+    service = FakeService([])
+    flushed = []
+    writer = sheet_writer.SheetWriter(
+        service, "id", "Sheet", batch_size=3, flush_interval=60, on_flushed=flushed.append
+    )
+    for row in range(2, 9):
+        writer.put(row, ["", f"{row}@cafe.jp", "", ""])
+    writer.close()
+
+    assert [u["range"] for u in service.updates] == ["Sheet!D2:G4", "Sheet!D5:G7", "Sheet!D8:G8"]
+    assert flushed == [[2, 3, 4], [5, 6, 7], [8]]
+    assert writer.stats() == {"rows": 7, "ranges": 3, "calls": 3}
+
+
+def test_writer_flushes_on_interval():
+    service = FakeService([])
+    writer = sheet_writer.SheetWriter(service, "id", "Sheet", batch_size=100, flush_interval=0.05)
+    writer.put(2, ["", "", "", "なし"])
+    deadline = time.monotonic() + 2
+    while not service.updates and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert service.updates == [{"range": "Sheet!D2:G2", "values": [["", "", "", "なし"]]}]
+    writer.close()
+
+
+def test_put_does_not_wait_for_a_slow_api():
+    service = FakeService([])
+    release = threading.Event()
+
+    class SlowService:
+        def spreadsheets(self):
+            return self
+
+        def values(self):
+            return self
+
+        def batchUpdate(self, spreadsheetId, body):
+            release.wait(5)
+            return service.spreadsheets().values().batchUpdate(spreadsheetId, body)
+
+    writer = sheet_writer.SheetWriter(SlowService(), "id", "Sheet", batch_size=1)
+    start = time.monotonic()
+    for row in range(2, 50):
+        writer.put(row, ["", "", "", ""])
+    assert time.monotonic() - start < 0.5
+    release.set()
+    writer.close()
+
+    assert [row for row, _ in service.cells()] == list(range(2, 50))
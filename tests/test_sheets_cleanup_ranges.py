@@ -19,3 +19,23 @@ def test_compress_singletons_and_duplicates():
 
 def test_empty_indices():
     assert _compress_consecutive_indices([]) == []
+
+
+def test_snapshot_finds_duplicates_and_follows_deletions():
+    from sheets_cleanup import SheetSnapshot
+    from test_update_contact_info_api_process import FakeService
+
+    service = FakeService(
+        [["", "", "", "", email] for email in ["email", "a@x.jp", "b@x.jp", "A@x.jp"]]
+    )
+    service.colored_rows = {4}
+    snapshot = SheetSnapshot.fetch(service, "id", "Sheet")
+
+    assert snapshot.sheet_id == 99
+    assert snapshot.emails_map() == {"a@x.jp": [2, 4], "b@x.jp": [3]}
+    assert snapshot.highlighted_rows() == [3]
+    assert snapshot.programmatic_duplicates() == [3]
+
+    snapshot.delete([3])
+    assert snapshot.emails_map() == {"a@x.jp": [2, 3]}
+    assert snapshot.highlighted_rows() == [2]
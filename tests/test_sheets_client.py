@@ -0,0 +1,109 @@
+from pathlib import Path
+import sys
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import sheets_client
+from retry_policy import RetryPolicy
+from test_update_contact_info_api_process import FakeService
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _quota(clock, **kwargs):
+    return sheets_client.SheetsQuota(sleep=clock.sleep, clock=clock, **kwargs)
+
+
+def _http_error(status, headers=None):
+    return HttpError(httplib2.Response({"status": status, **(headers or {})}), b"")
+
+
+def test_wrapped_service_passes_calls_through_and_counts_them():
+    service = FakeService([["a", "b", "https://example.com"]])
+    clock = FakeClock()
+    quota = _quota(clock)
+    wrapped = sheets_client.wrap(service, quota)
+
+    values = (
+        wrapped.spreadsheets().values().get(spreadsheetId="id", range="Sheet!A2:C2").execute()
+    )
+    wrapped.spreadsheets().values().update(
+        spreadsheetId="id", range="Sheet!D2:G2", valueInputOption="RAW", body={"values": [["x"]]}
+    ).execute()
+
+    assert values["values"] == [["a", "b", "https://example.com"]]
+    assert service.updates == [{"range": "Sheet!D2:G2", "values": [["x"]]}]
+    assert quota.stats()["calls"] == {
+        "spreadsheets.values.get": 1,
+        "spreadsheets.values.update": 1,
+    }
+    assert sheets_client.wrap(wrapped, quota) is wrapped
+
+
+def test_reads_and_writes_are_paced_to_the_quota():
+    clock = FakeClock()
+    quota = _quota(clock, reads_per_minute=60, writes_per_minute=12)
+
+    for _ in range(60):
+        quota.execute("spreadsheets.values.get", lambda: None)
+    assert clock.now == pytest.approx(60.0)
+    # The 61st read of the minute has to wait for the next one.
+    quota.execute("spreadsheets.values.batchGet", lambda: None)
+    assert clock.now > 61.0
+    start = clock.now
+    for _ in range(13):
+        quota.execute("spreadsheets.values.batchUpdate", lambda: None)
+    assert clock.now - start >= 60.0
+
+
+def test_rate_limit_errors_are_retried_with_retry_after():
+    clock = FakeClock()
+    quota = _quota(clock)
+    responses = [_http_error(429, {"retry-after": "7"}), _http_error(503), "ok"]
+
+    def call():
+        result = responses.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    assert quota.execute("spreadsheets.values.batchUpdate", call) == "ok"
+    assert clock.sleeps[0] == 7.0
+    assert quota.stats()["retries"] == {"spreadsheets.values.batchUpdate": 2}
+    assert quota.stats()["calls"] == {"spreadsheets.values.batchUpdate": 3}
+
+
+def test_other_errors_and_exhausted_retries_are_raised():
+    clock = FakeClock()
+    quota = _quota(clock, policy=RetryPolicy(attempts=2, base_delay=0.1))
+    calls = []
+
+    def forbidden():
+        calls.append(1)
+        raise _http_error(403)
+
+    with pytest.raises(HttpError):
+        quota.execute("spreadsheets.get", forbidden)
+    assert len(calls) == 1
+
+    def limited():
+        calls.append(1)
+        raise _http_error(429)
+
+    with pytest.raises(HttpError):
+        quota.execute("spreadsheets.batchUpdate", limited)
+    assert len(calls) == 3
@@ -0,0 +1,71 @@
+from pathlib import Path
+import asyncio
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from single_flight import AsyncSingleFlight, SingleFlight, homepage_key
+
+
+def test_homepage_key_normalises_scheme_www_and_slash():
+    assert homepage_key("https://www.Cafe.jp/") == homepage_key("http://cafe.jp")
+    assert homepage_key("http://cafe.jp/#menu") == "cafe.jp"
+    assert homepage_key("https://cafe.jp/shibuya/") != homepage_key("https://cafe.jp/ginza")
+
+
+def test_concurrent_callers_share_one_call():
+    flights = SingleFlight()
+    calls = []
+    results = []
+
+    def crawl():
+        calls.append(1)
+        time.sleep(0.05)
+        return "info@cafe.jp"
+
+    def worker():
+        results.append(flights.do("cafe.jp", crawl))
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert {value for value, _ in results} == {"info@cafe.jp"}
+    assert flights.hits == 4 and flights.misses == 1
+    assert flights.hit_rate == pytest.approx(0.8)
+
+
+def test_exception_is_shared():
+    flights = SingleFlight()
+
+    def boom():
+        raise RuntimeError("down")
+
+    with pytest.raises(RuntimeError):
+        flights.do("cafe.jp", boom)
+    with pytest.raises(RuntimeError):
+        flights.do("cafe.jp", lambda: "unused")
+
+
+def test_async_single_flight():
+    flights = AsyncSingleFlight()
+    calls = []
+
+    async def crawl():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "info@cafe.jp"
+
+    async def main():
+        return await asyncio.gather(*(flights.do("cafe.jp", crawl) for _ in range(3)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert [shared for _, shared in results] == [False, True, True]
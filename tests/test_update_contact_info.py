@@ -110,6 +110,7 @@ def test_fetch_page_retries_on_403(monkeypatch):
     class Resp:
         def __init__(self, status):
             self.status_code = status
+            self.headers = {}
             self.text = "ok"
 
         def raise_for_status(self):
@@ -120,7 +121,7 @@ def test_fetch_page_retries_on_403(monkeypatch):
         calls.append(headers.get("User-Agent"))
         return Resp(403) if len(calls) == 1 else Resp(200)
 
-    monkeypatch.setattr(uc.requests, "get", fake_get)
+    monkeypatch.setattr(uc.fetch_client, "get", fake_get)
     assert uc._fetch_page("http://example.com", timeout=5) == "ok"
     assert len(calls) == 2
     assert "Mozilla" in calls[0]
@@ -184,7 +185,7 @@ def test_process_sheet_row_range(tmp_path, monkeypatch):
     file = tmp_path / "sample.xlsx"
     wb.save(file)
 
-    monkeypatch.setattr(uc.requests, "get", dummy_get)
+    monkeypatch.setattr(uc.fetch_client, "get", dummy_get)
     uc.process_sheet(str(file), start_row=2, end_row=2, worksheet="Sheet")
 
     wb2 = openpyxl.load_workbook(file)
@@ -225,7 +226,7 @@ def test_process_specific_worksheet(tmp_path, monkeypatch):
     file = tmp_path / "sample.xlsx"
     wb.save(file)
 
-    monkeypatch.setattr(uc.requests, "get", dummy_get)
+    monkeypatch.setattr(uc.fetch_client, "get", dummy_get)
     uc.process_sheet(str(file), start_row=2, end_row=2, worksheet="Sheet2")
 
     wb2 = openpyxl.load_workbook(file)
@@ -257,7 +258,7 @@ def test_stop_on_blank_column_a(tmp_path, monkeypatch):
     file = tmp_path / "sample.xlsx"
     wb.save(file)
 
-    monkeypatch.setattr(uc.requests, "get", dummy_get)
+    monkeypatch.setattr(uc.fetch_client, "get", dummy_get)
     uc.process_sheet(str(file), start_row=2, worksheet="Sheet")
 
     wb2 = openpyxl.load_workbook(file)
@@ -292,7 +293,7 @@ def test_start_row_ignores_action_end(tmp_path, monkeypatch):
     file = tmp_path / "sample.xlsx"
     wb.save(file)
 
-    monkeypatch.setattr(uc.requests, "get", dummy_get)
+    monkeypatch.setattr(uc.fetch_client, "get", dummy_get)
     uc.process_sheet(str(file), start_row=2, worksheet="Sheet")
 
     wb2 = openpyxl.load_workbook(file)
@@ -318,7 +319,7 @@ def test_skip_invalid_url(tmp_path, monkeypatch):
     file = tmp_path / "sample.xlsx"
     wb.save(file)
 
-    monkeypatch.setattr(uc.requests, "get", dummy_get)
+    monkeypatch.setattr(uc.fetch_client, "get", dummy_get)
     uc.process_sheet(str(file), start_row=2, end_row=2, worksheet="Sheet")
 
     assert calls == []
@@ -371,6 +372,7 @@ def test_process_sheet_from_url(tmp_path, monkeypatch):
         return WorkbookResponse(content) if url == "http://sheet" else PageResponse()
 
     monkeypatch.setattr(uc.requests, "get", fake_get)
+    monkeypatch.setattr(uc.fetch_client, "get", fake_get)
     monkeypatch.chdir(tmp_path)
     uc.process_sheet("http://sheet", start_row=2, end_row=2, worksheet="Sheet")
 
@@ -416,6 +418,7 @@ def test_google_sheet_link_is_transformed(monkeypatch, tmp_path):
         raise AssertionError(f"unexpected url {url}")
 
     monkeypatch.setattr(uc.requests, "get", fake_get)
+    monkeypatch.setattr(uc.fetch_client, "get", fake_get)
     monkeypatch.chdir(tmp_path)
     uc.process_sheet(
         "https://docs.google.com/spreadsheets/d/FILEID/edit?gid=0#gid=0",
@@ -457,7 +460,7 @@ def test_retry_on_ssl_error(tmp_path, monkeypatch):
     file = tmp_path / "sample.xlsx"
     wb.save(file)
 
-    monkeypatch.setattr(uc.requests, "get", dummy_get)
+    monkeypatch.setattr(uc.fetch_client, "get", dummy_get)
     uc.process_sheet(str(file), start_row=2, end_row=2, worksheet="Sheet")
 
     assert calls[:2] == [True, False]
@@ -481,7 +484,7 @@ def test_request_failure_marks_error(tmp_path, monkeypatch):
     file = tmp_path / "sample.xlsx"
     wb.save(file)
 
-    monkeypatch.setattr(uc.requests, "get", dummy_get)
+    monkeypatch.setattr(uc.fetch_client, "get", dummy_get)
     uc.process_sheet(str(file), start_row=2, end_row=2, worksheet="Sheet")
 
     wb2 = openpyxl.load_workbook(file)
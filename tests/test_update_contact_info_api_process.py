@@ -1,3 +1,8 @@
+import re
+import time
+
+import pytest
+
 import update_contact_info_api as api
 
 
@@ -13,8 +18,17 @@ class FakeValues:
     def __init__(self, service):
         self._service = service
 
-    def get(self, spreadsheetId, range, **_):
+    def get(self, spreadsheetId, range, majorDimension="ROWS", **_):
         self._service.requested_ranges.append(range)
+        if majorDimension == "COLUMNS":
+            column = ord(re.search(r"!([A-Z]+)", range).group(1)) - ord("A")
+            return FakeRequest(
+                lambda: {
+                    "values": [
+                        [row[column] if len(row) > column else "" for row in self._service.rows]
+                    ]
+                }
+            )
         return FakeRequest(lambda: {"values": self._service.rows})
 
     def update(self, spreadsheetId, range, valueInputOption, body):
@@ -48,19 +62,21 @@ class FakeSpreadsheets:
     def values(self):
         return FakeValues(self._service)
 
-    def get(self, spreadsheetId, fields):
-        return FakeRequest(
-            lambda: {
-                "sheets": [
-                    {
-                        "properties": {
-                            "sheetId": self._service.sheet_id,
-                            "title": self._service.worksheet,
-                        }
-                    }
-                ]
+    def get(self, spreadsheetId, fields, ranges=None, includeGridData=False):
+        def _execute():
+            self._service.metadata_requests += 1
+            sheet = {
+                "properties": {
+                    "sheetId": self._service.sheet_id,
+                    "title": self._service.worksheet,
+                }
             }
-        )
+            if includeGridData:
+                column = ord(re.search(r"!([A-Z]+)", ranges[0]).group(1)) - ord("A")
+                sheet["data"] = [{"rowData": self._service.grid(column)}]
+            return {"sheets": [sheet]}
+
+        return FakeRequest(_execute)
 
 
 class FakeService:
@@ -70,10 +86,35 @@ class FakeService:
         self.sheet_id = 99
         self.updates = []
         self.requested_ranges = []
+        self.metadata_requests = 0
+        self.colored_rows = set()
 
     def spreadsheets(self):
         return FakeSpreadsheets(self)
 
+    def grid(self, column):
+        """Return ``rowData`` of ``column``; rows in ``colored_rows`` are highlighted."""
+
+        row_data = []
+        for number, row in enumerate(self.rows, start=1):
+            cell = {"formattedValue": row[column] if len(row) > column else ""}
+            if number in self.colored_rows:
+                cell["effectiveFormat"] = {
+                    "backgroundColor": {"red": 1.0, "green": 0.8, "blue": 0.8}
+                }
+            row_data.append({"values": [cell]})
+        return row_data
+
+    def cells(self):
+        """Return ``(row, values)`` for every row written, multi-row ranges expanded."""
+
+        written = []
+        for update in self.updates:
+            first, last = re.search(r"(\d+)(?::[A-Z]+(\d+))?$", update["range"]).groups()
+            rows = range(int(first), int(last or first) + 1)
+            written.extend(zip(rows, update["values"]))
+        return written
+
 
 def test_process_sheet_deletes_error_rows(monkeypatch):
     rows = [
@@ -89,9 +130,9 @@ def test_process_sheet_deletes_error_rows(monkeypatch):
         lambda url, timeout, verify, **_: None if "bad" in url else "<html></html>",
     )
     monkeypatch.setattr(api, "find_instagram", lambda soup, url: "")
-    monkeypatch.setattr(api, "crawl_site_for_email", lambda url, timeout, verify: "")
+    monkeypatch.setattr(api, "crawl_site_for_email", lambda url, timeout, verify, **_: "")
     monkeypatch.setattr(
-        api, "find_contact_form", lambda soup, url, timeout, verify: ""
+        api, "find_contact_form", lambda soup, url, timeout, verify, **_: ""
     )
     monkeypatch.setattr(api, "get_sheet_id", lambda service_obj, spreadsheet_id, title: 99)
 
@@ -121,8 +162,7 @@ def test_process_sheet_deletes_error_rows(monkeypatch):
 
     assert result == 2
     assert service.updates == [
-        {"range": "Sheet!D2:G2", "values": [["", "", "", "エラー"]]},
-        {"range": "Sheet!D3:G3", "values": [["", "", "", "なし"]]},
+        {"range": "Sheet!D2:G3", "values": [["", "", "", "エラー"], ["", "", "", "なし"]]},
     ]
     assert deleted["indices"] == [1]
 
@@ -150,7 +190,7 @@ def test_run_cleanup_accepts_numeric_truthy(monkeypatch):
     assert captured["indices"] == [3]
 
 
-def test_error_row_deletion_adjusts_written_rows_for_cleanup(monkeypatch):
+def test_error_row_deletion_renumbers_written_rows(monkeypatch):
     rows = [
         ["data", "", "https://bad.example"],
         ["data", "", "https://ok.example"],
@@ -164,29 +204,12 @@ def test_error_row_deletion_adjusts_written_rows_for_cleanup(monkeypatch):
         lambda url, timeout, verify, **_: None if "bad" in url else "<html></html>",
     )
     monkeypatch.setattr(api, "find_instagram", lambda soup, url: "")
-    monkeypatch.setattr(api, "crawl_site_for_email", lambda url, timeout, verify: "")
+    monkeypatch.setattr(api, "crawl_site_for_email", lambda url, timeout, verify, **_: "")
     monkeypatch.setattr(
-        api, "find_contact_form", lambda soup, url, timeout, verify: ""
+        api, "find_contact_form", lambda soup, url, timeout, verify, **_: ""
     )
     monkeypatch.setattr(api, "get_sheet_id", lambda service_obj, spreadsheet_id, title: 99)
 
-    captured = {}
-
-    def fake_cleanup_duplicates_written_only(
-        *,
-        service,
-        spreadsheet_id,
-        title,
-        email_col_letter,
-        header_rows,
-        written_rows,
-        dry_run,
-    ):
-        captured["written_rows"] = list(written_rows)
-        return 0
-
-    monkeypatch.setattr(api, "cleanup_duplicates_written_only", fake_cleanup_duplicates_written_only)
-
     deleted = {}
 
     def fake_delete_rows(service_obj, spreadsheet_id, sheet_id, row_indices):
@@ -214,4 +237,349 @@ def test_error_row_deletion_adjusts_written_rows_for_cleanup(monkeypatch):
 
     assert result == 2
     assert deleted["indices"] == [1]
-    assert captured["written_rows"] == [2]
+    assert state.written_rows == [2]
+    assert state.error_rows == []
+
+
+def test_cleanup_reads_once_and_deletes_in_one_batch(monkeypatch):
+    def row(email):
+        return ["data", "", "https://example.com", "", email]
+
+    service = FakeService(
+        [
+            ["name", "", "homepage", "instagram", "email"],
+            row("a@example.com"),
+            row(""),
+            row("A@example.com"),
+            row("b@example.com"),
+            row("b@example.com"),
+        ]
+    )
+    deleted = []
+
+    def fake_delete_rows(service_obj, spreadsheet_id, sheet_id, row_indices):
+        assert sheet_id == 99
+        deleted.append(list(row_indices))
+
+    monkeypatch.setattr(api, "delete_rows", fake_delete_rows)
+    monkeypatch.setenv("DELETE_ERROR_ROWS", "true")
+    monkeypatch.setenv("CLEANUP_DUPLICATE_EMAIL_ROWS", "true")
+    monkeypatch.setenv("GLOBAL_DEDUPE", "1")
+    monkeypatch.delenv("DRY_RUN", raising=False)
+
+    state = api.ProcessState(spreadsheet_id="sheet", worksheet="Sheet", service=service)
+    state.error_rows.append(3)
+    state.written_rows.append(4)
+
+    api.run_cleanup(state)
+
+    # The error row 3, row 4 duplicating row 2 and the second b@example.com
+    # (row 6) are all found on the same view and deleted together.
+    assert deleted == [[5, 3, 2]]
+    assert service.metadata_requests == 1
+    assert service.requested_ranges == []
+
+
+def test_process_sheet_workers_preserve_row_order(monkeypatch):
+    import random
+    import time
+
+    rows = [["data", "", f"https://site{i}.example"] for i in range(12)]
+    rows[4][2] = "https://bad.example"
+    service = FakeService(rows)
+
+    def slow_fetch(url, timeout, verify, **_):
+        time.sleep(random.uniform(0, 0.01))
+        return None if "bad" in url else "<html></html>"
+
+    monkeypatch.setattr(api, "_build_sheet_service", lambda credentials_file: service)
+    monkeypatch.setattr(api, "_fetch_page", slow_fetch)
+    monkeypatch.setattr(api, "find_instagram", lambda soup, url: "")
+    monkeypatch.setattr(
+        api, "crawl_site_for_email", lambda url, timeout, verify, **_: url.split("//")[1]
+    )
+    monkeypatch.setattr(
+        api, "find_contact_form", lambda soup, url, timeout, verify, **_: ""
+    )
+
+    state = api.ProcessState(spreadsheet_id="spreadsheet", worksheet="Sheet")
+    result = api.process_sheet(
+        "spreadsheet",
+        "Sheet",
+        start_row=2,
+        max_rows=None,
+        timeout=1.0,
+        verify_ssl=True,
+        credentials_file="creds.json",
+        state=state,
+        workers=4,
+    )
+
+    assert result == 12
+    assert len(service.updates) == 1
+    cells = service.cells()
+    assert [row for row, _ in cells] == list(range(2, 14))
+    assert cells[0][1] == ["", "site0.example", "", ""]
+    assert cells[4][1] == ["", "", "", "エラー"]
+    assert state.written_rows == list(range(2, 14))
+    assert state.error_rows == [6]
+
+
+def test_process_sheet_dedupes_repeated_homepages(monkeypatch):
+    rows = [
+        ["data", "", "https://chain.example/"],
+        ["data", "", "https://www.chain.example"],
+        ["data", "", "https://other.example"],
+        ["data", "", "http://chain.example/#top"],
+    ]
+    service = FakeService(rows)
+    crawled = []
+
+    def fake_crawl(url, timeout, verify, **_):
+        crawled.append(url)
+        return "info@" + url.split("//")[1].strip("/").replace("www.", "")
+
+    monkeypatch.setattr(api, "_build_sheet_service", lambda credentials_file: service)
+    monkeypatch.setattr(api, "_fetch_page", lambda url, timeout, verify, **_: "<html></html>")
+    monkeypatch.setattr(api, "find_instagram", lambda soup, url: "")
+    monkeypatch.setattr(api, "crawl_site_for_email", fake_crawl)
+    monkeypatch.setattr(api, "find_contact_form", lambda soup, url, timeout, verify, **_: "")
+
+    state = api.ProcessState(spreadsheet_id="spreadsheet", worksheet="Sheet")
+    api.process_sheet(
+        "spreadsheet",
+        "Sheet",
+        start_row=2,
+        max_rows=None,
+        timeout=1.0,
+        verify_ssl=True,
+        credentials_file="creds.json",
+        state=state,
+        workers=3,
+    )
+
+    assert sorted(crawled) == ["https://chain.example/", "https://other.example"]
+    emails = [values[1] for _, values in service.cells()]
+    assert emails == [
+        "info@chain.example",
+        "info@chain.example",
+        "info@other.example",
+        "info@chain.example",
+    ]
+
+
+def test_incremental_mode_skips_filled_rows_unless_stale(monkeypatch, tmp_path):
+    import time
+
+    from crawl_log import CrawlLog
+
+    rows = [
+        ["data", "", "https://new.example"],
+        ["data", "", "https://fresh.example", "", "a@fresh.example", "", ""],
+        ["data", "", "https://stale.example", "", "", "", "なし"],
+    ]
+    service = FakeService(rows)
+    fetched = []
+
+    def fake_fetch(url, timeout, verify, **_):
+        fetched.append(url)
+        return "<html></html>"
+
+    monkeypatch.setattr(api, "_build_sheet_service", lambda credentials_file: service)
+    monkeypatch.setattr(api, "_fetch_page", fake_fetch)
+    monkeypatch.setattr(api, "find_instagram", lambda soup, url: "")
+    monkeypatch.setattr(api, "crawl_site_for_email", lambda url, timeout, verify, **_: "")
+    monkeypatch.setattr(
+        api, "find_contact_form", lambda soup, url, timeout, verify, **_: ""
+    )
+
+    log = CrawlLog(str(tmp_path))
+    log.record("https://fresh.example", now=time.time())
+    log.record("https://stale.example", now=time.time() - 10 * 86400)
+
+    result = api.process_sheet(
+        "spreadsheet",
+        "Sheet",
+        start_row=2,
+        max_rows=None,
+        timeout=1.0,
+        verify_ssl=True,
+        credentials_file="creds.json",
+        incremental=True,
+        crawl_log=log,
+        recrawl_after=7 * 86400,
+    )
+
+    assert result == 2
+    assert fetched == ["https://new.example", "https://stale.example"]
+    assert [u["range"] for u in service.updates] == ["Sheet!D2:G2", "Sheet!D4:G4"]
+    assert time.time() - log.crawled_at("https://stale.example") < 60
+    assert log.crawled_at("https://new.example") is not None
+
+
+def test_row_errors_are_marked_through_the_batched_writer(monkeypatch):
+    rows = [["data", "", f"https://site{i}.example"] for i in range(3)]
+    service = FakeService(rows)
+
+    def fake_crawl_row(row_index, row, **_):
+        result = api.RowResult(row_index=row_index, status="なし")
+        if row_index == 3:
+            result.error = RuntimeError("boom")
+        return result
+
+    monkeypatch.setattr(api, "_build_sheet_service", lambda credentials_file: service)
+    monkeypatch.setattr(api, "_crawl_row", fake_crawl_row)
+
+    state = api.ProcessState(spreadsheet_id="spreadsheet", worksheet="Sheet")
+    result = api.process_sheet(
+        "spreadsheet",
+        "Sheet",
+        start_row=2,
+        max_rows=None,
+        timeout=1.0,
+        verify_ssl=True,
+        credentials_file="creds.json",
+        state=state,
+    )
+
+    assert result == 2
+    assert state.error_rows == [3]
+    assert sorted(service.cells()) == [
+        (2, ["", "", "", "なし"]),
+        (3, ["エラー"]),
+        (4, ["", "", "", "なし"]),
+    ]
+    assert {"range": "Sheet!G3:G3", "values": [["エラー"]]} in service.updates
+
+
+def test_duplicate_emails_are_written_marked_as_duplicates(monkeypatch):
+    rows = [
+        ["data", "", "https://done.example", "", "b@example.com", "", "OK"],
+        ["data", "", "https://a.example"],
+        ["data", "", "https://b.example"],
+        ["data", "", "https://a2.example"],
+    ]
+    service = FakeService(rows)
+    found = {
+        "https://a.example": "a@example.com",
+        "https://b.example": "B@example.com",
+        "https://a2.example": "a@example.com",
+    }
+
+    def fake_crawl_row(row_index, row, **_):
+        return api.RowResult(row_index=row_index, email=found[row[2]], status="OK")
+
+    monkeypatch.setattr(api, "_build_sheet_service", lambda credentials_file: service)
+    monkeypatch.setattr(api, "_crawl_row", fake_crawl_row)
+    deleted = []
+    monkeypatch.setattr(
+        api,
+        "delete_rows",
+        lambda service_obj, spreadsheet_id, sheet_id, row_indices: deleted.append(
+            list(row_indices)
+        ),
+    )
+    monkeypatch.setenv("CLEANUP_DUPLICATE_EMAIL_ROWS", "true")
+    monkeypatch.delenv("DRY_RUN", raising=False)
+
+    state = api.ProcessState(spreadsheet_id="spreadsheet", worksheet="Sheet")
+    api.process_sheet(
+        "spreadsheet",
+        "Sheet",
+        start_row=2,
+        max_rows=None,
+        timeout=1.0,
+        verify_ssl=True,
+        credentials_file="creds.json",
+        state=state,
+        incremental=True,
+        suppress_duplicates=True,
+    )
+
+    assert state.written_rows == [3]
+    assert state.duplicate_rows == [4, 5]
+    assert sorted(service.cells()) == [
+        (3, ["", "a@example.com", "", "OK"]),
+        (4, ["", "B@example.com", "", "重複"]),
+        (5, ["", "a@example.com", "", "重複"]),
+    ]
+
+    api.run_cleanup(state)
+
+    assert deleted == [[4, 3]]
+    assert state.written_rows == [3]
+
+
+def test_failed_write_stops_the_crawl_and_keeps_only_written_rows(monkeypatch):
+    import sheet_writer
+
+    rows = [["data", "", f"https://site{i}.example"] for i in range(5)]
+    service = FakeService(rows)
+    calls = []
+    batch_update = FakeValues.batchUpdate
+
+    def failing_batch_update(self, spreadsheetId, body):
+        calls.append(body)
+        if len(calls) > 1:
+            return FakeRequest(lambda: (_ for _ in ()).throw(RuntimeError("quota")))
+        return batch_update(self, spreadsheetId, body)
+
+    writers = []
+
+    class Writer(sheet_writer.SheetWriter):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            writers.append(self)
+
+    crawled = []
+
+    def fake_crawl_row(row_index, row, **_):
+        crawled.append(row_index)
+        if row_index == 4:
+            # Row 3 failed to write; wait until the writer has noticed.
+            for _ in range(500):
+                if writers[0].error is not None:
+                    break
+                time.sleep(0.01)
+        status = "エラー" if row_index == 3 else "OK"
+        return api.RowResult(row_index=row_index, status=status)
+
+    monkeypatch.setattr(FakeValues, "batchUpdate", failing_batch_update)
+    monkeypatch.setattr(sheet_writer, "SheetWriter", Writer)
+    monkeypatch.setattr(api, "_build_sheet_service", lambda credentials_file: service)
+    monkeypatch.setattr(api, "_crawl_row", fake_crawl_row)
+
+    state = api.ProcessState(spreadsheet_id="spreadsheet", worksheet="Sheet")
+    with pytest.raises(RuntimeError, match="quota"):
+        api.process_sheet(
+            "spreadsheet",
+            "Sheet",
+            start_row=2,
+            max_rows=None,
+            timeout=1.0,
+            verify_ssl=True,
+            credentials_file="creds.json",
+            state=state,
+            write_batch_size=1,
+        )
+
+    assert crawled == [2, 3, 4]
+    assert service.cells() == [(2, ["", "", "", "OK"])]
+    assert (state.written_rows, state.error_rows, state.duplicate_rows) == ([2], [], [])
+
+
+def test_email_index_reads_the_configured_column(monkeypatch):
+    # The fake returns the column from row 2 on, like the requested F2:F.
+    rows = [
+        ["data", "", "https://a.example", "", "", "a@example.com"],
+        ["data", "", "https://b.example", "", "", "b@example.com"],
+    ]
+    service = FakeService(rows)
+    monkeypatch.setenv("EMAIL_COL_LETTER", "F")
+    monkeypatch.delenv("HEADER_ROWS", raising=False)
+
+    index = api._load_email_index(service, "spreadsheet", "Sheet", rewritten=[3])
+
+    assert service.requested_ranges == ["Sheet!F2:F"]
+    assert index.claim("a@example.com", 4) == 2
+    assert index.claim("b@example.com", 4) is None
@@ -1,14 +1,21 @@
 import argparse
-import html
 import logging
 import re
-from collections import deque
-from urllib.parse import urljoin, urlparse
+import time
+from urllib.parse import unquote, urljoin, urlparse
 
 import requests
-from bs4 import BeautifulSoup
+
+import fetch_client
+import retry_policy
+from crawl_frontier import Frontier
+from email_collector import EmailCollector
+from page_cache import PageCache
+from page_parser import DEFAULT_PARSER, PARSERS, as_page, set_default_parser
+from single_flight import SingleFlight, homepage_key
 
 EMAIL_RE = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+MAILTO_HREF_RE = re.compile(rb"""href\s*=\s*["']?mailto:([^"'<>\s?]+)[^>]*>""", re.I)
 REQUEST_TIMEOUT = 5
 EMAIL_BLOCKLIST = ("catering", "career")
 EMAIL_LOCALPART_BLOCKLIST = ("order", "orders")
@@ -29,109 +36,202 @@ DEFAULT_SHEET_PATH = (
 )
 
 
-def _fetch_page(url, timeout=REQUEST_TIMEOUT, verify=True):
+def _fetch_page(url, timeout=REQUEST_TIMEOUT, verify=True, stop=None):
     """Return the page text with a browser-like ``User-Agent``.
 
-    The function retries on HTTP 403 responses and SSL errors.  When an SSL
-    error occurs the certificate verification is disabled for the retry."""
-
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/120.0.0.0 Safari/537.36"
-        )
-    }
-    for _ in range(3):
-        try:
-            res = requests.get(url, timeout=timeout, verify=verify, headers=headers)
-            if res.status_code == 403:
-                continue
-            res.raise_for_status()
-            return res.text
-        except requests.exceptions.SSLError:
-            if verify:
-                verify = False
-                continue
-        except requests.RequestException:
-            continue
-    return None
+    Requests go through the pooled keep-alive client in :mod:`fetch_client`.
+    Failed attempts are retried according to :mod:`retry_policy` (backoff
+    with jitter, ``Retry-After``) and hosts whose circuit breaker is open are
+    skipped.  When an SSL error occurs the certificate verification is
+    disabled for the retry.  Non-HTML responses are not retried.  ``stop`` is
+    passed on to the client to end a streamed download early."""
+
+    headers = {"User-Agent": fetch_client.USER_AGENT}
+    options = {"stop": stop} if stop is not None else {}
+    policy = retry_policy.get_policy()
+    breakers = retry_policy.get_breakers()
+    with breakers.fetch(url) as outcome:
+        for attempt in range(policy.attempts):
+            if not breakers.allow(url):
+                return None
+            retry_after = None
+            try:
+                res = fetch_client.get(
+                    url, timeout=timeout, verify=verify, headers=headers, **options
+                )
+                outcome.record_status(res.status_code)
+                if policy.retries_status(res.status_code):
+                    retry_after = res.headers.get("Retry-After")
+                else:
+                    res.raise_for_status()
+                    return fetch_client.response_text(res)
+            except fetch_client.NotHtmlError:
+                return None
+            except requests.exceptions.SSLError:
+                if verify:
+                    verify = False
+                    continue
+            except requests.exceptions.HTTPError:
+                return None
+            except requests.RequestException as exc:
+                if outcome.record_error(exc):
+                    return None
+            delay = policy.delay(attempt, retry_after)
+            if delay is None:
+                break
+            time.sleep(delay)
+        return None
+
+
+def _has_usable_mailto(chunk):
+    """Return whether ``chunk`` contains a complete, non-blocked ``mailto:`` link.
+
+    Used as the early-exit condition for streamed crawl pages: once such a
+    link has arrived, :func:`_email_on_page` returns it regardless of the rest
+    of the page."""
+
+    for match in MAILTO_HREF_RE.finditer(chunk):
+        candidate = unquote(match.group(1).decode("utf-8", "replace"))
+        if "@" in candidate and not _is_blocked_email(candidate):
+            return True
+    return False
 
 
 def find_instagram(soup, base_url):
-    for a in soup.find_all("a", href=True):
-        href = a["href"]
+    for href, _ in as_page(soup).anchors:
         if "instagram.com" in href:
             return href if href.startswith("http") else urljoin(base_url, href)
     return None
 
 
-def crawl_site_for_email(base_url, max_depth=1, timeout=REQUEST_TIMEOUT, verify=True):
-    """Crawl ``base_url`` breadth-first looking for an email address."""
+def _page_cache(timeout, verify):
+    fetch_partial = None
+    if fetch_client.streaming():
+        def fetch_partial(url):
+            return _fetch_page(url, timeout=timeout, verify=verify, stop=_has_usable_mailto)
+    return PageCache(
+        lambda url: _fetch_page(url, timeout=timeout, verify=verify),
+        fetch_partial=fetch_partial,
+    )
+
 
-    parsed = urlparse(base_url)
-    domain = parsed.netloc
-    queue = deque([(base_url, 0)])
-    visited = set()
+def _email_on_page(page):
+    """Return the first non-blocked email address on ``page`` or ``None``."""
 
-    while queue:
-        url, depth = queue.popleft()
-        if url in visited or depth > max_depth:
+    for href in page.mailtos():
+        candidate = re.sub(r"^mailto:", "", href, flags=re.I).split("?")[0]
+        if _is_blocked_email(candidate):
             continue
-        visited.add(url)
+        return candidate
 
-        content = _fetch_page(url, timeout=timeout, verify=verify)
-        if not content:
+    for candidate in page.text_emails():
+        if _is_blocked_email(candidate):
             continue
+        return candidate
+    return None
+
+
+def _same_domain_links(page, url, domain):
+    """Return ``(link, anchor text)`` for links on ``page`` that stay on ``domain``."""
+
+    links = []
+    for href, text in page.anchors:
+        link = urljoin(url, href)
+        if urlparse(link).netloc == domain:
+            links.append((link, text))
+    return links
+
+
+def crawl_site_for_email(
+    base_url, max_depth=1, timeout=REQUEST_TIMEOUT, verify=True, cache=None, budget=None
+):
+    """Crawl ``base_url`` looking for an email address.
 
-        soup = BeautifulSoup(content, "html.parser")
-
-        mailtos = soup.find_all("a", href=lambda h: h and h.lower().startswith("mailto:"))
-        for m in mailtos:
-            href = m["href"]
-            candidate = re.sub(r"^mailto:", "", href, flags=re.I).split("?")[0]
-            if _is_blocked_email(candidate):
-                continue
-            return candidate
-
-        text = html.unescape(soup.get_text(" "))
-        for pattern in ["[at]", "(at)", "＠"]:
-            text = text.replace(pattern, "@")
-        for match in EMAIL_RE.finditer(text):
-            candidate = match.group(0)
-            if _is_blocked_email(candidate):
-                continue
-            return candidate
+    Links are visited most promising first (see :mod:`crawl_frontier`).
+    Pages are read through ``cache`` when given so that pages already fetched
+    for the same row are not downloaded or parsed again.
+
+    Without ``budget`` the first usable address is returned, so pages may be
+    partial downloads that stopped at the first usable ``mailto:`` link.
+    With an :class:`email_collector.CrawlBudget` pages are read in full and
+    all addresses are collected until one is confident or the budget is
+    spent, and the best one is returned."""
+
+    if cache is None:
+        cache = _page_cache(timeout, verify)
+    parsed = urlparse(base_url)
+    domain = parsed.netloc
+    frontier = Frontier()
+    frontier.push(base_url, 0)
+    collector = EmailCollector(base_url, budget) if budget is not None else None
+
+    while frontier:
+        if collector is not None and collector.exhausted(cache.bytes_downloaded):
+            break
+        url, depth = frontier.pop()
+        # The collector ranks every address, so it needs whole pages.
+        page = cache.page(url, partial=collector is None)
+        if collector is not None:
+            if collector.visit(url, page):
+                break
+        elif page is not None:
+            email = _email_on_page(page)
+            if email:
+                return email
+        if page is None:
+            continue
 
         if depth < max_depth:
-            for a in soup.find_all("a", href=True):
-                link = urljoin(url, a["href"])
-                if urlparse(link).netloc == domain and link not in visited:
-                    queue.append((link, depth + 1))
-    return None
+            for link, text in _same_domain_links(page, url, domain):
+                if frontier.push(link, depth + 1, text) and collector is not None:
+                    collector.link(link, text)
+    return collector.best() if collector is not None else None
+
 
+def _contact_form_candidates(page, base_url):
+    """Return links on ``page`` that look like they lead to a contact form."""
 
-def find_contact_form(soup, base_url, timeout=REQUEST_TIMEOUT, verify=True):
     candidates = []
     keywords = ["contact", "お問い合わせ", "お問合せ", "inquiry"]
-    for a in soup.find_all("a", href=True):
-        text = (a.get_text() or "").lower()
-        href = a["href"]
+    for href, text in page.anchors:
+        text = (text or "").lower()
         if any(k in text for k in keywords) or any(
             k in href.lower() for k in keywords + ["form"]
         ):
             full = href if href.startswith("http") else urljoin(base_url, href)
             candidates.append(full)
+    return candidates
 
-    for link in candidates:
-        content = _fetch_page(link, timeout=timeout, verify=verify)
-        if not content:
-            continue
-        if BeautifulSoup(content, "html.parser").find("form"):
+
+def find_contact_form(soup, base_url, timeout=REQUEST_TIMEOUT, verify=True, cache=None):
+    if cache is None:
+        cache = _page_cache(timeout, verify)
+    for link in _contact_form_candidates(as_page(soup), base_url):
+        page = cache.page(link, partial=True)
+        if page is not None and not page.has_form and cache.is_partial(link):
+            page = cache.page(link)
+        if page is not None and page.has_form:
             return link
     return None
 
 
+def _crawl_homepage(url):
+    """Return ``(insta, email, form)`` for homepage ``url`` or ``None`` if unreachable."""
+
+    cache = _page_cache(REQUEST_TIMEOUT, True)
+    page = cache.page(url)
+    if page is None:
+        return None
+    insta = find_instagram(page, url)
+    email = crawl_site_for_email(url, timeout=REQUEST_TIMEOUT, cache=cache)
+    form = find_contact_form(page, url, timeout=REQUEST_TIMEOUT, cache=cache)
+    logging.info(
+        "Cache for %s - fetched: %s, fetches saved: %s",
+        url, cache.fetches, cache.fetches_saved
+    )
+    return insta, email, form
+
+
 def process_sheet(path, start_row=None, end_row=None, worksheet="抹茶営業リスト（カフェ）", debug=False):
     import io
     import urllib.parse
@@ -190,6 +290,7 @@ def process_sheet(path, start_row=None, end_row=None, worksheet="抹茶営業リ
 
     end_row = min(end_row, ws.max_row)
 
+    flights = SingleFlight()
     for row in range(start_row, end_row + 1):
         # A列が空なら以降は処理しない
         if not ws.cell(row=row, column=1).value:
@@ -202,14 +303,13 @@ def process_sheet(path, start_row=None, end_row=None, worksheet="抹茶営業リ
             logging.warning("Skipping invalid URL at row %s: %r", row, url)
             continue
         logging.info("Processing row %s: %s", row, url)
-        content = _fetch_page(url, timeout=REQUEST_TIMEOUT)
-        if content is None:
+        found, shared = flights.do(homepage_key(url), lambda: _crawl_homepage(url))
+        if shared:
+            logging.info("Row %s reuses the crawl of an earlier row", row)
+        if found is None:
             ws.cell(row=row, column=7).value = "エラー"
             continue
-        soup = BeautifulSoup(content, "html.parser")
-        insta = find_instagram(soup, url)
-        email = crawl_site_for_email(url, timeout=REQUEST_TIMEOUT)
-        form = find_contact_form(soup, url, timeout=REQUEST_TIMEOUT)
+        insta, email, form = found
         if insta:
             ws.cell(row=row, column=4).value = insta
         if email:
@@ -222,6 +322,11 @@ def process_sheet(path, start_row=None, end_row=None, worksheet="抹茶営業リ
             "Row %s result - Insta: %s, Email: %s, Form: %s",
             row, bool(insta), bool(email), bool(form)
         )
+    logging.info(
+        "Dedupe - %s of %s homepage crawls reused an earlier row",
+        flights.hits, flights.hits + flights.misses
+    )
+    logging.info("Circuit breakers - %s", retry_policy.get_breakers().stats())
     wb.save(save_path)
 
 
@@ -236,8 +341,20 @@ def main():
     parser.add_argument("--start-row", type=int, default=None, help="Row number to start processing")
     parser.add_argument("--end-row", type=int, default=None, help="Row number to stop processing (inclusive)")
     parser.add_argument("--worksheet", default="抹茶営業リスト（カフェ）", help="Worksheet name to process")
+    parser.add_argument("--parser", choices=PARSERS, default=DEFAULT_PARSER, help="HTML parser backend")
+    parser.add_argument(
+        "--max-page-kb",
+        type=int,
+        default=fetch_client.DEFAULT_MAX_BYTES // 1024,
+        help="Stream pages and stop reading after this many KiB (0 reads whole pages)",
+    )
     parser.add_argument("--debug", action="store_true", help="Enable debug logging")
     args = parser.parse_args()
+    try:
+        set_default_parser(args.parser)
+    except ValueError as exc:
+        parser.error(str(exc))
+    fetch_client.configure(max_bytes=args.max_page_kb * 1024 or None)
     process_sheet(args.sheet, args.start_row, args.end_row, args.worksheet, args.debug)
 
 
@@ -33,31 +33,52 @@ import json
 import logging
 import os
 import time
-from dataclasses import dataclass, field
-from typing import Any, List, Optional, Sequence
-from urllib.parse import urlparse
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from itertools import islice
+from typing import Any, Callable, Iterator, List, Optional, Sequence, TypeVar
 
 import requests
-from bs4 import BeautifulSoup
 from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 from google.oauth2 import service_account
 
 from update_contact_info import (
+    _has_usable_mailto,
     find_contact_form,
     crawl_site_for_email,
     find_instagram,
 )
+import email_collector
+import fetch_client
+import fetch_scheduler
+import http_cache
+import parse_pool
+import retry_policy
+import run_journal
+import sharding
+import sheet_writer
+import sheets_client
+from crawl_log import CrawlLog
+from email_scoring import select_best_email  # noqa: F401 - re-exported
+from page_cache import PageCache
+from page_parser import DEFAULT_PARSER, PARSERS, set_default_parser
+from single_flight import AsyncSingleFlight, SingleFlight, homepage_key
 from sheets_cleanup import (
-    cleanup_duplicates_written_only,
+    EmailIndex,
+    SheetSnapshot,
     delete_rows,
-    find_rows_by_programmatic_duplicates,
-    find_rows_highlighted_as_duplicates,
     get_sheet_id,
+    written_only_duplicates,
 )
 
 SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
 
+ENGINES = ("threads", "asyncio")
+
+_T = TypeVar("_T")
+_R = TypeVar("_R")
+
 
 def _env_flag(name: str, *, default: bool) -> bool:
     """Return ``True`` when environment variable ``name`` is truthy."""
@@ -78,26 +99,6 @@ def _env_flag(name: str, *, default: bool) -> bool:
     return default
 
 
-def _mark_row_status(service, spreadsheet_id, sheet_name, row_index, status="エラー"):
-    """Update the status column for ``row_index`` with ``status``."""
-
-    try:
-        (
-            service.spreadsheets()
-            .values()
-            .update(
-                spreadsheetId=spreadsheet_id,
-                range=f"{sheet_name}!G{row_index}",
-                valueInputOption="RAW",
-                body={"values": [[status]]},
-            )
-            .execute()
-        )
-        print(f"[ROW-STATUS] row {row_index} -> {status}")
-    except Exception as e:  # pragma: no cover - network dependent
-        print(f"[ROW-STATUS-ERROR] failed to mark row {row_index}: {e!r}")
-
-
 @dataclass
 class ProcessState:
     spreadsheet_id: str
@@ -105,11 +106,25 @@ class ProcessState:
     service: Any | None = None
     written_rows: list[int] = field(default_factory=list)
     error_rows: list[int] = field(default_factory=list)
+    duplicate_rows: list[int] = field(default_factory=list)
     updated: int = 0
+    row_keys: dict[int, str] = field(default_factory=dict)
+
+
+def _header_rows() -> int:
+    try:
+        return int(os.getenv("HEADER_ROWS", "1"))
+    except ValueError:
+        return 1
 
 
 def _build_sheet_service(credentials_file: str):
-    """Return an authorised Sheets API client."""
+    """Return an authorised Sheets API client that respects the API quota.
+
+    The client is wrapped with :func:`sheets_client.wrap`, so every request
+    made through it, including the cleanup's, shares one rate limit and
+    retry policy.
+    """
 
     if not os.path.exists(credentials_file):
         logging.error("Credentials file not found: %s", credentials_file)
@@ -129,7 +144,7 @@ def _build_sheet_service(credentials_file: str):
         creds = service_account.Credentials.from_service_account_file(
             credentials_file, scopes=SCOPES
         )
-        return build("sheets", "v4", credentials=creds)
+        return sheets_client.wrap(build("sheets", "v4", credentials=creds))
     except Exception as exc:  # pragma: no cover - network dependent
         logging.error("Failed to build Sheets service: %s", exc)
         return None
@@ -141,53 +156,88 @@ def _fetch_page(
     verify: bool,
     *,
     context: str | None = None,
+    stop: Optional[Callable[[bytes], bool]] = None,
 ) -> Optional[str]:
-    """Return the page content for ``url`` with retry handling."""
+    """Return the page content for ``url`` with retry handling.
 
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/120.0.0.0 Safari/537.36"
-        )
-    }
+    Requests go through the pooled keep-alive client in :mod:`fetch_client`
+    and are retried according to :mod:`retry_policy`; hosts whose circuit
+    breaker is open are skipped without a request.  Non-HTML responses and
+    HTTP errors other than the retryable ones are not retried.  ``stop`` ends
+    a streamed download early (see :func:`update_contact_info._has_usable_mailto`).
+    """
+
+    headers = {"User-Agent": fetch_client.USER_AGENT}
+    options = {"stop": stop} if stop is not None else {}
+    policy = retry_policy.get_policy()
+    breakers = retry_policy.get_breakers()
 
     prefix = f"{context}: " if context else ""
 
-    for attempt in range(3):
-        try:
-            res = requests.get(url, timeout=timeout, verify=verify, headers=headers)
-            if res.status_code == 403:
+    with breakers.fetch(url) as outcome:
+        for attempt in range(policy.attempts):
+            if not breakers.allow(url):
                 logging.warning(
-                    "%sAttempt %s fetching %s returned HTTP 403; retrying",
+                    "%sSkipping %s: circuit breaker open for %s",
                     prefix,
-                    attempt + 1,
                     url,
+                    retry_policy.host_of(url),
                 )
-                continue
-            res.raise_for_status()
-            return res.text
-        except requests.exceptions.SSLError as exc:
-            if verify:
-                verify = False
+                return None
+            retry_after = None
+            try:
+                res = fetch_client.get(
+                    url, timeout=timeout, verify=verify, headers=headers, **options
+                )
+                outcome.record_status(res.status_code)
+                if policy.retries_status(res.status_code):
+                    retry_after = res.headers.get("Retry-After")
+                    logging.warning(
+                        "%sAttempt %s fetching %s returned HTTP %s; retrying",
+                        prefix,
+                        attempt + 1,
+                        url,
+                        res.status_code,
+                    )
+                else:
+                    res.raise_for_status()
+                    if getattr(res, "truncated", False):
+                        logging.info(
+                            "%sPage %s exceeded the size cap; truncated", prefix, url
+                        )
+                    return fetch_client.response_text(res)
+            except fetch_client.NotHtmlError as exc:
+                logging.info("%sSkipping %s: %s", prefix, url, exc)
+                return None
+            except requests.exceptions.SSLError as exc:
+                if verify:
+                    verify = False
+                    logging.warning(
+                        "%sSSL error on %s (retrying without verification): %s",
+                        prefix,
+                        url,
+                        exc,
+                    )
+                    continue
+            except requests.exceptions.HTTPError as exc:
+                logging.warning("%sFetching %s failed: %s", prefix, url, exc)
+                return None
+            except requests.RequestException as exc:
                 logging.warning(
-                    "%sSSL error on %s (retrying without verification): %s",
+                    "%sAttempt %s fetching %s failed: %s",
                     prefix,
+                    attempt + 1,
                     url,
                     exc,
                 )
-                continue
-        except requests.RequestException as exc:
-            logging.warning(
-                "%sAttempt %s fetching %s failed: %s",
-                prefix,
-                attempt + 1,
-                url,
-                exc,
-            )
-            continue
-    logging.error("%sFailed to fetch %s after 3 attempts", prefix, url)
-    return None
+                if outcome.record_error(exc):
+                    break
+            delay = policy.delay(attempt, retry_after)
+            if delay is None:
+                break
+            time.sleep(delay)
+        logging.error("%sFailed to fetch %s after %s attempts", prefix, url, attempt + 1)
+        return None
 
 
 def _delete_rows_by_numbers(
@@ -198,6 +248,7 @@ def _delete_rows_by_numbers(
     row_numbers: Sequence[int],
     dry_run: bool,
     description: str,
+    snapshot: Optional[SheetSnapshot] = None,
 ) -> List[int]:
     """Delete ``row_numbers`` on ``worksheet_title`` and return the deleted rows."""
 
@@ -214,9 +265,14 @@ def _delete_rows_by_numbers(
         )
         return unique_desc
 
-    sheet_id = get_sheet_id(service, spreadsheet_id, worksheet_title)
+    if snapshot is not None:
+        sheet_id = snapshot.sheet_id
+    else:
+        sheet_id = get_sheet_id(service, spreadsheet_id, worksheet_title)
     zero_based = [row - 1 for row in unique_desc]
     delete_rows(service, spreadsheet_id, sheet_id, zero_based)
+    if snapshot is not None:
+        snapshot.delete(unique_desc)
     logging.info(
         "[CLEANUP] Deleted %s %s: %s",
         len(unique_desc),
@@ -226,175 +282,232 @@ def _delete_rows_by_numbers(
     return unique_desc
 
 
-def _adjust_written_rows_after_deletion(
-    written_rows: Sequence[int], deleted_rows: Sequence[int]
-) -> List[int]:
-    """Return ``written_rows`` adjusted after removing ``deleted_rows``."""
+@dataclass
+class RowResult:
+    """Outcome of crawling a single sheet row."""
 
-    if not deleted_rows:
-        return list(written_rows)
+    row_index: int
+    insta: str = ""
+    email: str = ""
+    form: str = ""
+    status: str = ""
+    error: Exception | None = None
+    fetches: int = 0
+    fetches_saved: int = 0
+    deduped: bool = False
+    resumed: bool = False
 
-    deleted_sorted = sorted({int(row) for row in deleted_rows})
-    deleted_set = set(deleted_sorted)
-    adjusted: List[int] = []
 
-    for row in written_rows:
-        if row in deleted_set:
-            continue
-        shift = bisect.bisect_left(deleted_sorted, row)
-        adjusted.append(row - shift)
+def _row_url(row: Sequence[Any]) -> str:
+    """Return the homepage URL in column C of ``row``."""
 
-    return adjusted
+    return row[2].strip() if len(row) > 2 and isinstance(row[2], str) else ""
 
 
-def select_best_email(candidates, site_url, allow_external=False, allow_support=False):
-    """Return the best e-mail candidate from ``candidates``.
+def _has_results(row: Sequence[Any]) -> bool:
+    """Return whether any of the output columns D–G of ``row`` is filled."""
 
-    Each candidate is a mapping with ``email``, ``source_url`` and
-    ``anchor_text`` keys.  ``site_url`` is used to determine whether the
-    e-mail address belongs to the same site.  The function returns
-    ``(best, notes, kept, blocked)`` where ``best`` is the chosen e-mail or
-    ``None`` when no suitable address was found, ``notes`` is a list of
-    diagnostic strings, ``kept`` is a list of kept e-mails and ``blocked`` is
-    a list of ``(email, reason)`` tuples describing rejected candidates.
-    """
+    return any(isinstance(value, str) and value.strip() for value in row[3:7])
 
-    def _host_from_url(url: str) -> str:
-        return urlparse(url).netloc.lower() if url else ""
 
-    def _same_site(a: str, b: str) -> bool:
-        return a == b or a.endswith("." + b)
+def _crawl_row(
+    row_index: int,
+    row: Sequence[Any],
+    *,
+    timeout: float,
+    verify_ssl: bool,
+    flights: Optional[SingleFlight] = None,
+) -> RowResult:
+    """Crawl the homepage in column C of ``row`` and return the extracted values.
+
+    When ``flights`` is given, rows whose homepage normalises to the same
+    :func:`single_flight.homepage_key` share a single crawl.  Exceptions are
+    captured on the returned :class:`RowResult` so that worker threads never
+    abort the run; the caller decides how to report them.
+    """
 
-    def _norm_local(local: str) -> str:
-        local = local.lower().split("+", 1)[0]
-        return local.replace(".", "")
+    result = RowResult(row_index=row_index)
+    try:
+        url = _row_url(row)
+
+        if not url:
+            result.status = "なし"
+        elif not url.lower().startswith(("http://", "https://")):
+            result.status = "エラー"
+        elif flights is None:
+            result = _crawl_homepage(
+                row_index, url, timeout=timeout, verify_ssl=verify_ssl
+            )
+        else:
+            crawled, shared = flights.do(
+                homepage_key(url),
+                lambda: _crawl_homepage(
+                    row_index, url, timeout=timeout, verify_ssl=verify_ssl
+                ),
+            )
+            result = _reuse(crawled, row_index) if shared else crawled
+    except Exception as exc:  # pragma: no cover - resilient row processing
+        result.error = exc
+    return result
 
-    base_host = _host_from_url(site_url)
 
-    BLOCK_LOCAL = (
-        'jobs','job','career','careers','recruit','recruitment','hiring','hr','talent',
-        'press','media','pr',
-        'billing','invoice','accounting','finance',
-        'legal','law','privacy','copyright','dmca','abuse','compliance','security',
-        'admin','webmaster','postmaster','hostmaster',
-        'noreply','donotreply'
-    )
-    SUPPORT_LOCAL = ('support','helpdesk','help')
+def _reuse(crawled: RowResult, row_index: int) -> RowResult:
+    """Return ``crawled`` re-addressed to ``row_index`` for a deduplicated row."""
 
-    STRONG_PLUS = (
-        'wholesale','purchasing','procurement','buyer','buying','sourcing',
-        'supplier','supplies','supply','vendor','vendors',
-        'trade','distributor','distribution','bulk'
+    return replace(
+        crawled, row_index=row_index, fetches=0, fetches_saved=0, deduped=True
     )
-    MID_PLUS    = ('owner','manager','operations','beverage','fnb','foodandbeverage')
-    SOFT_PLUS   = ('info','contact','hello','enquiries','inquiries','inquiry','team','partnership','partnerships')
-    WEAK_PLUS   = ('sales','orders')
 
-    CONSUMER_ORDER_PATH = (
-        '/order','/order-online','/online-order','/orderonline',
-        '/pickup','/takeout','/delivery','/menu','/menus','/catering','/gift-card','/giftcards'
-    )
-    CONSUMER_ANCHOR = (
-        'order online','order now','takeout','pickup','delivery',
-        'ubereats','doordash','grubhub','deliveroo','menu'
-    )
-    TRADE_HINTS = ('wholesale','trade','distributor','bulk','b2b','wholesale orders','trade orders')
-    PURPOSE_PATH = (
-        '/job','/jobs','/career','/careers','/recruit','/hiring',
-        '/press','/media','/legal','/privacy','/terms','/dmca',
-        '/billing','/invoice'
-    )
 
-    def score_one(e: dict, relax=False):
-        email = (e.get('email') or '').strip()
-        src = e.get('source_url') or ''
-        anchor = (e.get('anchor_text') or '').lower()
+def _crawl_homepage(
+    row_index: int, url: str, *, timeout: float, verify_ssl: bool
+) -> RowResult:
+    """Run the extractors against homepage ``url`` for ``row_index``."""
+
+    result = RowResult(row_index=row_index)
+    context = f"row {row_index}"
+    fetch_partial = None
+    if fetch_client.streaming():
+        def fetch_partial(page_url: str) -> Optional[str]:
+            return _fetch_page(
+                page_url,
+                timeout=timeout,
+                verify=verify_ssl,
+                context=context,
+                stop=_has_usable_mailto,
+            )
 
-        if not email or '@' not in email:
-            return None
+    cache = PageCache(
+        lambda page_url: _fetch_page(
+            page_url,
+            timeout=timeout,
+            verify=verify_ssl,
+            context=context,
+        ),
+        fetch_partial=fetch_partial,
+    )
+    content = cache.get(url)
+    if content is None:
+        result.status = "エラー"
+    else:
+        try:
+            page = cache.page(url)
+        except Exception as e_bs:  # pragma: no cover - parser issues
+            print(f"[PARSE-WARN] HTML parser failed: {e_bs!r}")
+            page = None
+
+        result.insta = (
+            find_instagram(page, url) if page is not None else ""
+        ) or ""
+        result.email = crawl_site_for_email(
+            url,
+            timeout=timeout,
+            verify=verify_ssl,
+            cache=cache,
+            budget=email_collector.get_budget(),
+        ) or ""
+        result.form = (
+            find_contact_form(
+                page, url, timeout=timeout, verify=verify_ssl, cache=cache
+            )
+            if page is not None
+            else ""
+        ) or ""
+        if not any([result.insta, result.email, result.form]):
+            result.status = "なし"
+    result.fetches = cache.fetches
+    result.fetches_saved = cache.fetches_saved
+    return result
+
+
+async def _crawl_row_async(
+    row_index: int,
+    row: Sequence[Any],
+    fetcher,
+    flights: Optional[AsyncSingleFlight] = None,
+) -> RowResult:
+    """Async counterpart of :func:`_crawl_row` used by the ``asyncio`` engine."""
+
+    result = RowResult(row_index=row_index)
+    try:
+        url = _row_url(row)
+
+        if not url:
+            result.status = "なし"
+        elif not url.lower().startswith(("http://", "https://")):
+            result.status = "エラー"
+        elif flights is None:
+            result = await _crawl_homepage_async(row_index, url, fetcher)
+        else:
+            crawled, shared = await flights.do(
+                homepage_key(url),
+                lambda: _crawl_homepage_async(row_index, url, fetcher),
+            )
+            result = _reuse(crawled, row_index) if shared else crawled
+    except Exception as exc:  # pragma: no cover - resilient row processing
+        result.error = exc
+    return result
 
-        if 'catering' in email.lower():
-            return ('blocked', email, 'blocked:catering_address')
 
-        local, domain = email.split('@', 1)
-        nlocal = _norm_local(local)
-        path = urlparse(src).path.lower() if src else ''
+async def _crawl_homepage_async(row_index: int, url: str, fetcher) -> RowResult:
+    """Async counterpart of :func:`_crawl_homepage`."""
 
-        if any(k in nlocal for k in BLOCK_LOCAL):
-            return ('blocked', email, 'blocked:purpose_mismatch')
-        if any(p in path for p in PURPOSE_PATH) or any(p in anchor for p in
-            ('career','careers','recruit','hiring','press','media','legal','privacy','billing','invoice','dmca')):
-            return ('blocked', email, 'blocked:purpose_section')
+    import async_crawl
 
-        if 'orders' in nlocal or nlocal == 'order':
-            if any(p in path for p in CONSUMER_ORDER_PATH) or any(k in anchor for k in CONSUMER_ANCHOR):
-                return ('blocked', email, 'blocked:consumer_order_inbox')
-            if any(k in path for k in TRADE_HINTS) or any(k in anchor for k in TRADE_HINTS):
-                extra_orders_bonus = 3
-            else:
-                extra_orders_bonus = 0
-        else:
-            extra_orders_bonus = 0
-
-        s = 0
-        if any(k in nlocal for k in STRONG_PLUS): s += 6
-        if any(k in nlocal for k in MID_PLUS):    s += 4
-        if any(k in nlocal for k in SOFT_PLUS):   s += 3
-        if any(k in nlocal for k in WEAK_PLUS):   s += 1
-        s += extra_orders_bonus
-
-        same = _same_site(domain.lower(), _host_from_url(src) or base_host)
-        if same: s += 2
-        else:    s -= 1 if relax or allow_external else 2
-
-        if any(k in nlocal for k in SUPPORT_LOCAL):
-            if relax or allow_support:
-                s -= 2
-            else:
-                return ('blocked', email, 'blocked:support_only')
-
-        threshold = 1 if not relax else 0
-        if s < threshold:
-            return ('blocked', email, f'blocked:low_score({s})')
-
-        tie = (
-            0 if same else 1,
-            - (6 if any(k in nlocal for k in STRONG_PLUS) else
-               4 if any(k in nlocal for k in MID_PLUS) else
-               3 if any(k in nlocal for k in SOFT_PLUS) else
-               1 if any(k in nlocal for k in WEAK_PLUS) else 0) - extra_orders_bonus,
-            len(local),
-            email
-        )
-        return ('keep', email, s, tie)
-
-    def run(relax=False):
-        kept = []
-        blocked = []
-        for c in candidates:
-            res = score_one(c, relax=relax)
-            if not res:
-                continue
-            if res[0] == 'keep':
-                kept.append(res[1:])
-            else:
-                blocked.append((res[1], res[2]))
-        return kept, blocked
+    result = RowResult(row_index=row_index)
+    context = f"row {row_index}"
+    fetch_partial = None
+    if fetcher.max_bytes is not None:
+        def fetch_partial(page_url: str):
+            return fetcher.fetch(page_url, context=context, stop=_has_usable_mailto)
 
-    kept, blocked = run(relax=False)
-    notes = []
-    if not kept:
-        kept, blocked_relax = run(relax=True)
-        blocked.extend(b for b in blocked_relax if b not in blocked)
-        if kept:
-            notes.append('relaxed')
+    cache = async_crawl.AsyncPageCache(
+        lambda page_url: fetcher.fetch(page_url, context=context),
+        fetch_partial=fetch_partial,
+    )
+    page = await cache.page(url)
+    if page is None:
+        result.status = "エラー"
+    else:
+        result.insta = find_instagram(page, url) or ""
+        result.email = await async_crawl.crawl_site_for_email(
+            url, cache, budget=email_collector.get_budget()
+        ) or ""
+        result.form = await async_crawl.find_contact_form(page, url, cache) or ""
+        if not any([result.insta, result.email, result.form]):
+            result.status = "なし"
+    result.fetches = cache.fetches
+    result.fetches_saved = cache.fetches_saved
+    return result
+
+
+def _map_in_order(
+    func: Callable[[_T], _R], items: Sequence[_T], *, workers: int
+) -> Iterator[_R]:
+    """Yield ``func(item)`` for ``items`` in order using up to ``workers`` threads.
+
+    At most ``2 * workers`` calls are in flight at once so that a large sheet
+    does not queue every row up front.  ``func`` must not raise.
+    """
 
-    best = None
-    if kept:
-        kept.sort(key=lambda x: (-x[1], x[2]))
-        best = kept[0][0]
-    kept_emails = [k[0] for k in kept]
-    return best, notes, kept_emails, blocked
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="row")
+    try:
+        iterator = iter(items)
+        window: deque[Future] = deque(
+            executor.submit(func, item) for item in islice(iterator, workers * 2)
+        )
+        while window:
+            future = window.popleft()
+            for item in islice(iterator, 1):
+                window.append(executor.submit(func, item))
+            yield future.result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
 
 
 def process_sheet(
@@ -407,8 +520,57 @@ def process_sheet(
     credentials_file: str,
     *,
     state: Optional[ProcessState] = None,
+    workers: int = 1,
+    engine: str = "threads",
+    dedupe: bool = True,
+    journal: Optional[run_journal.RunJournal] = None,
+    resume: bool = False,
+    incremental: bool = False,
+    crawl_log: Optional[CrawlLog] = None,
+    recrawl_after: Optional[float] = None,
+    shard: Optional[tuple[int, int]] = None,
+    write_batch_size: int = sheet_writer.DEFAULT_BATCH_SIZE,
+    write_interval: float = sheet_writer.DEFAULT_FLUSH_INTERVAL,
+    suppress_duplicates: bool = False,
 ) -> int:
-    """Process rows on the sheet and return the number of updated rows."""
+    """Process rows on the sheet and return the number of updated rows.
+
+    With ``workers`` greater than one the rows are crawled concurrently on a
+    thread pool.  ``engine="asyncio"`` crawls them on an event loop instead
+    (see :mod:`async_crawl`), where ``workers`` is the number of rows in
+    flight.  Results are still consumed in sheet order, so the writes and the
+    rows recorded on ``state`` are identical to a sequential run.  They are
+    sent by a :class:`sheet_writer.SheetWriter` once ``write_batch_size`` rows
+    are pending or after ``write_interval`` seconds.
+    With ``dedupe`` enabled, rows pointing at the same homepage share a single
+    crawl (see :mod:`single_flight`).
+
+    Every result and every successful write is recorded on ``journal``.  With
+    ``resume`` the run continues where the journaled one stopped instead of
+    at ``start_row``: journaled results that never reached the sheet are
+    written without crawling their rows again (see :mod:`run_journal`).
+
+    With ``incremental`` rows whose columns D–G are already filled are
+    skipped, unless ``crawl_log`` says their homepage was last crawled more
+    than ``recrawl_after`` seconds ago.  Every crawled homepage is recorded on
+    ``crawl_log``.
+
+    ``shard=(i, n)`` processes only the rows of shard ``i`` of ``n`` (see
+    :mod:`sharding`); the stable key of every processed row is kept in
+    ``state.row_keys`` for the merge step.
+
+    With ``suppress_duplicates`` column E is read once into an
+    :class:`sheets_cleanup.EmailIndex`.  A row whose email is already on a
+    row above it is written with 重複 in column G and recorded in
+    ``state.duplicate_rows``, so the cleanup deletes it without reading the
+    sheet again.
+
+    A failed write stops the crawl: the writer's error is raised and the rows
+    on ``state`` are cut down to those the sheet confirmed.
+    """
+
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown crawl engine {engine!r}; expected one of {ENGINES}")
 
     if state is None:
         state = ProcessState(spreadsheet_id=spreadsheet_id, worksheet=worksheet)
@@ -417,6 +579,8 @@ def process_sheet(
         state.worksheet = worksheet
         state.written_rows.clear()
         state.error_rows.clear()
+        state.duplicate_rows.clear()
+        state.row_keys.clear()
         state.updated = 0
 
     service = _build_sheet_service(credentials_file)
@@ -425,42 +589,59 @@ def process_sheet(
         return 0
 
     state.service = service
-    batch_size = 25
 
-    def _flush_pending_updates(pending_updates: list[dict]) -> None:
-        if not pending_updates:
-            return
-
-        delay = 1.0
-        while True:
-            try:
-                (
+    resumed: dict[int, run_journal.JournalEntry] = {}
+    if journal is not None:
+        plan = journal.plan() if resume else None
+        if plan is not None:
+            if plan.cleaned:
+                first, last = plan.window
+                column = (
                     service.spreadsheets()
                     .values()
-                    .batchUpdate(
-                        spreadsheetId=spreadsheet_id,
-                        body={
-                            "valueInputOption": "RAW",
-                            "data": pending_updates,
-                        },
-                    )
+                    .get(spreadsheetId=spreadsheet_id, range=f"{worksheet}!C{first}:C{last}")
                     .execute()
+                    .get("values", [])
                 )
-            except HttpError as exc:  # pragma: no cover - network dependent
-                status = getattr(exc, "status_code", None) or getattr(exc.resp, "status", None)
-                if status == 429:
-                    logging.warning(
-                        "Rate limit exceeded while writing to %s; retrying in %.1fs",
-                        worksheet,
-                        delay,
-                    )
-                    time.sleep(delay)
-                    delay = min(delay * 2, 30.0)
+                plan.anchor([cells[0] if cells else "" for cells in column])
+            start_row, max_rows = plan.start_row, plan.remaining
+            resumed = plan.pending()
+            for entry in plan.finished():
+                state.row_keys[entry.row] = entry.url
+                if entry.values[3:4] == [run_journal.DUPLICATE_STATUS]:
+                    state.duplicate_rows.append(entry.row)
                     continue
-                raise
-            else:
-                break
-        pending_updates.clear()
+                state.written_rows.append(entry.row)
+                if entry.values[3:4] == [run_journal.ERROR_STATUS]:
+                    state.error_rows.append(entry.row)
+            logging.info(
+                "[JOURNAL] Resuming at row %s: %s journaled result(s) to write, "
+                "%s row(s) left for cleanup",
+                start_row,
+                len(resumed),
+                len(state.written_rows),
+            )
+        elif resume:
+            logging.info("[JOURNAL] Nothing to resume; starting at row %s", start_row)
+        journal.begin(start_row, max_rows, plan=plan)
+        if max_rows == 0:
+            logging.info("[JOURNAL] All rows of the journaled run are done.")
+            return 0
+
+    def _from_journal(task: tuple[int, list]) -> Optional[RowResult]:
+        row_index, row = task
+        entry = resumed.get(row_index)
+        if entry is None or entry.url != _row_url(row):
+            return None
+        insta, email, form, status = entry.values
+        return RowResult(
+            row_index=row_index,
+            insta=insta,
+            email=email,
+            form=form,
+            status=status,
+            resumed=True,
+        )
 
     end_row = "" if max_rows is None else str(start_row + max_rows - 1)
     read_range = f"{worksheet}!A{start_row}:G{end_row}"
@@ -472,97 +653,250 @@ def process_sheet(
     )
     rows = result.get("values", [])
 
+    tasks: list[tuple[int, list]] = []
+    skipped = 0
+    for offset, row in enumerate(rows):
+        if not row or not row[0]:
+            break  # Stop when column A is blank
+        if max_rows is not None and offset >= max_rows:
+            break
+        if shard is not None and sharding.shard_of(row, shard[1]) != shard[0]:
+            continue
+        if incremental and _has_results(row):
+            url = _row_url(row)
+            stale = (
+                recrawl_after is not None
+                and crawl_log is not None
+                and bool(url)
+                and crawl_log.is_stale(url, recrawl_after)
+            )
+            if not stale:
+                skipped += 1
+                continue
+        tasks.append((start_row + offset, row))
+    if incremental:
+        logging.info(
+            "[INCREMENTAL] Skipped %s row(s) that already have results; %s to crawl",
+            skipped,
+            len(tasks),
+        )
+
+    emails: Optional[EmailIndex] = None
+    if suppress_duplicates:
+        # Rows this run rewrites do not count with their old emails; in shard
+        # mode neither do the rows of the other shards.
+        if shard is not None:
+            rewritten = range(start_row, start_row + len(rows))
+        else:
+            rewritten = [row_index for row_index, _ in tasks]
+        emails = _load_email_index(service, spreadsheet_id, worksheet, rewritten)
+
+    if engine == "asyncio":
+        import async_crawl
+
+        client = fetch_client.get_client()
+        limits = {}
+        if client.scheduler is not None:
+            limits = {
+                "max_in_flight": client.scheduler.max_in_flight,
+                "per_host": client.scheduler.per_host,
+            }
+        fetcher = async_crawl.AsyncFetcher(
+            timeout=timeout,
+            verify=verify_ssl,
+            max_bytes=client.max_bytes,
+            scheduler=client.scheduler,
+            **limits,
+        )
+        flights = AsyncSingleFlight() if dedupe else None
+
+        async def _crawl_async(task: tuple[int, list], fetcher) -> RowResult:
+            return _from_journal(task) or await _crawl_row_async(
+                *task, fetcher, flights
+            )
+
+        results = async_crawl.map_in_order(
+            _crawl_async,
+            tasks,
+            workers=workers,
+            fetcher=fetcher,
+        )
+    else:
+        flights = SingleFlight() if dedupe else None
+
+        def _crawl(task: tuple[int, list]) -> RowResult:
+            row_index, row = task
+            return _from_journal(task) or _crawl_row(
+                row_index, row, timeout=timeout, verify_ssl=verify_ssl, flights=flights
+            )
+
+        results = _map_in_order(_crawl, tasks, workers=workers)
+
+    urls = {row_index: _row_url(row) for row_index, row in tasks}
+    state.row_keys.update(
+        (row_index, sharding.row_key(row)) for row_index, row in tasks
+    )
     updated = 0
-    pending_updates: list[dict] = []
+    fetches_saved = 0
+    reused = 0
+    suppressed = 0
+    # Rows resumed from the journal reached the sheet in the earlier run.
+    flushed = {*state.written_rows, *state.error_rows, *state.duplicate_rows}
+
+    def _on_flushed(rows: list[int]) -> None:
+        flushed.update(rows)
+        if journal is not None:
+            journal.mark_flushed(rows)
+
+    writer = sheet_writer.SheetWriter(
+        service,
+        spreadsheet_id,
+        worksheet,
+        batch_size=write_batch_size,
+        flush_interval=write_interval,
+        on_flushed=_on_flushed,
+    )
 
     try:
-        for offset, row in enumerate(rows):
-            row_index = start_row + offset
-            if not row or not row[0]:
-                break  # Stop when column A is blank
-
+        for result in results:
+            if writer.error is not None:
+                logging.error("[WRITER] Stopped crawling after a failed write")
+                break
+            row_index = result.row_index
             try:
-                url = row[2].strip() if len(row) > 2 and isinstance(row[2], str) else ""
-                insta = email = form = ""
-                status = ""
-
-                if not url:
-                    status = "なし"
-                elif not url.lower().startswith(("http://", "https://")):
-                    status = "エラー"
+                if result.error is not None:
+                    raise result.error
+
+                values = [result.insta, result.email, result.form, result.status]
+                duplicate = result.status == run_journal.DUPLICATE_STATUS
+                if emails is not None and result.status != "エラー" and not duplicate:
+                    duplicate = emails.claim(result.email, row_index) is not None
+                if duplicate:
+                    values[3] = run_journal.DUPLICATE_STATUS
+                if journal is not None:
+                    journal.record(row_index, urls[row_index], values)
+                # Duplicates keep their crawl result next to the 重複 mark, so
+                # nothing is lost if the cleanup does not delete them.
+                writer.put(row_index, values)
+                if duplicate:
+                    state.duplicate_rows.append(row_index)
+                    suppressed += 1
                 else:
-                    content = _fetch_page(
-                        url,
-                        timeout=timeout,
-                        verify=verify_ssl,
-                        context=f"row {row_index}",
-                    )
-                    if content is None:
-                        status = "エラー"
-                    else:
-                        try:
-                            soup = BeautifulSoup(content, "html.parser")
-                        except Exception as e_bs:  # pragma: no cover - parser issues
-                            print(f"[PARSE-WARN] html.parser failed: {e_bs!r}")
-                            soup = None
-
-                        insta = (
-                            find_instagram(soup, url) if soup is not None else ""
-                        ) or ""
-                        email = crawl_site_for_email(
-                            url, timeout=timeout, verify=verify_ssl
-                        ) or ""
-                        form = (
-                            find_contact_form(
-                                soup, url, timeout=timeout, verify=verify_ssl
-                            )
-                            if soup is not None
-                            else ""
-                        ) or ""
-                        if not any([insta, email, form]):
-                            status = "なし"
-
-                values = [[insta, email, form, status]]
-                update_range = f"{worksheet}!D{row_index}:G{row_index}"
-                pending_updates.append(
-                    {
-                        "range": update_range,
-                        "majorDimension": "ROWS",
-                        "values": values,
-                    }
-                )
-                if len(pending_updates) >= batch_size:
-                    _flush_pending_updates(pending_updates)
-                state.written_rows.append(row_index)
-                if status == "エラー":
+                    state.written_rows.append(row_index)
+                if (
+                    crawl_log is not None
+                    and urls[row_index]
+                    and not result.resumed
+                    and result.status != "エラー"
+                ):
+                    crawl_log.record(urls[row_index], result.status)
+                if result.status == "エラー":
                     state.error_rows.append(row_index)
                 logging.info(
-                    "Processed row %s: IG=%s, email=%s, form=%s, status=%s",
+                    "Processed row %s: IG=%s, email=%s, form=%s, status=%s, "
+                    "fetched=%s, fetches_saved=%s",
                     row_index,
-                    insta or "-",
-                    email or "-",
-                    form or "-",
-                    status or "-",
+                    result.insta or "-",
+                    result.email or "-",
+                    result.form or "-",
+                    values[3] or "-",
+                    result.fetches,
+                    result.fetches_saved,
                 )
+                fetches_saved += result.fetches_saved
+                reused += result.resumed
                 updated += 1
-                if max_rows is not None and updated >= max_rows:
-                    break
             except Exception as e:  # pragma: no cover - resilient row processing
                 print(f"[ROW-ERROR] row {row_index}: {e!r}")
                 if row_index not in state.error_rows:
                     state.error_rows.append(row_index)
-                _mark_row_status(service, spreadsheet_id, worksheet, row_index, "エラー")
+                if journal is not None:
+                    journal.record(row_index, urls[row_index], ["", "", "", "エラー"])
+                writer.mark(row_index, "エラー")
                 continue
     finally:
-        _flush_pending_updates(pending_updates)
+        results.close()
+        try:
+            writer.close()
+        finally:
+            if writer.error is not None:
+                # The cleanup deletes rows by number, so it may only act on
+                # rows whose marks actually reached the sheet.
+                state.written_rows = [r for r in state.written_rows if r in flushed]
+                state.error_rows = [r for r in state.error_rows if r in flushed]
+                state.duplicate_rows = [r for r in state.duplicate_rows if r in flushed]
 
     state.updated = updated
-    logging.info("Updated %s rows", updated)
+    logging.info("Updated %s rows (page cache saved %s fetches)", updated, fetches_saved)
+    logging.info(
+        "[WRITER] Wrote %(rows)s row(s) as %(ranges)s range(s) in %(calls)s call(s)",
+        writer.stats(),
+    )
+    if flights is not None:
+        logging.info(
+            "[DEDUPE] %s of %s homepage crawls reused an earlier row (hit rate %.0f%%)",
+            flights.hits,
+            flights.hits + flights.misses,
+            flights.hit_rate * 100,
+        )
+    if reused:
+        logging.info("[JOURNAL] Wrote %s journaled result(s) without crawling", reused)
+    if emails is not None:
+        logging.info(
+            "[SUPPRESS] Marked %s row(s) duplicating a known email as 重複",
+            suppressed,
+        )
+    breakers = retry_policy.get_breakers().stats()
+    logging.info(
+        "[BREAKER] %s host(s) tripped, %s still open, %s fetch(es) skipped",
+        breakers["tripped"],
+        breakers["open"],
+        breakers["skipped"],
+    )
     return updated
 
 
+def _load_email_index(
+    service, spreadsheet_id: str, worksheet: str, rewritten: Sequence[int]
+) -> EmailIndex:
+    """Read the email column once and index its emails, leaving out ``rewritten`` rows.
+
+    The column is ``EMAIL_COL_LETTER`` (default E), as in :func:`run_cleanup`.
+    """
+
+    email_col = os.getenv("EMAIL_COL_LETTER", "E")
+    header_rows = _header_rows()
+    first_row = header_rows + 1
+    response = (
+        service.spreadsheets()
+        .values()
+        .get(
+            spreadsheetId=spreadsheet_id,
+            range=f"{worksheet}!{email_col}{first_row}:{email_col}",
+            majorDimension="COLUMNS",
+        )
+        .execute()
+    )
+    columns = response.get("values", [])
+    index = EmailIndex.from_column(
+        columns[0] if columns else [], first_row, skip=rewritten
+    )
+    logging.info(
+        "[SUPPRESS] Loaded %s known email(s) from column %s", len(index), email_col
+    )
+    return index
+
+
 def run_cleanup(state: ProcessState) -> None:
-    """Execute cleanup steps based on the recorded ``state``."""
+    """Execute cleanup steps based on the recorded ``state``.
+
+    The sheet is read once into a :class:`SheetSnapshot`.  Rows marked エラー
+    or 重複, written rows that duplicate an email above them and, with
+    ``GLOBAL_DEDUPE=1``, every duplicate email row are all found on that one
+    view and deleted in a single descending batch, so no row numbers have to
+    be shifted between steps.  Afterwards the rows on ``state`` refer to the
+    sheet after the deletion.
+    """
 
     service = state.service
     if service is None:
@@ -573,132 +907,162 @@ def run_cleanup(state: ProcessState) -> None:
     worksheet = state.worksheet
     written_rows = list(state.written_rows)
     error_rows = list(state.error_rows)
+    duplicate_rows = list(state.duplicate_rows)
 
     dry_run = _env_flag("DRY_RUN", default=False)
     delete_errors = _env_flag("DELETE_ERROR_ROWS", default=True)
+    cleanup_enabled = _env_flag("CLEANUP_DUPLICATE_EMAIL_ROWS", default=True)
+    global_dedupe = os.getenv("GLOBAL_DEDUPE", "0") == "1"
+    email_col = os.getenv("EMAIL_COL_LETTER", "E")
+    header_rows = _header_rows()
 
-    if delete_errors:
-        if error_rows:
-            try:
-                deleted_error_rows = _delete_rows_by_numbers(
-                    service=service,
-                    spreadsheet_id=spreadsheet_id,
-                    worksheet_title=worksheet,
-                    row_numbers=error_rows,
-                    dry_run=dry_run,
-                    description="rows marked エラー",
-                )
-            except Exception:  # pragma: no cover - cleanup errors shouldn't abort main flow
-                logging.exception("[CLEANUP] Failed to delete rows marked エラー")
-            else:
-                if deleted_error_rows and not dry_run:
-                    written_rows = _adjust_written_rows_after_deletion(
-                        written_rows, deleted_error_rows
-                    )
-        else:
-            logging.info("[CLEANUP] No written rows marked エラー to delete.")
-    else:
+    if not delete_errors:
         logging.info("[CLEANUP] Skipped deletion of rows marked エラー (disabled).")
+        error_rows = []
+    elif not error_rows:
+        logging.info("[CLEANUP] No written rows marked エラー to delete.")
+    if not cleanup_enabled:
+        duplicate_rows = []
+    if not error_rows and not (
+        cleanup_enabled and (written_rows or duplicate_rows or global_dedupe)
+    ):
+        return
 
-    cleanup_enabled = _env_flag("CLEANUP_DUPLICATE_EMAIL_ROWS", default=True)
-    email_col = os.getenv("EMAIL_COL_LETTER", "E")
     try:
-        header_rows = int(os.getenv("HEADER_ROWS", "1"))
-    except ValueError:
-        header_rows = 1
+        snapshot = SheetSnapshot.fetch(
+            service, spreadsheet_id, worksheet, email_col, header_rows
+        )
+    except Exception:  # pragma: no cover - cleanup errors shouldn't abort main flow
+        logging.exception("[CLEANUP] Failed to read the sheet; skipping cleanup")
+        return
 
+    to_delete: dict[str, set[int]] = {
+        "rows marked エラー": set(error_rows),
+        "rows marked 重複": set(duplicate_rows),
+    }
     if cleanup_enabled:
         if written_rows:
-            try:
-                deleted_written = cleanup_duplicates_written_only(
-                    service=service,
-                    spreadsheet_id=spreadsheet_id,
-                    title=worksheet,
-                    email_col_letter=email_col,
-                    header_rows=header_rows,
-                    written_rows=written_rows,
-                    dry_run=dry_run,
-                )
-                if dry_run:
-                    logging.info(
-                        "[DRY_RUN] Would delete %s duplicate rows among this run.",
-                        deleted_written,
-                    )
-                else:
-                    logging.info(
-                        "[CLEANUP] Deleted %s duplicate rows among this run.",
-                        deleted_written,
-                    )
-            except Exception:  # pragma: no cover - cleanup errors shouldn't abort main flow
-                logging.exception(
-                    "[CLEANUP] Failed to clean up written-only duplicate rows"
-                )
+            to_delete["written-only duplicate rows"] = set(
+                written_only_duplicates(snapshot.emails_map(), written_rows)
+            )
         else:
             logging.info("[CLEANUP] No rows were written; skip duplicate cleanup.")
-
-        if os.getenv("GLOBAL_DEDUPE", "0") == "1":
-            try:
-                run_global_dedupe(
-                    service=service,
-                    spreadsheet_id=spreadsheet_id,
-                    worksheet_title=worksheet,
-                    email_col_letter=email_col,
-                    header_rows=header_rows,
-                    dry_run=dry_run,
-                )
-            except Exception:  # pragma: no cover - cleanup errors shouldn't abort main flow
-                logging.exception("[GLOBAL] Failed to clean up duplicate email rows")
+        if global_dedupe:
+            to_delete["duplicate email rows (global)"] = {
+                row + 1 for row in _global_duplicate_rows(snapshot)
+            }
         else:
             logging.info("[GLOBAL] Skipped global dedupe (written-only mode).")
 
-    state.written_rows = written_rows
-
+    for description, rows in to_delete.items():
+        if rows:
+            logging.info(
+                "[CLEANUP] %s %s: %s",
+                "Would delete" if dry_run else "Deleting",
+                description,
+                sorted(rows, reverse=True),
+            )
+    deleted_rows = set().union(*to_delete.values())
+    if not deleted_rows:
+        logging.info("[CLEANUP] Nothing to delete.")
+        return
 
-def run_global_dedupe(
-    *,
-    service,
-    spreadsheet_id: str,
-    worksheet_title: str,
-    email_col_letter: str,
-    header_rows: int,
-    dry_run: bool,
-) -> int:
-    sheet_id = get_sheet_id(service, spreadsheet_id, worksheet_title)
     try:
-        rows = find_rows_highlighted_as_duplicates(
-            service,
-            spreadsheet_id,
-            worksheet_title,
-            email_col_letter,
-            header_rows,
-        )
-    except HttpError as exc:
-        logging.warning(
-            "[GLOBAL] Color-based detection failed, falling back. reason=%s",
-            exc,
-        )
-        rows = []
-
-    if not rows:
-        rows = find_rows_by_programmatic_duplicates(
-            service,
-            spreadsheet_id,
-            worksheet_title,
-            email_col_letter,
-            header_rows,
+        deleted = _delete_rows_by_numbers(
+            service=service,
+            spreadsheet_id=spreadsheet_id,
+            worksheet_title=worksheet,
+            row_numbers=sorted(deleted_rows),
+            dry_run=dry_run,
+            description="rows in one batch",
+            snapshot=snapshot,
         )
+    except Exception:  # pragma: no cover - cleanup errors shouldn't abort main flow
+        logging.exception("[CLEANUP] Failed to delete rows")
+        return
+    if dry_run:
+        return
 
-    if not rows:
-        logging.info("[GLOBAL] No duplicate email rows to delete.")
-        return 0
+    deleted_asc = sorted(deleted)
 
-    rows = sorted(set(rows), reverse=True)
-    if dry_run:
-        logging.info("[DRY_RUN] Would delete %s rows: %s", len(rows), rows)
-    else:
-        delete_rows(service, spreadsheet_id, sheet_id, rows)
-        logging.info("[GLOBAL] Deleted %s duplicate email rows.", len(rows))
-    return len(rows)
+    def _remaining(rows: Sequence[int]) -> list[int]:
+        return [
+            row - bisect.bisect_left(deleted_asc, row)
+            for row in rows
+            if row not in deleted_rows
+        ]
+
+    state.written_rows = _remaining(state.written_rows)
+    state.error_rows = _remaining(state.error_rows)
+    state.duplicate_rows = _remaining(state.duplicate_rows)
+
+
+def shard_manifest(state: ProcessState, shard: tuple[int, int]) -> sharding.ShardManifest:
+    """Return the manifest of the rows ``state`` recorded for ``shard``.
+
+    Rows without a homepage key are left out (see :mod:`sharding`).
+    """
+
+    def _keyed(rows: Sequence[int]) -> list[tuple[int, str]]:
+        keyed = ((row, state.row_keys.get(row, "")) for row in rows)
+        return [(row, key) for row, key in keyed if key]
+
+    return sharding.ShardManifest(
+        spreadsheet_id=state.spreadsheet_id,
+        worksheet=state.worksheet,
+        shard=shard[0],
+        count=shard[1],
+        written=_keyed(state.written_rows),
+        errors=_keyed(state.error_rows),
+        duplicates=_keyed(state.duplicate_rows),
+    )
+
+
+def merge_shards(
+    state: ProcessState, manifests: Sequence[sharding.ShardManifest]
+) -> None:
+    """Locate the rows written by every shard on the sheet and run the cleanup once.
+
+    The rows are looked up by their :func:`sharding.row_key`, so rows moved
+    since the shards ran are still found; rows that disappeared are ignored.
+    """
+
+    service = state.service
+    values = (
+        service.spreadsheets()
+        .values()
+        .get(spreadsheetId=state.spreadsheet_id, range=f"{state.worksheet}!A1:C")
+        .execute()
+        .get("values", [])
+    )
+    current = {
+        offset + 1: sharding.row_key(row) for offset, row in enumerate(values)
+    }
+    written = {row: key for manifest in manifests for row, key in manifest.written}
+    errors = {row: key for manifest in manifests for row, key in manifest.errors}
+    duplicates = {
+        row: key for manifest in manifests for row, key in manifest.duplicates
+    }
+    recorded = {**written, **errors, **duplicates}
+    resolved = sharding.resolve_rows(list(recorded.items()), current)
+    state.written_rows = sorted(resolved[row] for row in written if row in resolved)
+    state.error_rows = sorted(resolved[row] for row in errors if row in resolved)
+    state.duplicate_rows = sorted(
+        resolved[row] for row in duplicates if row in resolved
+    )
+    logging.info(
+        "[SHARDS] Merged %s shard(s): %s row(s) found, %s no longer on the sheet",
+        len(manifests),
+        len(resolved),
+        len(recorded) - len(resolved),
+    )
+    run_cleanup(state)
+
+
+def _global_duplicate_rows(snapshot: SheetSnapshot) -> List[int]:
+    """Return the 0-based rows of ``snapshot`` the global dedupe deletes."""
+
+    return snapshot.highlighted_rows() or snapshot.programmatic_duplicates()
 
 
 def main() -> None:  # pragma: no cover - CLI entry point
@@ -708,9 +1072,194 @@ def main() -> None:  # pragma: no cover - CLI entry point
     parser.add_argument("--start-row", type=int, default=2)
     parser.add_argument("--max-rows", type=int)
     parser.add_argument("--timeout", type=float, default=5.0)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of rows to crawl concurrently",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="threads",
+        help="Crawl rows on a thread pool or on an asyncio event loop",
+    )
+    parser.add_argument(
+        "--parser",
+        choices=PARSERS,
+        default=DEFAULT_PARSER,
+        help="HTML parser backend used to read fetched pages",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        type=int,
+        default=0,
+        help="Parse pages in this many worker processes (0 parses in the crawl threads)",
+    )
+    parser.add_argument(
+        "--dedupe",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Crawl each homepage once per run and reuse the result for repeated rows",
+    )
+    parser.add_argument(
+        "--suppress-duplicates",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help=(
+            "Mark rows whose email is already on the sheet as 重複 instead of "
+            "writing them (off when CLEANUP_DUPLICATE_EMAIL_ROWS is false)"
+        ),
+    )
     parser.add_argument(
         "--verify-ssl", action=argparse.BooleanOptionalAction, default=True
     )
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=fetch_client.DEFAULT_POOL_SIZE,
+        help="Number of per-host HTTP connection pools to keep alive",
+    )
+    parser.add_argument(
+        "--per-host-connections",
+        type=int,
+        default=fetch_client.DEFAULT_PER_HOST,
+        help="Maximum number of open connections to a single host",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=fetch_scheduler.DEFAULT_MAX_IN_FLIGHT,
+        help="Maximum number of page requests in flight across all hosts",
+    )
+    parser.add_argument(
+        "--per-platform",
+        type=int,
+        default=fetch_scheduler.DEFAULT_PER_GROUP,
+        help="Maximum concurrent requests to one hosting platform or IP address",
+    )
+    parser.add_argument(
+        "--platform-rate",
+        type=float,
+        default=fetch_scheduler.DEFAULT_RATE,
+        metavar="REQ_PER_SEC",
+        help="Sustained request rate per hosting platform or IP address (0 disables)",
+    )
+    parser.add_argument(
+        "--max-page-kb",
+        type=int,
+        default=fetch_client.DEFAULT_MAX_BYTES // 1024,
+        help="Stream pages and stop reading after this many KiB (0 reads whole pages)",
+    )
+    parser.add_argument(
+        "--email-pick",
+        choices=("first", "ranked"),
+        default="first",
+        help=(
+            "first: stop at the first usable address; ranked: collect addresses "
+            "within a budget and pick the best one"
+        ),
+    )
+    parser.add_argument(
+        "--email-max-pages",
+        type=int,
+        default=email_collector.DEFAULT_MAX_PAGES,
+        help="Pages the ranked e-mail crawl may visit per row (0: no limit)",
+    )
+    parser.add_argument(
+        "--email-max-kb",
+        type=int,
+        default=email_collector.DEFAULT_MAX_KB,
+        help="KiB the ranked e-mail crawl may download per row (0: no limit)",
+    )
+    parser.add_argument(
+        "--email-confident-score",
+        type=int,
+        default=email_collector.DEFAULT_CONFIDENT_SCORE,
+        help="Stop the ranked e-mail crawl once an address scores this much",
+    )
+    parser.add_argument(
+        "--http-cache",
+        default=os.getenv("HTTP_CACHE_DIR") or None,
+        metavar="DIR",
+        help="Directory of the persistent page cache (disabled when omitted)",
+    )
+    parser.add_argument(
+        "--http-cache-ttl",
+        type=float,
+        default=http_cache.DEFAULT_TTL / 3600,
+        metavar="HOURS",
+        help="Serve cached pages younger than this without revalidating",
+    )
+    parser.add_argument(
+        "--http-cache-max-mb",
+        type=int,
+        default=http_cache.DEFAULT_MAX_BYTES // (1024 * 1024),
+        help="Evict least recently used pages beyond this size",
+    )
+    parser.add_argument(
+        "--sheets-reads-per-minute",
+        type=int,
+        default=sheets_client.DEFAULT_READS_PER_MINUTE,
+        help="Sheets API read quota to stay within",
+    )
+    parser.add_argument(
+        "--sheets-writes-per-minute",
+        type=int,
+        default=sheets_client.DEFAULT_WRITES_PER_MINUTE,
+        help="Sheets API write quota to stay within",
+    )
+    parser.add_argument(
+        "--write-batch-size",
+        type=int,
+        default=sheet_writer.DEFAULT_BATCH_SIZE,
+        help="Write results to the sheet once this many rows are pending",
+    )
+    parser.add_argument(
+        "--write-interval",
+        type=float,
+        default=sheet_writer.DEFAULT_FLUSH_INTERVAL,
+        metavar="SECONDS",
+        help="Write pending results at least this often",
+    )
+    parser.add_argument(
+        "--journal-dir",
+        default=os.getenv("RUN_JOURNAL_DIR") or run_journal.DEFAULT_DIR,
+        metavar="DIR",
+        help="Directory of the progress journal used by --resume",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue where the journaled run stopped instead of at --start-row",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Skip rows whose columns D-G already have results",
+    )
+    parser.add_argument(
+        "--recrawl-after",
+        type=float,
+        metavar="DAYS",
+        help="With --incremental, crawl filled rows again once their result is this old",
+    )
+    parser.add_argument(
+        "--shard",
+        metavar="I/N",
+        help="Process only shard I of N (0-based) and defer the cleanup to --merge-shards",
+    )
+    parser.add_argument(
+        "--shard-dir",
+        default=os.getenv("SHARD_DIR") or sharding.DEFAULT_DIR,
+        metavar="DIR",
+        help="Directory of the shard manifests",
+    )
+    parser.add_argument(
+        "--merge-shards",
+        action="store_true",
+        help="Run the cleanup once for the rows written by all shards and exit",
+    )
     parser.add_argument(
         "--credentials",
         default="sa.json",
@@ -722,7 +1271,95 @@ def main() -> None:  # pragma: no cover - CLI entry point
 
     if not args.spreadsheet_id.strip():
         parser.error("--spreadsheet-id must not be empty")
+    if args.recrawl_after is not None and not args.incremental:
+        parser.error("--recrawl-after requires --incremental")
+    shard = None
+    if args.shard:
+        try:
+            shard = sharding.parse_shard(args.shard)
+        except ValueError as exc:
+            parser.error(str(exc))
+
+    sheets_client.configure(
+        sheets_client.SheetsQuota(
+            reads_per_minute=args.sheets_reads_per_minute,
+            writes_per_minute=args.sheets_writes_per_minute,
+        )
+    )
+
+    if args.merge_shards:
+        manifests = sharding.ShardManifest.load_all(
+            args.shard_dir, args.spreadsheet_id, args.worksheet
+        )
+        missing = sharding.missing_shards(manifests)
+        if missing is None:
+            logging.error("[SHARDS] No shard manifests found in %s", args.shard_dir)
+            return
+        if missing:
+            logging.warning(
+                "[SHARDS] No manifest for shard(s) %s; their rows are not cleaned up",
+                missing,
+            )
+        service = _build_sheet_service(args.credentials)
+        if service is None:
+            logging.error("Unable to obtain Sheets service; skipping merge.")
+            return
+        state = ProcessState(
+            spreadsheet_id=args.spreadsheet_id, worksheet=args.worksheet, service=service
+        )
+        merge_shards(state, manifests)
+        for manifest in manifests:
+            journal = run_journal.RunJournal.for_sheet(
+                args.journal_dir,
+                args.spreadsheet_id,
+                args.worksheet,
+                (manifest.shard, manifest.count),
+            )
+            if journal.path.exists():
+                journal.record_cleanup()
+                journal.close()
+        logging.info("[SHEETS] %s", sheets_client.get_quota().stats())
+        return
+
+    try:
+        set_default_parser(args.parser)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    parse_pool.configure(args.parse_workers)
+    email_collector.configure(
+        email_collector.CrawlBudget(
+            max_pages=args.email_max_pages,
+            max_kb=args.email_max_kb,
+            confident_score=args.email_confident_score,
+        )
+        if args.email_pick == "ranked"
+        else None
+    )
 
+    page_store = None
+    if args.http_cache:
+        page_store = http_cache.HttpCache(
+            args.http_cache,
+            ttl=args.http_cache_ttl * 3600,
+            max_bytes=args.http_cache_max_mb * 1024 * 1024,
+        )
+    client = fetch_client.configure(
+        pool_size=args.pool_size,
+        per_host=args.per_host_connections,
+        cache=page_store,
+        max_bytes=args.max_page_kb * 1024 or None,
+        scheduler=fetch_scheduler.FetchScheduler(
+            max_in_flight=args.max_in_flight,
+            per_host=args.per_host_connections,
+            per_group=args.per_platform,
+            rate=args.platform_rate,
+        ),
+    )
+    journal = run_journal.RunJournal.for_sheet(
+        args.journal_dir, args.spreadsheet_id, args.worksheet, shard
+    )
+    crawl_log = CrawlLog(args.journal_dir)
     state = ProcessState(spreadsheet_id=args.spreadsheet_id, worksheet=args.worksheet)
     had_fatal = False
     try:
@@ -735,15 +1372,47 @@ def main() -> None:  # pragma: no cover - CLI entry point
             verify_ssl=args.verify_ssl,
             credentials_file=args.credentials,
             state=state,
+            workers=args.workers,
+            engine=args.engine,
+            dedupe=args.dedupe,
+            journal=journal,
+            resume=args.resume,
+            incremental=args.incremental,
+            crawl_log=crawl_log,
+            recrawl_after=(
+                None if args.recrawl_after is None else args.recrawl_after * 86400
+            ),
+            shard=shard,
+            write_batch_size=args.write_batch_size,
+            write_interval=args.write_interval,
+            suppress_duplicates=(
+                args.suppress_duplicates
+                and _env_flag("CLEANUP_DUPLICATE_EMAIL_ROWS", default=True)
+            ),
         )
     except Exception as e:  # pragma: no cover - defensive guard
         had_fatal = True
         print(f"[FATAL-WARN] process_sheet crashed but will continue to cleanup: {e!r}")
     finally:
         try:
-            run_cleanup(state)
+            if shard is not None:
+                path = shard_manifest(state, shard).save(args.shard_dir)
+                logging.info("[SHARDS] Cleanup deferred to --merge-shards; wrote %s", path)
+            else:
+                run_cleanup(state)
+                if state.service is not None:
+                    journal.record_cleanup()
         except Exception as e2:  # pragma: no cover - defensive guard
             print(f"[CLEANUP-WARN] cleanup failed: {e2!r}")
+        journal.close()
+        crawl_log.close()
+
+    if page_store is not None:
+        logging.info("[HTTP-CACHE] %s", page_store.stats())
+    logging.info("[SCHEDULER] %s", client.scheduler.stats())
+    logging.info("[SHEETS] %s", sheets_client.get_quota().stats())
+    client.close()
+    parse_pool.shutdown()
 
     if had_fatal:
         logging.warning("Processing completed with recoverable errors. See logs above.")